@@ -0,0 +1,118 @@
+"""hot path indexes
+
+Revision ID: 7f2a9c4e1b3d
+Revises: 1d3c96caa0e7
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f2a9c4e1b3d'
+down_revision = '1d3c96caa0e7'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns, unique); tables created outside of the migrations are skipped when missing
+INDEXES = [
+    ('uq_results_user_id_quiz_id', 'results', ['user_id', 'quiz_id'], True),
+    ('ix_invites_user_id_company_id', 'invites', ['user_id', 'company_id'], False),
+    ('ix_requests_user_id_company_id', 'requests', ['user_id', 'company_id'], False),
+    ('ix_questions_quiz_id', 'questions', ['quiz_id'], False),
+    ('ix_variants_question_id_is_correct', 'variants', ['question_id', 'is_correct'], False),
+    ('ix_quizzes_company_id', 'quizzes', ['company_id'], False),
+    ('ix_companies_owner_id', 'companies', ['owner_id'], False),
+    ('company_employees_pkey', 'company_employees', ['company_id', 'user_id'], True),
+    ('ix_company_employees_user_id', 'company_employees', ['user_id'], False),
+    ('company_admins_pkey', 'company_admins', ['company_id', 'user_id'], True),
+    ('ix_company_admins_user_id', 'company_admins', ['user_id'], False),
+]
+
+# unique indexes promoted to constraints once they are built
+CONSTRAINTS = [
+    ('results', 'uq_results_user_id_quiz_id', 'UNIQUE'),
+    ('company_employees', 'company_employees_pkey', 'PRIMARY KEY'),
+    ('company_admins', 'company_admins_pkey', 'PRIMARY KEY'),
+]
+
+MEMBERSHIP_TABLES = ['company_employees', 'company_admins']
+
+
+def existing_tables() -> set:
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def constraint_exists(table: str, name: str) -> bool:
+    return op.get_bind().execute(sa.text('SELECT 1 FROM pg_constraint '
+                                         'WHERE conname = :name AND conrelid = CAST(:table AS regclass)'),
+                                 {'name': name, 'table': table}).scalar() is not None
+
+
+def invalid_index_exists(name: str) -> bool:
+    # an interrupted CREATE INDEX CONCURRENTLY leaves an invalid index that IF NOT EXISTS would keep
+    return op.get_bind().execute(sa.text('SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(:name) '
+                                         'AND NOT indisvalid'),
+                                 {'name': name}).scalar() is not None
+
+
+def upgrade() -> None:
+    tables = existing_tables()
+
+    if 'results' in tables:
+        # pass_quiz keeps one accumulated row per user and quiz, older duplicates come from races;
+        # their counts are folded into the newest row before they are dropped
+        op.execute('UPDATE results SET correct_answers = totals.correct_answers, '
+                   'all_answers = totals.all_answers, '
+                   'gpa = CAST(totals.correct_answers AS FLOAT) / NULLIF(totals.all_answers, 0) '
+                   'FROM (SELECT max(id) AS id, sum(correct_answers) AS correct_answers, '
+                   'sum(all_answers) AS all_answers FROM results '
+                   'GROUP BY user_id, quiz_id HAVING count(*) > 1) AS totals '
+                   'WHERE results.id = totals.id')
+        op.execute('DELETE FROM results older USING results newer '
+                   'WHERE older.user_id = newer.user_id AND older.quiz_id = newer.quiz_id AND older.id < newer.id')
+
+    for table in MEMBERSHIP_TABLES:
+        op.execute(f'DELETE FROM {table} WHERE user_id IS NULL OR company_id IS NULL')
+        op.execute(f'DELETE FROM {table} older USING {table} newer '
+                   f'WHERE older.user_id = newer.user_id AND older.company_id = newer.company_id '
+                   f'AND older.ctid < newer.ctid')
+        op.alter_column(table, 'user_id', existing_type=sa.Integer(), nullable=False)
+        op.alter_column(table, 'company_id', existing_type=sa.Integer(), nullable=False)
+
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction block;
+    # metadata.create_all builds the same indexes, so any of them may already be there
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            if table not in tables:
+                continue
+
+            if invalid_index_exists(name):
+                op.execute(f'DROP INDEX CONCURRENTLY {name}')
+
+            op.execute(f'CREATE {"UNIQUE " if unique else ""}INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                       f'ON {table} ({", ".join(columns)})')
+
+    for table, name, constraint in CONSTRAINTS:
+        if table in tables and not constraint_exists(table=table, name=name):
+            op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {constraint} USING INDEX {name}')
+
+
+def downgrade() -> None:
+    tables = existing_tables()
+
+    for table, name, _ in CONSTRAINTS:
+        if table in tables and constraint_exists(table=table, name=name):
+            op.drop_constraint(name, table)
+
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in INDEXES:
+            # the constraints above took their unique indexes with them
+            if table in tables:
+                op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+    for table in MEMBERSHIP_TABLES:
+        op.alter_column(table, 'company_id', existing_type=sa.Integer(), nullable=True)
+        op.alter_column(table, 'user_id', existing_type=sa.Integer(), nullable=True)
@@ -0,0 +1,35 @@
+"""quiz updated_at
+
+Revision ID: c41e8b7d2a95
+Revises: 7f2a9c4e1b3d
+Create Date: 2026-10-18 14:03:27.550912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e8b7d2a95'
+down_revision = '7f2a9c4e1b3d'
+branch_labels = None
+depends_on = None
+
+
+def has_updated_at(inspector) -> bool:
+    return any(column['name'] == 'updated_at' for column in inspector.get_columns('quizzes'))
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    # quizzes is created by metadata.create_all, so it may not exist yet or already have the column
+    if inspector.has_table('quizzes') and not has_updated_at(inspector):
+        op.add_column('quizzes', sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if inspector.has_table('quizzes') and has_updated_at(inspector):
+        op.drop_column('quizzes', 'updated_at')
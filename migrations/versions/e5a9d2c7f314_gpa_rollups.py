@@ -0,0 +1,67 @@
+"""gpa rollups
+
+Revision ID: e5a9d2c7f314
+Revises: c41e8b7d2a95
+Create Date: 2026-10-18 16:21:09.184730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9d2c7f314'
+down_revision = 'c41e8b7d2a95'
+branch_labels = None
+depends_on = None
+
+
+# matches GPA_TOTAL_SHARDS in src/quiz/crud.py; readers sum every shard, so a different count stays correct
+GPA_TOTAL_SHARDS = 16
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    # the rating tables are created by metadata.create_all, which also creates them with these columns
+    if 'quiz_ratings' in tables:
+        columns = {column['name'] for column in inspector.get_columns('quiz_ratings')}
+
+        if 'gpa_sum' not in columns:
+            op.add_column('quiz_ratings', sa.Column('gpa_sum', sa.Float(), server_default='0', nullable=False))
+        if 'results' not in columns:
+            op.add_column('quiz_ratings', sa.Column('results', sa.Integer(), server_default='0', nullable=False))
+
+        if 'results' in tables:
+            op.execute('UPDATE quiz_ratings SET gpa_sum = totals.gpa_sum, results = totals.results '
+                       'FROM (SELECT quiz_id, coalesce(sum(gpa), 0) AS gpa_sum, count(*) AS results '
+                       'FROM results GROUP BY quiz_id) AS totals '
+                       'WHERE quiz_ratings.quiz_id = totals.quiz_id')
+
+    if 'gpa_totals' not in tables:
+        op.create_table('gpa_totals',
+                        sa.Column('shard', sa.Integer(), nullable=False),
+                        sa.Column('gpa_sum', sa.Float(), nullable=False),
+                        sa.Column('results', sa.Integer(), nullable=False),
+                        sa.PrimaryKeyConstraint('shard'))
+
+        if 'results' in tables:
+            op.execute(f'INSERT INTO gpa_totals (shard, gpa_sum, results) '
+                       f'SELECT quiz_id % {GPA_TOTAL_SHARDS}, coalesce(sum(gpa), 0), count(*) '
+                       f'FROM results GROUP BY quiz_id % {GPA_TOTAL_SHARDS}')
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'gpa_totals' in tables:
+        op.drop_table('gpa_totals')
+
+    if 'quiz_ratings' in tables:
+        columns = {column['name'] for column in inspector.get_columns('quiz_ratings')}
+
+        for column in ('results', 'gpa_sum'):
+            if column in columns:
+                op.drop_column('quiz_ratings', column)
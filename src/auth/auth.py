@@ -1,25 +1,28 @@
 import jwt
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from src.auth.hashing import password_hasher
 from src.config import settings
 
 
 class AuthHandler():
     security = HTTPBearer()
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     secret = settings.SECRET_KEY
 
-    def get_password_hash(self, password: str) -> str:
-        return self.pwd_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        return await password_hasher.hash(password)
 
-    def verify_password(self, password: str, hashed_password: str) -> bool:
-        return self.pwd_context.verify(password, hashed_password)
+    async def verify_password(self, password: str, hashed_password: str) -> bool:
+        return await password_hasher.verify(password=password, hashed_password=hashed_password)
+
+    async def verify_and_update_password(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await password_hasher.verify_and_update(password=password, hashed_password=hashed_password)
 
     def encode_token(self, email: str) -> str:
         payload = {
-            'exp': datetime.utcnow() + timedelta(days=0, minutes=5),
+            'exp': datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
             'iat': datetime.utcnow(),
             'sub': email,
         }
@@ -30,9 +33,11 @@ class AuthHandler():
         )
 
     def decode_token(self, token: str) -> str:
+        return self.decode_payload(token=token)['sub']
+
+    def decode_payload(self, token: str) -> dict:
         try:
-            payload = jwt.decode(token, self.secret, algorithms=[settings.ALGORITHM])
-            return payload['sub']
+            return jwt.decode(token, self.secret, algorithms=[settings.ALGORITHM])
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail='Signature has expired')
         except jwt.InvalidTokenError as e:
@@ -0,0 +1,97 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from src.config import settings
+
+
+class PasswordHasher:
+
+    def __init__(self, rounds: int, workers: int, max_queue: int):
+        # min_rounds == max_rounds makes any change of BCRYPT_ROUNDS mark old hashes for update
+        self.pwd_context = CryptContext(schemes=["bcrypt"],
+                                        deprecated="auto",
+                                        bcrypt__default_rounds=rounds,
+                                        bcrypt__min_rounds=rounds,
+                                        bcrypt__max_rounds=rounds)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.max_queue_depth = 0
+        self._executor = None
+        self._semaphore = None
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="too many password hashing requests, try again later")
+
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queued)
+
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        verified, _ = await self.verify_and_update(password=password, hashed_password=hashed_password)
+
+        return verified
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        # users created through the external provider have no local password
+        if not hashed_password:
+            return False, None
+
+        verified, new_hash = await self._run(self.pwd_context.verify_and_update, password, hashed_password)
+
+        if new_hash is not None:
+            self.rehashed += 1
+
+        return verified, new_hash
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._semaphore = None
+
+    def stats(self) -> dict:
+        return {"workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.queued,
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed}
+
+
+password_hasher = PasswordHasher(rounds=settings.BCRYPT_ROUNDS,
+                                 workers=settings.BCRYPT_WORKERS,
+                                 max_queue=settings.BCRYPT_MAX_QUEUE)
@@ -0,0 +1,75 @@
+from typing import FrozenSet, NamedTuple
+
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import TTLCache
+from src.company.models import Company, company_admins, company_employees
+from src.config import settings
+from src.database import on_commit
+
+
+class AuthContext(NamedTuple):
+    user_id: int
+    owner_of: FrozenSet[int]
+    admin_in: FrozenSet[int]
+    employee_in: FrozenSet[int]
+
+    def can_manage(self, company_id: int) -> bool:
+        return company_id in self.owner_of or company_id in self.admin_in
+
+    def is_member(self, company_id: int) -> bool:
+        return self.can_manage(company_id) or company_id in self.employee_in
+
+
+auth_context_cache = TTLCache(maxsize=settings.AUTH_CONTEXT_CACHE_SIZE, ttl=settings.AUTH_CONTEXT_TTL)
+
+
+async def load_auth_context(session: AsyncSession, user_id: int) -> AuthContext:
+    query = union_all(
+        select(literal("owner"), Company.id).filter(Company.owner_id == user_id),
+        select(literal("admin"), company_admins.c.company_id).filter(company_admins.c.user_id == user_id),
+        select(literal("employee"), company_employees.c.company_id).filter(company_employees.c.user_id == user_id)
+    )
+
+    roles = {"owner": set(), "admin": set(), "employee": set()}
+
+    for role, company_id in (await session.execute(query)).all():
+        roles[role].add(company_id)
+
+    return AuthContext(user_id=user_id,
+                       owner_of=frozenset(roles["owner"]),
+                       admin_in=frozenset(roles["admin"]),
+                       employee_in=frozenset(roles["employee"]))
+
+
+async def get_auth_context(session: AsyncSession, user_id: int) -> AuthContext:
+    request_contexts = session.info.setdefault("auth_context", {})
+
+    context = request_contexts.get(user_id)
+    if context is not None:
+        return context
+
+    context = auth_context_cache.get(user_id)
+    if context is None:
+        context = await load_auth_context(session=session, user_id=user_id)
+        auth_context_cache.set(user_id, context)
+
+    request_contexts[user_id] = context
+
+    return context
+
+
+def invalidate_auth_context(session: AsyncSession, *user_ids: int) -> None:
+    request_contexts = session.info.setdefault("auth_context", {})
+
+    for user_id in user_ids:
+        request_contexts.pop(user_id, None)
+        auth_context_cache.pop(user_id)
+        on_commit(session, auth_context_cache.pop, key=user_id)
+
+
+def clear_auth_context(session: AsyncSession) -> None:
+    session.info.pop("auth_context", None)
+    auth_context_cache.clear()
+    on_commit(session, auth_context_cache.clear)
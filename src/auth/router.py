@@ -1,36 +1,81 @@
 from fastapi import HTTPException, APIRouter, Depends
 
 from .auth import auth_handler
-from src.database import async_session
+from .hashing import password_hasher
 from src.user.schemas import UserGetSchema
 
 from src.user.crud import UserCrud
 from .services import get_current_user
 
-from src.auth.schemes import TokenScheme
+from src.auth.schemes import RefreshScheme, TokenScheme
 from ..user.models import User
 
-from src.company.router import get_session
+from src.database import get_session
+from src.redis_init import get_redis
+from .tokens import issue_refresh_token, rotate_refresh_token, revoke_device, revoke_user
 
 auth_router = APIRouter()
-db = async_session()
 
 
 @auth_router.post('/login', response_model=TokenScheme)
-async def login(email: str, password: str, session = Depends(get_session)) -> TokenScheme:
+async def login(email: str, password: str, device: str = "default",
+                session = Depends(get_session), redis = Depends(get_redis)) -> TokenScheme:
 
     user_crud = UserCrud(db_session=session)
 
     user = await user_crud.get_user_by_email(email=email)
 
-    if (user is None) or (not auth_handler.verify_password(password, user.password)):
+    if user is None:
         raise HTTPException(status_code=401, detail='Invalid username and/or password')
+
+    verified, new_hash = await auth_handler.verify_and_update_password(password=password,
+                                                                      hashed_password=user.password)
+
+    if not verified:
+        raise HTTPException(status_code=401, detail='Invalid username and/or password')
+
+    if new_hash is not None:
+        await user_crud.update_password(user=user, hashed_password=new_hash)
+        await session.commit()
+
     token = auth_handler.encode_token(email=user.email)
+    refresh_token = await issue_refresh_token(redis=redis, email=user.email, device=device)
+
+    return TokenScheme(token=token, refresh_token=refresh_token)
+
+
+@auth_router.post('/refresh', response_model=TokenScheme)
+async def refresh(body: RefreshScheme, redis = Depends(get_redis)) -> TokenScheme:
+    # the token travels in the body, so it stays out of access logs and proxies that record query strings
+    session, new_refresh_token = await rotate_refresh_token(redis=redis, token=body.refresh_token)
+
+    token = auth_handler.encode_token(email=session.email)
 
-    return TokenScheme(token=token)
+    return TokenScheme(token=token, refresh_token=new_refresh_token)
+
+
+@auth_router.post('/logout')
+async def logout(device: str = "default", current_user = Depends(get_current_user),
+                 redis = Depends(get_redis)) -> set[str]:
+    if not await revoke_device(redis=redis, email=current_user.email, device=device):
+        raise HTTPException(status_code=404, detail=f"there is no session for device {device}")
+
+    return {f"device {device} has been logged out"}
+
+
+@auth_router.post('/logout_all')
+async def logout_all(current_user = Depends(get_current_user), redis = Depends(get_redis)) -> set[str]:
+    sessions = await revoke_user(redis=redis, email=current_user.email)
+
+    return {f"{sessions} sessions have been logged out"}
 
 
 @auth_router.get('/me', response_model=UserGetSchema)
 async def me(current_user: str = Depends(get_current_user)) -> User:
 
     return current_user
+
+
+@auth_router.get('/hashing_stats')
+async def get_hashing_stats(current_user = Depends(get_current_user)) -> dict:
+    return password_hasher.stats()
@@ -1,8 +1,15 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
 class TokenScheme(BaseModel):
     token: str
+    refresh_token: Optional[str]
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class RefreshScheme(BaseModel):
+    refresh_token: str
@@ -1,43 +1,78 @@
-from fastapi import Depends
+import hashlib
+import time
+
+import jwt
+from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
+from starlette.concurrency import run_in_threadpool
 
 from src.auth.auth import auth_handler
 from src.auth.utils import VerifyToken
-from src.database import async_session
+from src.cache import TTLCache
+from src.config import settings
+from src.database import get_session, on_commit
 from src.user.crud import UserCrud
+from src.user.services import cache_user, get_cached_user
 
 from src.user.models import User
 
 
 token_auth_scheme = HTTPBearer()
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=0)
 
 
-def decode_token(token = Depends(auth_handler.auth_wrapper)) -> str:
-    return token
+def decode_auth_token(token: str) -> dict:
+    return VerifyToken(token=token).verify()
 
 
-def decode_auth_token(token) -> str:
-    return (VerifyToken(token=token.credentials).verify())["https://example.com/email"]
+async def get_token_email(token: str) -> str:
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
 
+    email = token_cache.get(token_hash)
+    if email is not None:
+        return email
 
-async def get_current_user(token: str = Depends(token_auth_scheme)) -> User:
     try:
-        email = decode_auth_token(token=token)
-    except:
-        valid_token = decode_token(token=token.credentials)
-        email = auth_handler.decode_token(token=valid_token)
+        header = jwt.get_unverified_header(token)
+    except jwt.exceptions.DecodeError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid token')
+
+    if header.get("alg") == settings.ALGORITHM:
+        payload = auth_handler.decode_payload(token=token)
+        email = payload.get("sub")
+    else:
+        # a JWKS refresh is blocking network IO, keep it off the event loop
+        payload = await run_in_threadpool(decode_auth_token, token)
+        email = payload.get("https://example.com/email")
+
+    if not email:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Token has no email claim')
+
+    ttl = payload.get("exp", 0) - time.time()
+    if ttl > 0:
+        token_cache.set(token_hash, email, ttl=ttl)
+
+    return email
 
-    async with async_session() as session:
-        async with session.begin():
-            user_crud = UserCrud(db_session=session)
 
-            user = await user_crud.get_user_by_email(email=email)
+async def get_current_user(token = Depends(token_auth_scheme), session = Depends(get_session)) -> User:
+    email = await get_token_email(token=token.credentials)
+
+    user = get_cached_user(email=email)
+    if user is not None:
+        session.add(user)
+        return user
+
+    user_crud = UserCrud(db_session=session)
+
+    user = await user_crud.get_user_by_email(email=email)
 
     if user is None:
-        async with async_session() as session:
-            async with session.begin():
-                user_crud = UserCrud(db_session=session)
+        user = await user_crud.create_user_auth(email=email)
+        on_commit(session, cache_user, user=user)
+        # the handler may only read, so the user created on first sight is committed here
+        await session.commit()
+    else:
+        cache_user(user=user)
 
-                return await user_crud.create_user_auth(email=email)
     return user
-
@@ -0,0 +1,136 @@
+import hashlib
+import secrets
+from typing import NamedTuple, Tuple
+
+from fastapi import HTTPException, status
+from redis.asyncio import Redis
+
+from src.config import settings
+
+
+REFRESH_TOKEN_TTL = 60 * 60 * 24 * settings.REFRESH_TOKEN_EXPIRE_DAYS
+
+
+class RefreshSession(NamedTuple):
+    email: str
+    family: str
+    device: str
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def refresh_token_key(token: str) -> str:
+    return f"refresh-token-{token_hash(token)}"
+
+
+def refresh_family_key(family: str) -> str:
+    return f"refresh-family-{family}"
+
+
+def user_families_key(email: str) -> str:
+    return f"refresh-user-{email}"
+
+
+def user_devices_key(email: str) -> str:
+    return f"refresh-devices-{email}"
+
+
+def invalid_refresh_token() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid refresh token')
+
+
+async def store_refresh_token(redis: Redis, session: RefreshSession) -> str:
+    token = secrets.token_urlsafe(48)
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(refresh_token_key(token), mapping={"email": session.email,
+                                                     "family": session.family,
+                                                     "device": session.device,
+                                                     "used": 0})
+        pipe.expire(refresh_token_key(token), REFRESH_TOKEN_TTL)
+        pipe.expire(refresh_family_key(session.family), REFRESH_TOKEN_TTL)
+        pipe.expire(user_families_key(session.email), REFRESH_TOKEN_TTL)
+        pipe.expire(user_devices_key(session.email), REFRESH_TOKEN_TTL)
+        await pipe.execute()
+
+    return token
+
+
+async def issue_refresh_token(redis: Redis, email: str, device: str) -> str:
+    # a new login on a device replaces the session that device had before
+    previous = await redis.hget(user_devices_key(email), device)
+    if previous is not None:
+        await revoke_family(redis=redis, email=email, family=previous)
+
+    family = secrets.token_urlsafe(16)
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(refresh_family_key(family), mapping={"email": email, "device": device})
+        pipe.sadd(user_families_key(email), family)
+        pipe.hset(user_devices_key(email), device, family)
+        await pipe.execute()
+
+    return await store_refresh_token(redis=redis, session=RefreshSession(email=email, family=family, device=device))
+
+
+async def rotate_refresh_token(redis: Redis, token: str) -> Tuple[RefreshSession, str]:
+    key = refresh_token_key(token)
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hgetall(key)
+        pipe.hincrby(key, "used", 1)
+        data, used = await pipe.execute()
+
+    if not data:
+        await redis.delete(key)
+        raise invalid_refresh_token()
+
+    session = RefreshSession(email=data["email"], family=data["family"], device=data["device"])
+
+    if used > 1:
+        # an already rotated token came back, so it leaked: end the whole session
+        await revoke_family(redis=redis, email=session.email, family=session.family)
+        raise invalid_refresh_token()
+
+    if not await redis.exists(refresh_family_key(session.family)):
+        raise invalid_refresh_token()
+
+    return session, await store_refresh_token(redis=redis, session=session)
+
+
+async def revoke_family(redis: Redis, email: str, family: str) -> None:
+    device = await redis.hget(refresh_family_key(family), "device")
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(refresh_family_key(family))
+        pipe.srem(user_families_key(email), family)
+        await pipe.execute()
+
+    if device is not None and await redis.hget(user_devices_key(email), device) == family:
+        await redis.hdel(user_devices_key(email), device)
+
+
+async def revoke_device(redis: Redis, email: str, device: str) -> bool:
+    family = await redis.hget(user_devices_key(email), device)
+
+    if family is None:
+        return False
+
+    await revoke_family(redis=redis, email=email, family=family)
+
+    return True
+
+
+async def revoke_user(redis: Redis, email: str) -> int:
+    families = await redis.smembers(user_families_key(email))
+
+    async with redis.pipeline(transaction=True) as pipe:
+        for family in families:
+            pipe.delete(refresh_family_key(family))
+        pipe.delete(user_families_key(email), user_devices_key(email))
+        await pipe.execute()
+
+    return len(families)
+
@@ -1,3 +1,8 @@
+import json
+import time
+import urllib.request
+from typing import Any, Dict, Optional
+
 import jwt
 from src.config import settings
 from fastapi import HTTPException, status
@@ -13,33 +18,71 @@ def set_up():
     return config
 
 
+class JWKSCache:
+
+    def __init__(self, url: Optional[str] = None, path: Optional[str] = None,
+                 min_refresh_interval: float = 60, timeout: float = 5):
+        self.url = url
+        self.path = path
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.keys: Dict[str, Any] = {}
+        self.refreshed_at: Optional[float] = None
+
+    def fetch(self) -> dict:
+        if self.path:
+            with open(self.path) as file:
+                return json.load(file)
+
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def refresh(self) -> None:
+        jwk_set = jwt.PyJWKSet.from_dict(self.fetch())
+
+        self.keys = {key.key_id: key.key for key in jwk_set.keys}
+        self.refreshed_at = time.monotonic()
+
+    def get_signing_key(self, kid: str) -> Any:
+        if kid not in self.keys:
+            # unknown kids mean rotated keys, but a flood of bogus kids must not hammer the JWKS endpoint
+            if self.refreshed_at is None or time.monotonic() - self.refreshed_at >= self.min_refresh_interval:
+                self.refresh()
+
+        try:
+            return self.keys[kid]
+        except KeyError:
+            raise jwt.exceptions.PyJWKClientError(f'unable to find a signing key that matches "{kid}"')
+
+
+jwks_cache = JWKSCache(url=settings.JWKS_URL,
+                       path=settings.JWKS_FILE,
+                       min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL)
+
+
 class VerifyToken():
     def __init__(self, token):
         self.token = token
         self.config = set_up()
 
-        jwks_url = f'https://{self.config["DOMAIN"]}/.well-known/jwks.json'
-        self.jwks_client = jwt.PyJWKClient(jwks_url)
-
-    def verify(self) -> str:
+    def verify(self) -> dict:
         try:
-            self.signing_key = self.jwks_client.get_signing_key_from_jwt(
-                self.token
-            ).key
+            kid = jwt.get_unverified_header(self.token).get("kid")
+            self.signing_key = jwks_cache.get_signing_key(kid)
         except jwt.exceptions.PyJWKClientError as error:
-            return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error.__str__)
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(error))
         except jwt.exceptions.DecodeError as error:
-            return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error.__str__)
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(error))
 
         try:
             payload = jwt.decode(
                 self.token,
                 self.signing_key,
-                algorithms=self.config["ALGORITHMS"],
+                algorithms=[self.config["ALGORITHMS"]],
                 audience=self.config["API_AUDIENCE"],
                 issuer=self.config["ISSUER"],
             )
         except Exception as e:
-            return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
 
-        return payload
\ No newline at end of file
+        return payload
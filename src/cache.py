@@ -0,0 +1,132 @@
+import itertools
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions}
+
+
+class TTLCache(LRUCache):
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize)
+        self.ttl = ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        super().set(key, (time.monotonic() + (self.ttl if ttl is None else ttl), value))
+
+
+class Generations:
+
+    # entries of a cache keyed by (key, generation, ...) are invalidated together by bumping the key; the orphaned
+    # entries then age out of their own bounded cache instead of being collected under the key
+    def __init__(self, maxsize: int):
+        self._current = LRUCache(maxsize=maxsize)
+        self._counter = itertools.count()
+
+    def get(self, key: Hashable) -> int:
+        generation = self._current.get(key)
+
+        if generation is None:
+            # a key that was bumped or evicted gets a number no cached entry was stored under
+            generation = next(self._counter)
+            self._current.set(key, generation)
+
+        return generation
+
+    def bump(self, key: Hashable) -> None:
+        self._current.pop(key)
+
+    def clear(self) -> None:
+        self._current.clear()
+
+
+class GenerationalCache:
+
+    # entries live under (scope, generation, key) in one bounded TTL cache, so invalidating a scope only bumps its
+    # generation and the orphaned entries age out of the LRU. Callers take the key before they read the database,
+    # so a value read across an invalidation is stored under the generation it was read in and is never served
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.generations = Generations(maxsize=maxsize)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def key(self, scope: Hashable, key: Hashable = None) -> tuple:
+        return scope, self.generations.get(scope), key
+
+    def get(self, key: tuple, default: Any = None) -> Any:
+        return self.entries.get(key, default)
+
+    def set(self, key: tuple, value: Any) -> None:
+        self.entries.set(key, value)
+
+    def invalidate(self, scope: Hashable) -> None:
+        self.generations.bump(scope)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.generations.clear()
+
+    def stats(self) -> dict:
+        return self.entries.stats()
@@ -1,15 +1,20 @@
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, exists, func, literal, union_all, case, and_, or_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from src.database import async_session
-from src.company.models import Company, Invite, Request
-from typing import List, Optional
-
-from sqlalchemy.orm import selectinload
+from src.company.models import Company, Invite, Request, company_admins, company_employees
+from src.company.schemes import BulkItemResult, BulkResult, BulkUsersScheme
+from typing import Dict, List, Optional, Tuple
 
 from src.user.models import User
+from src.auth.permissions import get_auth_context, invalidate_auth_context, clear_auth_context
+from src.company.services import escape_like, invalidate_roster, roster_count_cache
+from src.database import on_commit
+from src.quiz.services import invalidate_quiz_caches, invalidate_quiz_catalog
+from src.pagination import PageParams, paginate
+
 
-db = async_session()
+INSERT_BATCH_SIZE = 1000
 
 
 class CompanyCrud:
@@ -22,38 +27,140 @@ class CompanyCrud:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                                 detail="you have no access")
 
-    async def if_employee_exists(self, employee: User, employee_id: int) -> None:
-        if employee is None:
+    async def company_exists(self, company_id: int) -> None:
+        if not (await self.db_session.execute(select(exists().where(Company.id == company_id)))).scalar():
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                                detail=f"there is no user with id {employee_id}")
+                                detail=f"there is no company with id {company_id}")
 
-    async def get_company_with_employees(self, company_id: int):
-        company = (await self.db_session.execute(select(Company).filter(Company.id == company_id)
-                                                 .options(selectinload(Company.employees))))\
-                                                 .scalars().first()
+    async def get_company_owner_id(self, company_id: int) -> int:
+        owner_id = (await self.db_session.execute(select(Company.owner_id)
+                                                  .filter(Company.id == company_id))).first()
 
-        if company is None:
+        if owner_id is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                                 detail=f"there is no company with id {company_id}")
 
-        return company
+        return owner_id[0]
+
+    async def is_employee(self, user_id: int, company_id: int) -> bool:
+        return (await self.db_session.execute(select(exists().where(company_employees.c.company_id == company_id,
+                                                                    company_employees.c.user_id == user_id))))\
+                                              .scalar()
+
+    async def is_admin(self, user_id: int, company_id: int) -> bool:
+        return (await self.db_session.execute(select(exists().where(company_admins.c.company_id == company_id,
+                                                                    company_admins.c.user_id == user_id))))\
+                                              .scalar()
+
+    async def get_role(self, user_id: int, company_id: int) -> Optional[str]:
+        row = (await self.db_session.execute(
+            select(Company.owner_id == user_id,
+                   exists().where(company_admins.c.company_id == company_id,
+                                  company_admins.c.user_id == user_id),
+                   exists().where(company_employees.c.company_id == company_id,
+                                  company_employees.c.user_id == user_id))
+            .filter(Company.id == company_id))).first()
+
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"there is no company with id {company_id}")
 
-    async def check_if_employee_in_company(self, employee: User, employees: list, employee_id: int, company_id: int) -> None:
-        if employee not in employees:
+        is_owner, is_admin, is_employee = row
+
+        if is_owner:
+            return "owner"
+        if is_admin:
+            return "admin"
+        if is_employee:
+            return "employee"
+
+        return None
+
+    async def check_if_employee_in_company(self, employee_id: int, company_id: int) -> None:
+        if not await self.is_employee(user_id=employee_id, company_id=company_id):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                                 detail=f"there is no employee with id {employee_id} in company with id {company_id}")
 
-    async def check_if_employee_in_admins(self, employee: User, admins: list, employee_id: int, company_id: int) -> None:
-        if employee not in admins:
+    async def check_if_employee_in_admins(self, employee_id: int, company_id: int) -> None:
+        if not await self.is_admin(user_id=employee_id, company_id=company_id):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                                 detail=f"there is no admin with id {employee_id} in company with id {company_id}")
 
-    async def get_all_companies(self) -> List[Company]:
-        companies = (await self.db_session.execute(select(Company)
-                                                   .filter(Company.is_visible == True)))\
-                                                   .scalars().all()
+    def roster_query(self, company_id: int, owner_id: int, search: Optional[str] = None):
+        def is_employee(user_id):
+            return exists().where(company_employees.c.company_id == company_id,
+                                  company_employees.c.user_id == user_id)
+
+        # admins are normally employees and the owner normally is not, NOT EXISTS keeps every member once
+        # while UNION ALL still lets the user_id range reach each primary key index
+        members = union_all(
+            select(company_employees.c.user_id.label("user_id"))
+            .where(company_employees.c.company_id == company_id),
+            select(company_admins.c.user_id)
+            .where(company_admins.c.company_id == company_id, ~is_employee(company_admins.c.user_id)),
+            select(literal(owner_id).label("user_id"))
+            .where(~is_employee(owner_id),
+                   ~exists().where(company_admins.c.company_id == company_id,
+                                   company_admins.c.user_id == owner_id))
+        ).subquery()
+
+        query = select(members.c.user_id,
+                       User.name,
+                       User.surname,
+                       User.email,
+                       case((members.c.user_id == owner_id, "owner"),
+                            (company_admins.c.user_id != None, "admin"),
+                            else_="employee").label("role"))\
+            .select_from(members)\
+            .join(User, User.id == members.c.user_id)\
+            .outerjoin(company_admins, and_(company_admins.c.company_id == company_id,
+                                            company_admins.c.user_id == members.c.user_id))
+
+        if search:
+            # backslash is the default LIKE escape character in postgres
+            prefix = f"{escape_like(search)}%"
+            query = query.filter(or_(User.name.ilike(prefix), User.email.ilike(prefix)))
+
+        return query
+
+    async def get_roster(self, company_id: int, page: PageParams, current_user: User,
+                         search: Optional[str] = None) -> dict:
+        owner_id = await self.get_company_owner_id(company_id=company_id)
+
+        context = await get_auth_context(session=self.db_session, user_id=current_user.id)
+
+        if not context.is_member(company_id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                                detail="you have no access")
+
+        query = self.roster_query(company_id=company_id, owner_id=owner_id, search=search)
+        key = roster_count_cache.key(company_id, search)
+
+        items, next_cursor = await paginate(session=self.db_session, query=query,
+                                            key=query.selected_columns.user_id, page=page)
+
+        total = roster_count_cache.get(key)
+
+        if total is None:
+            total = (await self.db_session.execute(select(func.count())
+                                                   .select_from(query.subquery()))).scalar()
+            roster_count_cache.set(key, total)
+
+        return {"items": items,
+                "next_cursor": next_cursor,
+                "total": total}
+
+    async def get_all_companies(self, page: PageParams, title: Optional[str] = None,
+                                owner_id: Optional[int] = None) -> Tuple[List[dict], Optional[str]]:
+        query = select(Company.id, Company.title, Company.description, Company.is_visible, Company.owner_id)\
+            .filter(Company.is_visible == True)
+
+        if title is not None:
+            query = query.filter(Company.title == title)
+        if owner_id is not None:
+            query = query.filter(Company.owner_id == owner_id)
 
-        return companies
+        return await paginate(session=self.db_session, query=query, key=Company.id, page=page)
 
     async def get_company_by_title(self, title: str) -> Optional[Company]:
         company = (await self.db_session.execute(select(Company)
@@ -67,20 +174,7 @@ class CompanyCrud:
 
     async def get_company_by_id(self, company_id: int) -> Optional[Company]:
         company = (await self.db_session.execute(select(Company)
-                                                 .filter(Company.id == company_id)
-                                                 .options(selectinload(Company.employees))))\
-                                                 .scalars().first()
-
-        if company is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                                detail=f"there is no company with id {company_id}")
-
-        return company
-
-    async def get_company_with_admins(self, company_id: int) -> Optional[Company]:
-        company = (await self.db_session.execute(select(Company)
-                                                 .filter(Company.id == company_id)
-                                                 .options(selectinload(Company.admins))))\
+                                                 .filter(Company.id == company_id)))\
                                                  .scalars().first()
 
         if company is None:
@@ -105,12 +199,14 @@ class CompanyCrud:
         self.db_session.add(new_company)
         await self.db_session.flush()
 
+        invalidate_auth_context(self.db_session, current_user.id)
+
         return new_company
 
     async def change_visibility(self, company_id: int, is_visible: bool, current_user: User) -> None:
-        company = await self.get_company_by_id(company_id=company_id)
+        owner_id = await self.get_company_owner_id(company_id=company_id)
 
-        await self.user_is_owner(user_id=current_user.id, owner_id=company.owner_id)
+        await self.user_is_owner(user_id=current_user.id, owner_id=owner_id)
 
         query = (
             update(Company)
@@ -121,12 +217,12 @@ class CompanyCrud:
             .execution_options(synchronize_session="fetch")
         )
         await self.db_session.execute(query)
-        await self.db_session.commit()
+        await self.db_session.flush()
 
     async def update_company(self, company_id: int, title: str, description: str, current_user: User) -> None:
-        company = await self.get_company_by_id(company_id=company_id)
+        owner_id = await self.get_company_owner_id(company_id=company_id)
 
-        await self.user_is_owner(user_id=current_user.id, owner_id=company.owner_id)
+        await self.user_is_owner(user_id=current_user.id, owner_id=owner_id)
 
         query = (
             update(Company)
@@ -141,17 +237,36 @@ class CompanyCrud:
         await self.db_session.flush()
 
     async def delete_company(self, company_id: int, current_user: User) -> None:
-        company = await self.get_company_by_id(company_id=company_id)
+        owner_id = await self.get_company_owner_id(company_id=company_id)
 
-        await self.user_is_owner(user_id=current_user.id, owner_id=company.owner_id)
+        await self.user_is_owner(user_id=current_user.id, owner_id=owner_id)
 
+        await self.remove_company_contents(company_ids=[company_id])
         await self.db_session.execute(delete(Company).filter(Company.id == company_id))
-        await self.db_session.commit()
+        await self.db_session.flush()
+
+    async def remove_company_contents(self, company_ids: List[int]) -> None:
+        # everything below the companies goes through ON DELETE CASCADE, so this runs before they are deleted:
+        # their results leave the rollups here, and the caches of their quizzes are dropped on commit
+        from src.quiz.crud import QuizCrud
+        from src.quiz.models import Quiz
+
+        quiz_ids = (await self.db_session.execute(select(Quiz.id)
+                                                  .filter(Quiz.company_id.in_(company_ids)))).scalars().all()
+
+        await QuizCrud(db_session=self.db_session).remove_results(Quiz.company_id.in_(company_ids))
+
+        clear_auth_context(self.db_session)
+        for company_id in company_ids:
+            on_commit(self.db_session, invalidate_roster, company_id=company_id)
+            on_commit(self.db_session, invalidate_quiz_catalog, company_id=company_id)
+        for quiz_id in quiz_ids:
+            on_commit(self.db_session, invalidate_quiz_caches, quiz_id=quiz_id)
 
     async def invite_user_to_company(self, user_id: int, company_id: int, current_user: User) -> Invite:
-        company = await self.get_company_by_id(company_id=company_id)
+        owner_id = await self.get_company_owner_id(company_id=company_id)
 
-        await self.user_is_owner(user_id=current_user.id, owner_id=company.owner_id)
+        await self.user_is_owner(user_id=current_user.id, owner_id=owner_id)
 
         new_invite = Invite(user_id=user_id,
                             company_id=company_id,
@@ -165,33 +280,35 @@ class CompanyCrud:
     async def add_user_to_employees(self, user_id: int, company_id: int) -> None:
         from src.user.crud import UserCrud
 
-        company = await self.get_company_by_id(company_id=company_id)
-        user = await UserCrud(db_session=self.db_session).get_user_by_id(user_id=user_id)
+        await self.company_exists(company_id=company_id)
+        await UserCrud(db_session=self.db_session).get_user_by_id(user_id=user_id)
 
-        company.employees.append(user)
+        await self.db_session.execute(insert(company_employees)
+                                      .values(company_id=company_id, user_id=user_id)
+                                      .on_conflict_do_nothing())
 
-        await self.db_session.commit()
+        invalidate_auth_context(self.db_session, user_id)
+        on_commit(self.db_session, invalidate_roster, company_id=company_id)
 
     async def remove_employee_from_company(self, employee_id: int, company_id: int, current_user: User) -> None:
         from src.user.crud import UserCrud
         user_crud = UserCrud(db_session=self.db_session)
 
-        employee = await user_crud.get_user_by_id(user_id=employee_id)
-        company = await self.get_company_by_id(company_id=company_id)
-
-        await self.if_employee_exists(employee=employee,
-                                      employee_id=employee_id)
+        await user_crud.get_user_by_id(user_id=employee_id)
+        owner_id = await self.get_company_owner_id(company_id=company_id)
 
         await self.user_is_owner(user_id=current_user.id,
-                                 owner_id=company.owner_id)
+                                 owner_id=owner_id)
 
-        await self.check_if_employee_in_company(employee=employee,
-                                                employees=company.employees,
-                                                employee_id=employee_id,
+        await self.check_if_employee_in_company(employee_id=employee_id,
                                                 company_id=company_id)
 
-        company.employees.remove(employee)
-        await self.db_session.commit()
+        await self.db_session.execute(delete(company_employees)
+                                      .where(company_employees.c.company_id == company_id,
+                                             company_employees.c.user_id == employee_id))
+
+        invalidate_auth_context(self.db_session, employee_id)
+        on_commit(self.db_session, invalidate_roster, company_id=company_id)
 
     async def get_request(self, user_id: int, company_id: int) -> Optional[Request]:
         request = (await self.db_session.execute(select(Request)
@@ -211,9 +328,9 @@ class CompanyCrud:
         user_crud = UserCrud(db_session=self.db_session)
         await user_crud.get_user_by_id(user_id=user_id)
 
-        company = await self.get_company_by_id(company_id=company_id)
+        owner_id = await self.get_company_owner_id(company_id=company_id)
 
-        await self.user_is_owner(user_id=current_user.id, owner_id=company.owner_id)
+        await self.user_is_owner(user_id=current_user.id, owner_id=owner_id)
 
         await self.get_request(user_id=user_id, company_id=company_id)
 
@@ -227,47 +344,174 @@ class CompanyCrud:
         )
 
         await self.db_session.execute(query)
-        await self.db_session.commit()
+        await self.db_session.flush()
+
+    async def resolve_bulk_users(self, users: BulkUsersScheme) -> Tuple[List[dict], List[int]]:
+        rows = (await self.db_session.execute(select(User.id, User.email)
+                                              .filter(or_(User.id.in_(set(users.user_ids)),
+                                                          User.email.in_(set(users.emails)))))).all()
+        emails_by_id = {user_id: email for user_id, email in rows}
+        ids_by_email = {email: user_id for user_id, email in rows}
+
+        items = []
+        user_ids = []
+        seen = set()
+
+        requested = [(user_id, emails_by_id.get(user_id)) for user_id in users.user_ids] + \
+                    [(ids_by_email.get(email), email) for email in users.emails]
+
+        for user_id, email in requested:
+            item = {"user_id": user_id, "email": email, "status": None, "detail": None}
+
+            if user_id is None or email is None:
+                item["status"] = "not_found"
+                item["detail"] = f"there is no user with id {user_id}" if email is None \
+                    else f"there is no user with email {email}"
+            elif user_id in seen:
+                item["status"] = "duplicate"
+                item["detail"] = f"user with id {user_id} is given more than once"
+            else:
+                seen.add(user_id)
+                user_ids.append(user_id)
+
+            items.append(item)
+
+        return items, user_ids
+
+    @staticmethod
+    def bulk_result(items: List[dict], outcomes: Dict[int, Tuple[str, Optional[str]]]) -> BulkResult:
+        summary = {}
+
+        for item in items:
+            if item["status"] is None:
+                item["status"], item["detail"] = outcomes[item["user_id"]]
+
+            summary[item["status"]] = summary.get(item["status"], 0) + 1
+
+        return BulkResult(items=[BulkItemResult(**item) for item in items], summary=summary)
+
+    async def bulk_invite_users(self, users: BulkUsersScheme, company_id: int, current_user: User) -> BulkResult:
+        owner_id = await self.get_company_owner_id(company_id=company_id)
+
+        await self.user_is_owner(user_id=current_user.id, owner_id=owner_id)
+
+        items, user_ids = await self.resolve_bulk_users(users=users)
+
+        employees = set((await self.db_session.execute(
+            select(company_employees.c.user_id)
+            .filter(company_employees.c.company_id == company_id,
+                    company_employees.c.user_id.in_(user_ids)))).scalars().all())
+        invited = set((await self.db_session.execute(
+            select(Invite.user_id)
+            .filter(Invite.company_id == company_id,
+                    Invite.user_id.in_(user_ids),
+                    Invite.is_accepted.is_(False)))).scalars().all())
+
+        outcomes = {}
+        new_invites = []
+
+        for user_id in user_ids:
+            if user_id == owner_id:
+                outcomes[user_id] = ("already_member", f"user with id {user_id} owns company with id {company_id}")
+            elif user_id in employees:
+                outcomes[user_id] = ("already_member",
+                                     f"user with id {user_id} is already an employee of company with id {company_id}")
+            elif user_id in invited:
+                outcomes[user_id] = ("already_invited",
+                                     f"user with id {user_id} is already invited to company with id {company_id}")
+            else:
+                outcomes[user_id] = ("invited", None)
+                new_invites.append({"user_id": user_id, "company_id": company_id, "is_accepted": False})
+
+        for start in range(0, len(new_invites), INSERT_BATCH_SIZE):
+            await self.db_session.execute(insert(Invite).values(new_invites[start:start + INSERT_BATCH_SIZE]))
+
+        return self.bulk_result(items=items, outcomes=outcomes)
+
+    async def bulk_accept_requests(self, users: BulkUsersScheme, company_id: int, current_user: User) -> BulkResult:
+        owner_id = await self.get_company_owner_id(company_id=company_id)
+
+        await self.user_is_owner(user_id=current_user.id, owner_id=owner_id)
+
+        items, user_ids = await self.resolve_bulk_users(users=users)
+
+        requests = dict((await self.db_session.execute(
+            select(Request.user_id, func.bool_or(Request.is_accepted.is_(False)))
+            .filter(Request.company_id == company_id, Request.user_id.in_(user_ids))
+            .group_by(Request.user_id))).all())
+
+        outcomes = {}
+        accepted = []
+
+        for user_id in user_ids:
+            if user_id not in requests:
+                outcomes[user_id] = ("no_request",
+                                     f"there is no request from user with id {user_id} to company with id {company_id}")
+            elif not requests[user_id]:
+                outcomes[user_id] = ("already_accepted",
+                                     f"request from user with id {user_id} to company with id {company_id} "
+                                     f"was already approved")
+            else:
+                outcomes[user_id] = ("accepted", None)
+                accepted.append(user_id)
+
+        if accepted:
+            await self.db_session.execute(update(Request)
+                                          .where(Request.company_id == company_id,
+                                                 Request.user_id.in_(accepted),
+                                                 Request.is_accepted.is_(False))
+                                          .values(is_accepted=True)
+                                          .execution_options(synchronize_session=False))
+
+            for start in range(0, len(accepted), INSERT_BATCH_SIZE):
+                await self.db_session.execute(insert(company_employees)
+                                              .values([{"company_id": company_id, "user_id": user_id}
+                                                       for user_id in accepted[start:start + INSERT_BATCH_SIZE]])
+                                              .on_conflict_do_nothing())
+
+            invalidate_auth_context(self.db_session, *accepted)
+            on_commit(self.db_session, invalidate_roster, company_id=company_id)
+
+        return self.bulk_result(items=items, outcomes=outcomes)
 
     async def appoint_admin(self, user_id: int, company_id: int, current_user: User) -> None:
         from src.user.crud import UserCrud
         user_crud = UserCrud(db_session=self.db_session)
 
-        user = await user_crud.get_user_by_id(user_id=user_id)
+        await user_crud.get_user_by_id(user_id=user_id)
 
-        company = await self.get_company_with_admins(company_id=company_id)
-        company_employees = await self.get_company_by_id(company_id=company_id)
+        owner_id = await self.get_company_owner_id(company_id=company_id)
 
         await self.user_is_owner(user_id=current_user.id,
-                                 owner_id=company.owner_id)
+                                 owner_id=owner_id)
 
-        await self.check_if_employee_in_company(employee=user,
-                                                employees=company_employees.employees,
-                                                employee_id=user_id,
+        await self.check_if_employee_in_company(employee_id=user_id,
                                                 company_id=company_id)
 
-        company.admins.append(user)
+        await self.db_session.execute(insert(company_admins)
+                                      .values(company_id=company_id, user_id=user_id)
+                                      .on_conflict_do_nothing())
 
-        await self.db_session.commit()
+        invalidate_auth_context(self.db_session, user_id)
+        on_commit(self.db_session, invalidate_roster, company_id=company_id)
 
     async def remove_admin_from_company(self, employee_id: int, company_id: int, current_user: User) -> None:
         from src.user.crud import UserCrud
 
         user_crud = UserCrud(db_session=self.db_session)
 
-        employee = await user_crud.get_user_by_id(user_id=employee_id)
-        company = await self.get_company_by_id(company_id=company_id)
-        company_admins = await self.get_company_with_admins(company_id=company_id)
-
-        await self.if_employee_exists(employee=employee, employee_id=employee_id)
+        await user_crud.get_user_by_id(user_id=employee_id)
+        owner_id = await self.get_company_owner_id(company_id=company_id)
 
-        await self.user_is_owner(user_id=current_user.id, owner_id=company.owner_id)
+        await self.user_is_owner(user_id=current_user.id, owner_id=owner_id)
 
-        await self.check_if_employee_in_admins(employee=employee,
-                                               admins=company_admins.admins,
-                                               employee_id=employee_id,
+        await self.check_if_employee_in_admins(employee_id=employee_id,
                                                company_id=company_id)
 
-        company_admins.admins.remove(employee)
-        await self.db_session.commit()
+        await self.db_session.execute(delete(company_admins)
+                                      .where(company_admins.c.company_id == company_id,
+                                             company_admins.c.user_id == employee_id))
+
+        invalidate_auth_context(self.db_session, employee_id)
+        on_commit(self.db_session, invalidate_roster, company_id=company_id)
 
@@ -1,20 +1,24 @@
 from sqlalchemy.orm import relationship, backref
 
 from src.database import Base
-from sqlalchemy import Column, String, Integer, ForeignKey, Table, Boolean
+from sqlalchemy import Column, String, Integer, ForeignKey, Table, Boolean, Index, PrimaryKeyConstraint
 
 
 company_employees = Table(
     "company_employees", Base.metadata,
-    Column("user_id", Integer, ForeignKey("users.id")),
-    Column("company_id", Integer, ForeignKey("companies.id"))
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("company_id", Integer, ForeignKey("companies.id"), nullable=False),
+    PrimaryKeyConstraint("company_id", "user_id", name="company_employees_pkey"),
+    Index("ix_company_employees_user_id", "user_id")
 )
 
 
 company_admins = Table(
     "company_admins", Base.metadata,
-    Column("user_id", Integer, ForeignKey("users.id")),
-    Column("company_id", Integer, ForeignKey("companies.id"))
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("company_id", Integer, ForeignKey("companies.id"), nullable=False),
+    PrimaryKeyConstraint("company_id", "user_id", name="company_admins_pkey"),
+    Index("ix_company_admins_user_id", "user_id")
 )
 
 
@@ -25,7 +29,7 @@ class Company(Base):
     title = Column(String, unique=True, nullable=False)
     description = Column(String, nullable=False)
     is_visible = Column(Boolean, nullable=False, default=True)
-    owner_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
+    owner_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
     employees = relationship("User", secondary=company_employees, back_populates="companies_employees")
     admins = relationship("User", secondary=company_admins, back_populates="companies_admins")
     quizzes = relationship("Quiz", backref=backref("company", lazy="joined"))
@@ -33,6 +37,7 @@ class Company(Base):
 
 class Invite(Base):
     __tablename__ = "invites"
+    __table_args__ = (Index("ix_invites_user_id_company_id", "user_id", "company_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete='CASCADE'))
@@ -42,6 +47,7 @@ class Invite(Base):
 
 class Request(Base):
     __tablename__ = "requests"
+    __table_args__ = (Index("ix_requests_user_id_company_id", "user_id", "company_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete='CASCADE'))
@@ -1,33 +1,41 @@
 from fastapi import APIRouter, Depends
 
 from src.auth.services import get_current_user
-from src.company.schemes import CompanyScheme, InviteScheme
-from src.database import async_session
+from src.company.schemes import BulkResult, BulkUsersScheme, CompanyScheme, InviteScheme, RosterPage
+from src.database import get_session
+from src.pagination import Page, PageParams, page_params, page_response
+from fastapi.responses import ORJSONResponse
 from src.company.crud import CompanyCrud
-from typing import List
+from typing import Optional
 from src.user.crud import UserCrud
 
-from src.quiz.schemes import QuizSchema
+from src.quiz.schemes import QuizSummary
 
 comp_router = APIRouter()
 
 
-async def get_session():
-    async with async_session() as session:
-        async with session.begin():
-            yield session
+@comp_router.get('/', response_model=Page[CompanyScheme])
+async def get_all_companies(title: Optional[str] = None, owner_id: Optional[int] = None,
+                            page: PageParams = Depends(page_params),
+                            current_user=Depends(get_current_user),
+                            session=Depends(get_session)) -> ORJSONResponse:
+    company_crud_method = CompanyCrud(db_session=session)
+
+    companies, next_cursor = await company_crud_method.get_all_companies(page=page, title=title, owner_id=owner_id)
+    return page_response(items=companies, next_cursor=next_cursor)
 
 
-@comp_router.get('/', response_model=List[CompanyScheme])
-async def get_all_companies(current_user=Depends(get_current_user),
-                            session=Depends(get_session)) -> List[CompanyScheme]:
+@comp_router.get('/roster/{company_id}', response_model=RosterPage)
+async def get_roster(company_id: int, search: Optional[str] = None,
+                     page: PageParams = Depends(page_params),
+                     current_user=Depends(get_current_user),
+                     session=Depends(get_session)) -> ORJSONResponse:
     company_crud_method = CompanyCrud(db_session=session)
 
-    companies = await company_crud_method.get_all_companies()
-    return [CompanyScheme(id=company.id,
-                          title=company.title,
-                          description=company.description,
-                          owner_id=company.owner_id) for company in companies]
+    roster = await company_crud_method.get_roster(company_id=company_id, page=page, current_user=current_user,
+                                                  search=search)
+
+    return ORJSONResponse(roster)
 
 
 @comp_router.post('/create', response_model=CompanyScheme)
@@ -40,6 +48,8 @@ async def create_company(title: str, description: str, is_visible: bool,
                                                        description=description,
                                                        is_visible=is_visible,
                                                        current_user=current_user)
+    await session.commit()
+
     return CompanyScheme(id=company.id,
                          title=company.title,
                          description=company.description,
@@ -56,6 +66,7 @@ async def change_visibility(company_id: int, is_visible: bool,
     await company_crud_method.change_visibility(company_id=company_id,
                                                 is_visible=is_visible,
                                                 current_user=current_user)
+    await session.commit()
 
     return {"changes have been applied"}
 
@@ -70,6 +81,7 @@ async def update_company(company_id: int, title: str, description: str,
                                              title=title,
                                              description=description,
                                              current_user=current_user)
+    await session.commit()
 
     return CompanyScheme(id=company_id,
                          title=title,
@@ -84,6 +96,7 @@ async def delete_company(company_id: int, current_user=Depends(get_current_user)
 
     await company_crud_method.delete_company(company_id=company_id,
                                              current_user=current_user)
+    await session.commit()
 
     return {f"company with id {company_id} has been successfully deleted"}
 
@@ -101,6 +114,7 @@ async def invite_user_to_company(user_id: int, company_id: int,
     invite = await company_crud_method.invite_user_to_company(user_id=user_id,
                                                               company_id=company_id,
                                                               current_user=current_user)
+    await session.commit()
 
     return InviteScheme(id=invite.id,
                         user_id=invite.user_id,
@@ -108,6 +122,20 @@ async def invite_user_to_company(user_id: int, company_id: int,
                         is_accepted=invite.is_accepted)
 
 
+@comp_router.post("/bulk_invite/{company_id}", response_model=BulkResult)
+async def bulk_invite_users(company_id: int, users: BulkUsersScheme,
+                            current_user=Depends(get_current_user),
+                            session=Depends(get_session)) -> BulkResult:
+    company_crud_method = CompanyCrud(db_session=session)
+
+    result = await company_crud_method.bulk_invite_users(users=users,
+                                                         company_id=company_id,
+                                                         current_user=current_user)
+    await session.commit()
+
+    return result
+
+
 @comp_router.put("/remove_employee_from_company/{employee_id}")
 async def remove_employee_from_company(employee_id: int, company_id: int,
                                        current_user=Depends(get_current_user),
@@ -117,6 +145,7 @@ async def remove_employee_from_company(employee_id: int, company_id: int,
     await company_crud_method.remove_employee_from_company(employee_id=employee_id,
                                                            company_id=company_id,
                                                            current_user=current_user)
+    await session.commit()
 
     return {f"employee with id {employee_id} has been successfully removed from company with id {company_id}"}
 
@@ -132,10 +161,25 @@ async def accept_request(user_id: int, company_id: int,
                                              current_user=current_user)
     await company_crud_method.add_user_to_employees(user_id=user_id,
                                                     company_id=company_id)
+    await session.commit()
 
     return {f"request from user with id {user_id} to company with id {company_id} was approved"}
 
 
+@comp_router.put("/bulk_accept_requests/{company_id}", response_model=BulkResult)
+async def bulk_accept_requests(company_id: int, users: BulkUsersScheme,
+                               current_user=Depends(get_current_user),
+                               session=Depends(get_session)) -> BulkResult:
+    company_crud_method = CompanyCrud(db_session=session)
+
+    result = await company_crud_method.bulk_accept_requests(users=users,
+                                                            company_id=company_id,
+                                                            current_user=current_user)
+    await session.commit()
+
+    return result
+
+
 @comp_router.put("/appoint_admin/{user_id}")
 async def appoint_admin(user_id: int, company_id: int,
                         current_user=Depends(get_current_user),
@@ -145,6 +189,7 @@ async def appoint_admin(user_id: int, company_id: int,
     await company_crud_method.appoint_admin(user_id=user_id,
                                             company_id=company_id,
                                             current_user=current_user)
+    await session.commit()
 
     return {f"user with id {user_id} was appointed as admin in company with id {company_id}"}
 
@@ -158,21 +203,22 @@ async def remove_employee_from_company(employee_id: int, company_id: int,
     await company_crud_method.remove_admin_from_company(employee_id=employee_id,
                                                         company_id=company_id,
                                                         current_user=current_user)
+    await session.commit()
 
     return {f"employee with id {employee_id} was deprived of administrator rights in company with id {company_id}"}
 
 
-@comp_router.get("get_quizzes_for_company/{company_id}")
-async def get_quizzes_for_company(company_id: int, current_user=Depends(get_current_user),
-                                  session=Depends(get_session)):
+@comp_router.get("get_quizzes_for_company/{company_id}", response_model=Page[QuizSummary])
+async def get_quizzes_for_company(company_id: int, frequency: Optional[int] = None,
+                                  page: PageParams = Depends(page_params),
+                                  current_user=Depends(get_current_user),
+                                  session=Depends(get_session)) -> ORJSONResponse:
     from src.quiz.crud import QuizCrud
 
     quiz_crud_method = QuizCrud(db_session=session)
 
-    quizzes = await quiz_crud_method.get_quizzes_for_company(company_id=company_id)
-
-    quizzes = [QuizSchema(title=quiz.title,
-                          description=quiz.description,
-                          frequency=quiz.frequency) for quiz in quizzes]
+    quizzes, next_cursor = await quiz_crud_method.get_quizzes_for_company(company_id=company_id,
+                                                                           page=page,
+                                                                           frequency=frequency)
 
-    return quizzes
+    return page_response(items=quizzes, next_cursor=next_cursor)
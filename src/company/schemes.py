@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, root_validator
+from typing import Dict, List, Optional
+
+from src.config import settings
 
 
 class CompanyScheme(BaseModel):
@@ -14,6 +16,26 @@ class CompanyScheme(BaseModel):
         orm_mode = True
 
 
+class RosterMember(BaseModel):
+    user_id: int
+    name: str
+    surname: str
+    email: str
+    role: str
+
+    class Config:
+        orm_mode = True
+
+
+class RosterPage(BaseModel):
+    items: List[RosterMember]
+    next_cursor: Optional[str]
+    total: int
+
+    class Config:
+        orm_mode = True
+
+
 class InviteScheme(BaseModel):
     id: int
     user_id: int
@@ -21,4 +43,33 @@ class InviteScheme(BaseModel):
     is_accepted: bool
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class BulkUsersScheme(BaseModel):
+    user_ids: List[int] = []
+    emails: List[str] = []
+
+    @root_validator
+    def users_are_given(cls, values: dict) -> dict:
+        count = len(values.get("user_ids", [])) + len(values.get("emails", []))
+
+        if count == 0:
+            raise ValueError("user_ids or emails have to be given")
+
+        if count > settings.BULK_MAX_USERS:
+            raise ValueError(f"at most {settings.BULK_MAX_USERS} users can be given at once")
+
+        return values
+
+
+class BulkItemResult(BaseModel):
+    user_id: Optional[int]
+    email: Optional[str]
+    status: str
+    detail: Optional[str]
+
+
+class BulkResult(BaseModel):
+    items: List[BulkItemResult]
+    summary: Dict[str, int]
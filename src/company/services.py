@@ -0,0 +1,14 @@
+from src.cache import GenerationalCache
+from src.config import settings
+
+
+# company_id -> search prefix -> member count
+roster_count_cache = GenerationalCache(maxsize=settings.ROSTER_COUNT_CACHE_SIZE, ttl=settings.ROSTER_COUNT_TTL)
+
+
+def invalidate_roster(company_id: int) -> None:
+    roster_count_cache.invalidate(company_id)
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
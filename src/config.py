@@ -14,6 +14,19 @@ class Settings:
     POSTGRES_DB: str = os.getenv("POSTGRES_DB")
     DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() == "true"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", 100))
+    DB_APPLICATION_NAME: str = os.getenv("DB_APPLICATION_NAME", "fastapi_intern_project")
+    DB_STATEMENT_TIMEOUT: int = int(os.getenv("DB_STATEMENT_TIMEOUT", 30000))
+    RATING_REBUILD_LOCK_TIMEOUT: int = int(os.getenv("RATING_REBUILD_LOCK_TIMEOUT", 5000))
+    DB_SLOW_QUERY_SECONDS: float = float(os.getenv("DB_SLOW_QUERY_SECONDS", 0.5))
+    DB_SLOW_QUERY_SAMPLE_RATE: float = float(os.getenv("DB_SLOW_QUERY_SAMPLE_RATE", 1.0))
+
     TEST_POSTGRES_USER: str = os.getenv("TEST_POSTGRES_USER")
     TEST_POSTGRES_PASSWORD: str = os.getenv("TEST_POSTGRES_PASSWORD")
     TEST_POSTGRES_DB: str = os.getenv("TEST_POSTGRES_DB")
@@ -24,16 +37,52 @@ class Settings:
     HTTP_PASSWORD: str = os.getenv("HTTP_PASSWORD")
     HTTP_USER: str = os.getenv("HTTP_USER")
 
-    REDIS_HOST: str = os.getenv("REDIS_HOST")
-    REDIS_PORT: str = os.getenv("REDIS_PORT")
+    REDIS_HOST: str = os.getenv("REDIS_HOST", "redis")
+    REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
+    REDIS_DB: int = int(os.getenv("REDIS_DB", 0))
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 5))
+    REDIS_HEALTH_CHECK_INTERVAL: int = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
 
     DOMAIN: str = os.getenv("DOMAIN")
     API_AUDIENCE: str = os.getenv("API_AUDIENCE")
     ALGORITHMS: str = os.getenv("ALGORITHMS")
     ISSUER: str = os.getenv("ISSUER")
+    JWKS_URL: str = os.getenv("JWKS_URL", f"https://{DOMAIN}/.well-known/jwks.json")
+    JWKS_FILE: str = os.getenv("JWKS_FILE")
+    JWKS_MIN_REFRESH_INTERVAL: float = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", 60))
 
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = os.getenv("ALGORITHM")
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 5))
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    BCRYPT_WORKERS: int = int(os.getenv("BCRYPT_WORKERS", 4))
+    BCRYPT_MAX_QUEUE: int = int(os.getenv("BCRYPT_MAX_QUEUE", 100))
+
+    ANSWER_KEY_CACHE_SIZE: int = int(os.getenv("ANSWER_KEY_CACHE_SIZE", 1024))
+    ANSWER_KEY_TTL: float = float(os.getenv("ANSWER_KEY_TTL", 300))
+    QUIZ_PAYLOAD_CACHE_SIZE: int = int(os.getenv("QUIZ_PAYLOAD_CACHE_SIZE", 256))
+    QUIZ_PAYLOAD_TTL: float = float(os.getenv("QUIZ_PAYLOAD_TTL", 300))
+    QUIZ_CATALOG_CACHE_SIZE: int = int(os.getenv("QUIZ_CATALOG_CACHE_SIZE", 1024))
+    QUIZ_CATALOG_TTL: float = float(os.getenv("QUIZ_CATALOG_TTL", 300))
+    EXPORT_PAGE_SIZE: int = int(os.getenv("EXPORT_PAGE_SIZE", 500))
+
+    PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", 50))
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", 500))
+
+    AUTH_CONTEXT_CACHE_SIZE: int = int(os.getenv("AUTH_CONTEXT_CACHE_SIZE", 10000))
+    AUTH_CONTEXT_TTL: float = float(os.getenv("AUTH_CONTEXT_TTL", 30))
+
+    ROSTER_COUNT_CACHE_SIZE: int = int(os.getenv("ROSTER_COUNT_CACHE_SIZE", 1024))
+    ROSTER_COUNT_TTL: float = float(os.getenv("ROSTER_COUNT_TTL", 60))
+    BULK_MAX_USERS: int = int(os.getenv("BULK_MAX_USERS", 5000))
+
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", 60))
 
 
 settings = Settings()
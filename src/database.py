@@ -1,12 +1,75 @@
-from sqlalchemy.orm import sessionmaker
+import logging
+import random
+import time
+
+from functools import partial
+from typing import AsyncIterator, Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from .config import settings
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
 
-DATABASE_URL = settings.DATABASE_URL
+# the asyncpg dialect prepares statements itself and caches them per connection; that cache is sized from the url,
+# asyncpg's own statement_cache_size only covers queries the dialect never sends
+DATABASE_URL = make_url(settings.DATABASE_URL).update_query_dict(
+    {"prepared_statement_cache_size": str(settings.DB_PREPARED_STATEMENT_CACHE_SIZE)})
 
-engine = create_async_engine(DATABASE_URL, future=True, echo=True)
+logger = logging.getLogger(__name__)
+
+engine = create_async_engine(
+    DATABASE_URL,
+    future=True,
+    echo=settings.DB_ECHO,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={
+        "server_settings": {
+            "application_name": settings.DB_APPLICATION_NAME,
+            "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT),
+        },
+    },
+)
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 Base = declarative_base()
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    # the teardown of a yield dependency runs after the response is sent, so it only closes the session;
+    # handlers that write commit themselves before returning, and anything left uncommitted is rolled back
+    async with async_session() as session:
+        yield session
+
+
+def on_commit(session: AsyncSession, callback: Callable[..., None], **kwargs) -> None:
+    session.info.setdefault("on_commit", []).append(partial(callback, **kwargs))
+
+
+@event.listens_for(Session, "after_commit")
+def run_commit_callbacks(session: Session) -> None:
+    for callback in session.info.pop("on_commit", []):
+        callback()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def drop_commit_callbacks(session: Session, previous_transaction) -> None:
+    session.info.pop("on_commit", None)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany) -> None:
+    context.query_start_time = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def log_slow_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - context.query_start_time
+
+    if elapsed >= settings.DB_SLOW_QUERY_SECONDS and random.random() < settings.DB_SLOW_QUERY_SAMPLE_RATE:
+        logger.warning("slow query took %.3fs: %s", elapsed, statement)
@@ -7,8 +7,8 @@ from src.user.router import router
 from src.auth.router import auth_router
 from src.company.router import comp_router
 from src.quiz.router import quiz_router
-import databases
-import aioredis
+from src.redis_init import redis_manager
+from src.auth.hashing import password_hasher
 from fastapi.security import HTTPBearer
 from src.database import async_session
 
@@ -29,12 +29,9 @@ app.add_middleware(
 )
 
 
-db = databases.Database(settings.DATABASE_URL)
-
-
 @app.on_event('startup')
 async def startup():
-    app.state.redis = await aioredis.from_url('redis://redis:6379')
+    await redis_manager.connect()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
@@ -42,8 +39,9 @@ async def startup():
 
 @app.on_event('shutdown')
 async def shutdown():
-    await db.disconnect()
-    await app.state.redis.close()
+    await engine.dispose()
+    await redis_manager.disconnect()
+    password_hasher.shutdown()
 
 
 @app.get("/")
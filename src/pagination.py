@@ -0,0 +1,73 @@
+import base64
+import binascii
+import json
+from typing import Generic, List, NamedTuple, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException, Query, status
+from fastapi.responses import ORJSONResponse
+from pydantic.generics import GenericModel
+from sqlalchemy.orm import Session
+
+from src.config import settings
+
+
+T = TypeVar("T")
+
+
+class PageParams(NamedTuple):
+    after: Optional[int]
+    limit: int
+
+
+class Page(GenericModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(values: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+
+    return values
+
+
+def page_params(cursor: Optional[str] = None,
+                limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX)) -> PageParams:
+    if cursor is None:
+        return PageParams(after=None, limit=limit)
+
+    after = decode_cursor(cursor).get("id")
+
+    if not isinstance(after, int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+
+    return PageParams(after=after, limit=limit)
+
+
+def page_response(items: List[dict], next_cursor: Optional[str]) -> ORJSONResponse:
+    # rows are plain column dicts already, so they are serialized once without response_model validation
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor})
+
+
+async def paginate(session: Session, query, key, page: PageParams) -> Tuple[List[dict], Optional[str]]:
+    if page.after is not None:
+        query = query.filter(key > page.after)
+
+    # one extra row tells whether there is a next page without a count(*)
+    rows = (await session.execute(query.order_by(key).limit(page.limit + 1))).mappings().all()
+
+    items = [dict(row) for row in rows[:page.limit]]
+
+    if len(rows) <= page.limit:
+        return items, None
+
+    return items, encode_cursor({"id": items[-1][key.key]})
@@ -0,0 +1,47 @@
+import argparse
+import asyncio
+
+from src.database import async_session
+from src.quiz.crud import QuizCrud, RATING_MODELS
+from src.quiz.services import migrate_legacy_attempts
+from src.redis_init import redis_manager, get_redis
+
+
+async def migrate_redis() -> None:
+    await redis_manager.connect()
+
+    try:
+        migrated = await migrate_legacy_attempts(redis=get_redis())
+        print(f"{migrated} quiz attempts have been migrated")
+    finally:
+        await redis_manager.disconnect()
+
+
+async def rebuild_ratings() -> None:
+    async with async_session() as session:
+        quiz_crud = QuizCrud(db_session=session)
+
+        # one short transaction per rollup, so submissions only ever wait for the table being rebuilt
+        for model in RATING_MODELS:
+            async with session.begin():
+                await quiz_crud.rebuild_rating(model=model)
+
+    print("quiz ratings have been rebuilt from results")
+
+
+COMMANDS = {
+    "migrate-redis": migrate_redis,
+    "rebuild-ratings": rebuild_ratings,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.quiz.commands")
+    parser.add_argument("command", choices=COMMANDS.keys())
+    args = parser.parse_args()
+
+    asyncio.run(COMMANDS[args.command]())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,42 @@
 from fastapi import HTTPException, status
-from sqlalchemy import select, delete, update
+from sqlalchemy import select, delete, update, func, text, cast, Float, and_, or_, exists, literal_column
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session, selectinload
 
-from src.quiz.models import Quiz, Question, AnswerVariant, Result
+from src.quiz.models import Quiz, Question, AnswerVariant, Result, UserRating, QuizRating, CompanyRating, \
+                            UserCompanyRating, GpaTotal
 from src.user.models import User
+from src.company.models import Company, company_admins, company_employees
 
-from src.quiz.schemes import TakeQuiz, GpaScheme
+from src.quiz.schemes import TakeQuiz, GpaScheme, AnswerRecord, QuestionDocument, QuizDocument, QuizDocumentResult
+from src.quiz.services import AnswerKey, answer_key_cache, build_answer_key, grade_answers, invalidate_quiz_caches, \
+                             read_attempt, write_attempt, QuizPayload, quiz_payload_cache, build_quiz_payload, \
+                             invalidate_quiz_catalog, quiz_catalog_cache
 
-from typing import List, Optional
+import datetime
 
-from src.redis_init import redis_client
+from typing import AsyncIterator, List, Optional, Tuple
 
-class QuizCrud:
+from src.redis_init import get_redis
+from src.config import settings
+from src.database import async_session, on_commit
+from src.pagination import PageParams, paginate
+from src.auth.permissions import get_auth_context
 
-    def __init__(self, db_session: Session):
-        self.db_session = db_session
 
-    async def create_quiz(self, company_id: int, title: str, description: str, frequency: int, current_user: User) -> Quiz:
-        from src.user.crud import UserCrud
+INSERT_BATCH_SIZE = 1000
+RATING_MODELS = (UserRating, QuizRating, CompanyRating, UserCompanyRating, GpaTotal)
+# the all-quizzes mean is spread over a few rows so submissions to different quizzes rarely wait on the same one
+GPA_TOTAL_SHARDS = 16
 
-        user_crud = UserCrud(db_session=self.db_session)
 
-        user_admin_in = await user_crud.user_admin_in(user_id=current_user.id)
-        user_owner_of = await user_crud.user_owner_of(user_id=current_user.id)
+class QuizCrud:
 
-        admin_in = [company.id for company in user_admin_in.companies_admins]
-        owner_of = [company.id for company in user_owner_of.companies]
+    def __init__(self, db_session: Session):
+        self.db_session = db_session
 
-        await user_crud.check_for_rights(company_id=company_id, admin_in=admin_in, owner_of=owner_of)
+    async def create_quiz(self, company_id: int, title: str, description: str, frequency: int, current_user: User) -> Quiz:
+        await self.check_company_rights(company_id=company_id, current_user=current_user)
 
         new_quiz = Quiz(
             company_id=company_id,
@@ -37,10 +46,81 @@ class QuizCrud:
         )
 
         self.db_session.add(new_quiz)
-        await self.db_session.commit()
+        await self.db_session.flush()
+
+        on_commit(self.db_session, invalidate_quiz_catalog, company_id=company_id)
 
         return new_quiz
 
+    async def insert_quiz_content(self, quiz_id: int, questions: List[QuestionDocument]) -> QuizDocumentResult:
+        question_ids = []
+
+        for start in range(0, len(questions), INSERT_BATCH_SIZE):
+            batch = questions[start:start + INSERT_BATCH_SIZE]
+            # ids of one multi-row insert come from the sequence in VALUES order
+            question_ids.extend(sorted((await self.db_session.execute(
+                insert(Question)
+                .values([{"quiz_id": quiz_id, "question": question.question} for question in batch])
+                .returning(Question.id))).scalars().all()))
+
+        variants = [{"question_id": question_id, "answer": variant.answer, "is_correct": variant.is_correct}
+                    for question_id, question in zip(question_ids, questions)
+                    for variant in question.variants]
+
+        for start in range(0, len(variants), INSERT_BATCH_SIZE):
+            await self.db_session.execute(insert(AnswerVariant).values(variants[start:start + INSERT_BATCH_SIZE]))
+
+        return QuizDocumentResult(quiz_id=quiz_id,
+                                  questions=len(question_ids),
+                                  variants=len(variants))
+
+    async def create_quiz_document(self, company_id: int, document: QuizDocument,
+                                   current_user: User) -> QuizDocumentResult:
+        await self.check_company_rights(company_id=company_id, current_user=current_user)
+
+        quiz_id = (await self.db_session.execute(insert(Quiz)
+                                                 .values(company_id=company_id,
+                                                         title=document.title,
+                                                         description=document.description,
+                                                         frequency=document.frequency)
+                                                 .returning(Quiz.id))).scalar_one()
+
+        on_commit(self.db_session, invalidate_quiz_catalog, company_id=company_id)
+
+        return await self.insert_quiz_content(quiz_id=quiz_id, questions=document.questions)
+
+    async def replace_quiz_document(self, quiz_id: int, document: QuizDocument, current_user: User,
+                                    reset_results: bool = False) -> QuizDocumentResult:
+        # the row lock serializes concurrent replacements of the same quiz
+        company_id = (await self.db_session.execute(select(Quiz.company_id)
+                                                    .filter(Quiz.id == quiz_id)
+                                                    .with_for_update())).scalar()
+
+        if company_id is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"there is no quiz with id {quiz_id}")
+
+        await self.check_can_manage(company_id=company_id, current_user=current_user)
+
+        await self.db_session.execute(update(Quiz)
+                                      .where(Quiz.id == quiz_id)
+                                      .values(title=document.title,
+                                              description=document.description,
+                                              frequency=document.frequency))
+
+        # variants go with their questions through ON DELETE CASCADE; results stay, as they do for
+        # update_question and update_variant, unless the caller asks to drop them with their share of the rollups
+        await self.db_session.execute(delete(Question).where(Question.quiz_id == quiz_id))
+        if reset_results:
+            await self.remove_results(Result.quiz_id == quiz_id)
+
+        result = await self.insert_quiz_content(quiz_id=quiz_id, questions=document.questions)
+
+        on_commit(self.db_session, invalidate_quiz_caches, quiz_id=quiz_id)
+        on_commit(self.db_session, invalidate_quiz_catalog, company_id=company_id)
+
+        return result
+
     async def get_quiz_by_id(self, quiz_id: int) -> Optional[Quiz]:
         quiz = (await self.db_session.execute(select(Quiz)
                                               .filter(Quiz.id == quiz_id).options(selectinload(Quiz.questions)))) \
@@ -52,15 +132,39 @@ class QuizCrud:
 
         return quiz
 
-    async def get_quizzes_for_company(self, company_id: int) -> List[Quiz]:
+    async def get_quizzes_for_company(self, company_id: int, page: PageParams,
+                                      frequency: Optional[int] = None) -> Tuple[List[dict], Optional[str]]:
         from src.company.crud import CompanyCrud
-        company_crud = CompanyCrud(db_session=self.db_session)
 
-        await company_crud.get_company_by_id(company_id=company_id)
+        key = quiz_catalog_cache.key(company_id, (page.after, page.limit, frequency))
+
+        catalog_page = quiz_catalog_cache.get(key)
+        if catalog_page is not None:
+            return catalog_page
+
+        await CompanyCrud(db_session=self.db_session).company_exists(company_id=company_id)
 
-        quizzes = (await self.db_session.execute(select(Quiz).filter(company_id == company_id))).scalars().all()
+        questions = select(func.count(Question.id)).where(Question.quiz_id == Quiz.id).scalar_subquery()
 
-        return quizzes
+        query = select(Quiz.id, Quiz.title, Quiz.frequency, questions.label("questions"), Quiz.updated_at)\
+            .filter(Quiz.company_id == company_id)
+
+        if frequency is not None:
+            query = query.filter(Quiz.frequency == frequency)
+
+        catalog_page = await paginate(session=self.db_session, query=query, key=Quiz.id, page=page)
+
+        quiz_catalog_cache.set(key, catalog_page)
+
+        return catalog_page
+
+    async def touch_quiz(self, quiz_id: int, company_id: int) -> None:
+        # question and variant edits change what the catalog shows for the quiz
+        await self.db_session.execute(update(Quiz)
+                                      .where(Quiz.id == quiz_id)
+                                      .values(updated_at=datetime.datetime.now()))
+
+        on_commit(self.db_session, invalidate_quiz_catalog, company_id=company_id)
 
     async def create_question(self, quiz_id: int, question: str) -> Question:
         quiz = await self.get_quiz_by_id(quiz_id=quiz_id)
@@ -69,7 +173,10 @@ class QuizCrud:
                                 question=question)
 
         self.db_session.add(new_question)
-        await self.db_session.commit()
+        await self.db_session.flush()
+
+        await self.touch_quiz(quiz_id=quiz_id, company_id=quiz.company_id)
+        on_commit(self.db_session, invalidate_quiz_caches, quiz_id=quiz_id)
 
         return new_question
 
@@ -86,55 +193,36 @@ class QuizCrud:
         return question
 
     async def create_variant(self, question_id: int, answer: str, is_correct: bool) -> AnswerVariant:
-        await self.get_question_by_id(question_id=question_id)
+        question = await self.get_question_by_id(question_id=question_id)
 
         new_variant = AnswerVariant(question_id=question_id,
                                     answer=answer,
                                     is_correct=is_correct)
 
         self.db_session.add(new_variant)
-        await self.db_session.commit()
+        await self.db_session.flush()
+
+        await self.touch_quiz(quiz_id=question.quiz_id, company_id=question.quiz.company_id)
+        on_commit(self.db_session, invalidate_quiz_caches, quiz_id=question.quiz_id)
 
         return new_variant
 
     async def delete_quiz(self, quiz_id: int, current_user: User) -> None:
-        from src.company.crud import CompanyCrud
-        from src.user.crud import UserCrud
-
         quiz = await self.get_quiz_by_id(quiz_id=quiz_id)
 
-        company_crud_method = CompanyCrud(db_session=self.db_session)
-        user_crud = UserCrud(db_session=self.db_session)
-
-        await company_crud_method.get_company_by_id(company_id=quiz.company_id)
-
-        user_admin_in = await user_crud.user_admin_in(user_id=current_user.id)
-        user_owner_of = await user_crud.user_owner_of(user_id=current_user.id)
-
-        admin_in = [company.id for company in user_admin_in.companies_admins]
-        owner_of = [company.id for company in user_owner_of.companies]
-
-        await user_crud.check_for_rights(company_id=quiz.company_id, admin_in=admin_in, owner_of=owner_of)
+        await self.check_company_rights(company_id=quiz.company_id, current_user=current_user)
 
+        await self.remove_results(Result.quiz_id == quiz_id)
         await self.db_session.execute(delete(Quiz).filter(Quiz.id == quiz_id))
-        await self.db_session.commit()
+        await self.db_session.flush()
 
-    async def update_quiz(self, quiz_id: int, title: str, description: str, frequency: int, current_user: User) -> None:
-        from src.company.crud import CompanyCrud
+        on_commit(self.db_session, invalidate_quiz_caches, quiz_id=quiz_id)
+        on_commit(self.db_session, invalidate_quiz_catalog, company_id=quiz.company_id)
 
+    async def update_quiz(self, quiz_id: int, title: str, description: str, frequency: int, current_user: User) -> None:
         quiz = await self.get_quiz_by_id(quiz_id=quiz_id)
 
-        company_crud_method = CompanyCrud(db_session=self.db_session)
-
-        company = await company_crud_method.get_company_by_id(company_id=quiz.company_id)
-        comp = await company_crud_method.get_company_with_admins(company_id=quiz.company_id)
-
-        admins_ids = [admin.id for admin in comp.admins]
-
-        if current_user.id != company.owner_id:
-            if current_user.id not in admins_ids:
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                                    detail="you have no access")
+        await self.check_can_manage(company_id=quiz.company_id, current_user=current_user)
 
         query = (
             update(Quiz)
@@ -147,25 +235,16 @@ class QuizCrud:
                 .execution_options(synchronize_session="fetch")
         )
         await self.db_session.execute(query)
-        await self.db_session.commit()
+        await self.db_session.flush()
 
-    async def update_question(self, question_id: int, question: str, current_user: User) -> None:
-        from src.company.crud import CompanyCrud
+        on_commit(self.db_session, invalidate_quiz_caches, quiz_id=quiz_id)
+        on_commit(self.db_session, invalidate_quiz_catalog, company_id=quiz.company_id)
 
+    async def update_question(self, question_id: int, question: str, current_user: User) -> None:
         question_from_db = await self.get_question_by_id(question_id=question_id)
 
-        company_crud_method = CompanyCrud(db_session=self.db_session)
-
         quiz = await self.get_quiz_by_id(quiz_id=question_from_db.quiz_id)
-        company = await company_crud_method.get_company_by_id(company_id=quiz.company_id)
-        comp = await company_crud_method.get_company_with_admins(company_id=quiz.company_id)
-
-        admins_ids = [admin.id for admin in comp.admins]
-
-        if current_user.id != company.owner_id:
-            if current_user.id not in admins_ids:
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                                    detail="you have no access")
+        await self.check_can_manage(company_id=quiz.company_id, current_user=current_user)
 
         query = (
             update(Question)
@@ -176,7 +255,10 @@ class QuizCrud:
                 .execution_options(synchronize_session="fetch")
         )
         await self.db_session.execute(query)
-        await self.db_session.commit()
+        await self.db_session.flush()
+
+        await self.touch_quiz(quiz_id=quiz.id, company_id=quiz.company_id)
+        on_commit(self.db_session, invalidate_quiz_caches, quiz_id=question_from_db.quiz_id)
 
     async def get_variant(self, variant_id: int) -> Optional[AnswerVariant]:
         variant = (await self.db_session.execute(select(AnswerVariant)
@@ -190,24 +272,12 @@ class QuizCrud:
         return variant
 
     async def update_variant(self, variant_id: int, answer: str, is_correct: bool, current_user: User) -> None:
-        from src.company.crud import CompanyCrud
-
         variant_from_db = await self.get_variant(variant_id=variant_id)
 
         question_from_db = await self.get_question_by_id(question_id=variant_from_db.question_id)
 
-        company_crud_method = CompanyCrud(db_session=self.db_session)
-
         quiz = await self.get_quiz_by_id(quiz_id=question_from_db.quiz_id)
-        company = await company_crud_method.get_company_by_id(company_id=quiz.company_id)
-        comp = await company_crud_method.get_company_with_admins(company_id=quiz.company_id)
-
-        admins_ids = [admin.id for admin in comp.admins]
-
-        if current_user.id != company.owner_id:
-            if current_user.id not in admins_ids:
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                                    detail="you have no access")
+        await self.check_can_manage(company_id=quiz.company_id, current_user=current_user)
 
         query = (
             update(AnswerVariant)
@@ -219,93 +289,261 @@ class QuizCrud:
             .execution_options(synchronize_session="fetch")
         )
         await self.db_session.execute(query)
-        await self.db_session.commit()
+        await self.db_session.flush()
+
+        await self.touch_quiz(quiz_id=quiz.id, company_id=quiz.company_id)
+        on_commit(self.db_session, invalidate_quiz_caches, quiz_id=question_from_db.quiz_id)
 
     async def get_gpa_for_all_quizzes(self) -> dict[str]:
-        quizzes = (await self.db_session.execute(select(Result))).scalars().all()
+        return await self.get_mean_gpa(GpaTotal)
 
-        all_gpa = [quiz.gpa for quiz in quizzes]
+    async def get_gpa_for_one_quiz(self, quiz_id: int) -> dict[str]:
+        return await self.get_mean_gpa(QuizRating, QuizRating.quiz_id == quiz_id)
 
-        return {"gpa": sum(all_gpa)/len(all_gpa)}
+    async def get_all_results(self, page: PageParams, user_id: Optional[int] = None,
+                              quiz_id: Optional[int] = None) -> Tuple[List[dict], Optional[str]]:
+        query = select(Result.id, Result.user_id, Result.quiz_id, Result.correct_answers, Result.all_answers, Result.gpa)
 
-    async def get_gpa_for_one_quiz(self, quiz_id: int) -> dict[str]:
-        quizzes = (await self.db_session.execute(select(Result).filter(Result.quiz_id == quiz_id))).scalars().all()
+        if user_id is not None:
+            query = query.filter(Result.user_id == user_id)
+        if quiz_id is not None:
+            query = query.filter(Result.quiz_id == quiz_id)
 
-        all_gpa = [quiz.gpa for quiz in quizzes]
+        return await paginate(session=self.db_session, query=query, key=Result.id, page=page)
 
-        return {f"gpa": sum(all_gpa)/len(all_gpa)}
+    async def get_answer_key(self, quiz_id: int) -> AnswerKey:
+        # taken before the select, so a key read across an edit's commit is stored under the old generation
+        key = answer_key_cache.key(quiz_id)
+        answer_key = answer_key_cache.get(key)
 
-    async def get_all_results(self) -> List[Result]:
-        res = (await self.db_session.execute(select(Result))).scalars().all()
+        if answer_key is not None:
+            return answer_key
 
-        return res
+        rows = (await self.db_session.execute(select(Quiz.company_id, Question.id, Question.question,
+                                                     AnswerVariant.answer, AnswerVariant.is_correct)
+                                              .select_from(Quiz)
+                                              .outerjoin(Question, Question.quiz_id == Quiz.id)
+                                              .outerjoin(AnswerVariant, AnswerVariant.question_id == Question.id)
+                                              .filter(Quiz.id == quiz_id)
+                                              .order_by(Question.id, AnswerVariant.id))).all()
 
-    async def pass_quiz(self, quiz: TakeQuiz, current_user: User) -> dict:
-        res = {'all_answers': 0,
-               'correct_answers': 0}
+        answer_key = build_answer_key(quiz_id=quiz_id, rows=rows)
+
+        if answer_key is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"there is no quiz with id {quiz_id}")
+
+        answer_key_cache.set(key, answer_key)
+
+        return answer_key
+
+    async def get_quiz_payload(self, quiz_id: int) -> QuizPayload:
+        key = quiz_payload_cache.key(quiz_id)
+        payload = quiz_payload_cache.get(key)
+
+        if payload is not None:
+            return payload
+
+        rows = (await self.db_session.execute(select(Quiz.id, Quiz.company_id, Quiz.title, Quiz.description,
+                                                     Quiz.frequency, Question.id, Question.question,
+                                                     AnswerVariant.answer)
+                                              .select_from(Quiz)
+                                              .outerjoin(Question, Question.quiz_id == Quiz.id)
+                                              .outerjoin(AnswerVariant, AnswerVariant.question_id == Question.id)
+                                              .filter(Quiz.id == quiz_id)
+                                              .order_by(Question.id, AnswerVariant.id))).all()
 
-        quiz_from_db = (await self.db_session.execute(select(Quiz).filter(Quiz.id == quiz.quiz_id).options(selectinload(Quiz.questions)))).scalars().first()
+        payload = build_quiz_payload(rows=rows)
 
-        if quiz_from_db.company_id != quiz.company_id:
+        if payload is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                                detail=f"there is no quiz with id {quiz_from_db.company_id} in company with id {quiz.company_id}")
-        if len(quiz_from_db.questions) < 2:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                detail="you cannot pas the quiz which contains less than two questions")
+                                detail=f"there is no quiz with id {quiz_id}")
 
-        for index, question in enumerate(quiz_from_db.questions):
-            question_from_db = (await self.db_session.execute(select(Question).filter(Question.id == question.id).options(selectinload(Question.variants)))).scalars().first()
+        quiz_payload_cache.set(key, payload)
 
-            if len(question_from_db.variants) < 2:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                    detail="you cannot answer for question which contains less than two options")
+        return payload
 
-            correct_answer = (await self.db_session.execute(select(AnswerVariant).filter(AnswerVariant.question_id == question.id, AnswerVariant.is_correct == True))).scalars().first()
+    async def get_quiz_for_taker(self, quiz_id: int, current_user: User) -> QuizPayload:
+        payload = await self.get_quiz_payload(quiz_id=quiz_id)
 
-            is_correct = True if correct_answer.answer == quiz.answers[index] else False
+        await self.check_is_member(company_id=payload.company_id, current_user=current_user)
 
-            redis_client.set(name=f'quiz-u{current_user.id}-quiz{quiz.quiz_id}-question{index + 1}',
-                             value=str({question_from_db.question: quiz.answers[index],
-                                        "is_correct": is_correct}),
-                             ex=60 * 60 * 24 * 2)
+        return payload
 
-            if is_correct:
-                res['all_answers'] += 1
-                res['correct_answers'] += 1
-            else:
-                res['all_answers'] += 1
+    async def pass_quiz(self, quiz: TakeQuiz, current_user: User) -> dict:
+        answer_key = await self.get_answer_key(quiz_id=quiz.quiz_id)
 
-        result = (await self.db_session.execute(select(Result)
-                                                .filter(Result.user_id == current_user.id,
-                                                        Result.quiz_id == quiz.quiz_id))) \
-                                                .scalars().first()
+        if answer_key.company_id != quiz.company_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"there is no quiz with id {quiz.quiz_id} in company with id {quiz.company_id}")
+        if len(answer_key.questions) < 2:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="you cannot pas the quiz which contains less than two questions")
+        if any(question.variants_count < 2 for question in answer_key.questions):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="you cannot answer for question which contains less than two options")
+        if len(quiz.answers) < len(answer_key.questions):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"you have to answer all {len(answer_key.questions)} questions")
 
-        if result is None:
-            new_result = Result(
-                user_id=current_user.id,
-                quiz_id=quiz.quiz_id,
-                all_answers=res['all_answers'],
-                correct_answers=res['correct_answers'],
-                gpa=res['correct_answers']/res['all_answers']
-            )
-            self.db_session.add(new_result)
-            await self.db_session.commit()
-        else:
-            query = (
-                update(Result)
-                .where(Result.user_id == current_user.id,
-                       Result.quiz_id == quiz.quiz_id)
-                .values(
-                    correct_answers=result.correct_answers + res['correct_answers'],
-                    all_answers=result.all_answers + res['all_answers'],
-                    gpa=(result.correct_answers + res['correct_answers'])/(result.all_answers + res['all_answers'])
-                )
-                .execution_options(synchronize_session="fetch")
+        res, records = grade_answers(answer_key=answer_key, answers=quiz.answers)
+
+        await write_attempt(redis=get_redis(), user_id=current_user.id, quiz_id=quiz.quiz_id, records=records)
+
+        gpa_delta, results_delta = await self.upsert_result(user_id=current_user.id, quiz_id=quiz.quiz_id, res=res)
+        await self.increment_ratings(user_id=current_user.id, quiz_id=quiz.quiz_id, company_id=answer_key.company_id,
+                                     deltas={"correct_answers": res['correct_answers'],
+                                             "all_answers": res['all_answers'],
+                                             "gpa_sum": gpa_delta,
+                                             "results": results_delta})
+        await self.db_session.flush()
+
+        return res
+
+    async def upsert_result(self, user_id: int, quiz_id: int, res: dict) -> Tuple[float, int]:
+        query = insert(Result).values(user_id=user_id,
+                                      quiz_id=quiz_id,
+                                      correct_answers=res['correct_answers'],
+                                      all_answers=res['all_answers'],
+                                      gpa=res['correct_answers']/res['all_answers'])
+        correct_answers = Result.correct_answers + query.excluded.correct_answers
+        all_answers = Result.all_answers + query.excluded.all_answers
+
+        # the row lock taken by ON CONFLICT makes concurrent submissions add up instead of overwriting each other
+        query = query.on_conflict_do_update(
+            constraint="uq_results_user_id_quiz_id",
+            set_={"correct_answers": correct_answers,
+                  "all_answers": all_answers,
+                  "gpa": cast(correct_answers, Float) / all_answers}
+        ).returning(Result.correct_answers, Result.all_answers, Result.gpa)
+
+        correct_answers, all_answers, gpa = (await self.db_session.execute(query)).one()
+
+        # the row before this submission is the returned one minus what was just added
+        previous_all_answers = all_answers - res['all_answers']
+        if previous_all_answers == 0:
+            return gpa, 1
+
+        return gpa - (correct_answers - res['correct_answers']) / previous_all_answers, 0
+
+    async def increment_rating(self, model, rows: List[dict]) -> None:
+        keys = [column.key for column in model.__table__.primary_key]
+
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            query = insert(model).values(rows[start:start + INSERT_BATCH_SIZE])
+            query = query.on_conflict_do_update(
+                index_elements=keys,
+                set_={column: getattr(model, column) + getattr(query.excluded, column)
+                      for column in rows[0] if column not in keys}
             )
+
             await self.db_session.execute(query)
-            await self.db_session.commit()
 
-        return res
+    async def increment_ratings(self, user_id: int, quiz_id: int, company_id: int, deltas: dict) -> None:
+        counts = {"correct_answers": deltas["correct_answers"], "all_answers": deltas["all_answers"]}
+        gpa = {"gpa_sum": deltas["gpa_sum"], "results": deltas["results"]}
+
+        await self.increment_rating(model=UserRating, rows=[{"user_id": user_id, **counts}])
+        await self.increment_rating(model=QuizRating, rows=[{"quiz_id": quiz_id, **counts, **gpa}])
+        await self.increment_rating(model=CompanyRating, rows=[{"company_id": company_id, **counts}])
+        await self.increment_rating(model=UserCompanyRating,
+                                    rows=[{"user_id": user_id, "company_id": company_id, **counts}])
+        await self.increment_rating(model=GpaTotal, rows=[{"shard": quiz_id % GPA_TOTAL_SHARDS, **gpa}])
+
+    async def remove_results(self, *criteria) -> None:
+        # the removed rows are subtracted from every rollup in the same transaction
+        removed = (await self.db_session.execute(delete(Result)
+                                                 .where(Result.quiz_id == Quiz.id, *criteria)
+                                                 .returning(Result.user_id, Result.quiz_id, Quiz.company_id,
+                                                            Result.correct_answers, Result.all_answers,
+                                                            Result.gpa)
+                                                 .execution_options(synchronize_session=False))).all()
+
+        if not removed:
+            return
+
+        rollups = {model: {} for model in RATING_MODELS}
+
+        for user_id, quiz_id, company_id, correct_answers, all_answers, gpa in removed:
+            counts = {"correct_answers": -(correct_answers or 0), "all_answers": -(all_answers or 0)}
+            mean = {"gpa_sum": -(gpa or 0.0), "results": -1}
+
+            for model, key, deltas in ((UserRating, (("user_id", user_id),), counts),
+                                       (QuizRating, (("quiz_id", quiz_id),), {**counts, **mean}),
+                                       (CompanyRating, (("company_id", company_id),), counts),
+                                       (UserCompanyRating, (("user_id", user_id), ("company_id", company_id)), counts),
+                                       (GpaTotal, (("shard", quiz_id % GPA_TOTAL_SHARDS),), mean)):
+                row = rollups[model].setdefault(key, {**dict(key), **{column: 0 for column in deltas}})
+                for column, delta in deltas.items():
+                    row[column] += delta
+
+        for model, rows in rollups.items():
+            await self.increment_rating(model=model, rows=list(rows.values()))
+
+    async def get_rating(self, model, *criteria) -> dict[str]:
+        correct_answers, all_answers = (await self.db_session.execute(select(func.sum(model.correct_answers),
+                                                                             func.sum(model.all_answers))
+                                                                      .filter(*criteria))).one()
+
+        return {"gpa": correct_answers/all_answers if all_answers else 0.0}
+
+    async def get_mean_gpa(self, model, *criteria) -> dict[str]:
+        gpa_sum, results = (await self.db_session.execute(select(func.sum(model.gpa_sum),
+                                                                 func.sum(model.results))
+                                                          .filter(*criteria))).one()
+
+        return {"gpa": gpa_sum/results if results else 0.0}
+
+    async def get_user_rating(self, user_id: int) -> dict[str]:
+        return await self.get_rating(UserRating, UserRating.user_id == user_id)
+
+    async def get_company_rating(self, company_id: int) -> dict[str]:
+        return await self.get_rating(CompanyRating, CompanyRating.company_id == company_id)
+
+    async def get_user_rating_in_company(self, user_id: int, company_id: int) -> dict[str]:
+        return await self.get_rating(UserCompanyRating,
+                                     UserCompanyRating.user_id == user_id,
+                                     UserCompanyRating.company_id == company_id)
+
+    def rating_totals(self, model):
+        counts = (func.coalesce(func.sum(Result.correct_answers), 0),
+                  func.coalesce(func.sum(Result.all_answers), 0))
+        gpa = (func.coalesce(func.sum(Result.gpa), 0), func.count(Result.id))
+
+        if model is UserRating:
+            return ["user_id", "correct_answers", "all_answers"], \
+                select(Result.user_id, *counts).group_by(Result.user_id)
+        if model is QuizRating:
+            return ["quiz_id", "correct_answers", "all_answers", "gpa_sum", "results"], \
+                select(Result.quiz_id, *counts, *gpa).group_by(Result.quiz_id)
+        if model is CompanyRating:
+            return ["company_id", "correct_answers", "all_answers"], \
+                select(Quiz.company_id, *counts).join(Quiz, Quiz.id == Result.quiz_id)\
+                .filter(Quiz.company_id.isnot(None)).group_by(Quiz.company_id)
+        if model is UserCompanyRating:
+            return ["user_id", "company_id", "correct_answers", "all_answers"], \
+                select(Result.user_id, Quiz.company_id, *counts).join(Quiz, Quiz.id == Result.quiz_id)\
+                .filter(Quiz.company_id.isnot(None)).group_by(Result.user_id, Quiz.company_id)
+
+        # inlined so that the select and group by render the same expression instead of two bound parameters
+        shard = Result.quiz_id % literal_column(str(GPA_TOTAL_SHARDS))
+        return ["shard", "gpa_sum", "results"], select(shard, *gpa).group_by(shard)
+
+    async def rebuild_rating(self, model) -> None:
+        # the aggregate over every result can outlast the app's statement_timeout; the lock wait is bounded instead,
+        # since submissions to this rollup queue behind the waiting lock request
+        await self.db_session.execute(text("SET LOCAL statement_timeout = 0"))
+        await self.db_session.execute(text(f"SET LOCAL lock_timeout = {int(settings.RATING_REBUILD_LOCK_TIMEOUT)}"))
+
+        # EXCLUSIVE still lets the GPA endpoints read, and results stay writable. Submissions write results before
+        # rollups, so one that is in flight either committed before the lock was granted and is counted here, or
+        # waits for it and adds its own delta on top of the rebuilt row
+        await self.db_session.execute(text(f"LOCK TABLE {model.__tablename__} IN EXCLUSIVE MODE"))
+
+        columns, totals = self.rating_totals(model)
+
+        await self.db_session.execute(delete(model))
+        await self.db_session.execute(insert(model).from_select(columns, totals))
 
     async def get_quiz_with_questions(self, quiz_id: int):
         quiz = (await self.db_session.execute(select(Quiz).filter(Quiz.id == quiz_id)
@@ -318,89 +556,142 @@ class QuizCrud:
 
         return quiz
 
-    async def get_redis_results(self, quiz_id: int, current_user: User) -> list:
-        quiz = await self.get_quiz_with_questions(quiz_id=quiz_id)
+    async def get_redis_results(self, quiz_id: int, current_user: User) -> List[AnswerRecord]:
+        await self.get_quiz_with_questions(quiz_id=quiz_id)
 
-        res = []
+        return await read_attempt(redis=get_redis(), user_id=current_user.id, quiz_id=quiz_id)
 
-        for i in range(len(quiz.questions)):
-            res.append(redis_client.get(name=f"quiz-u{current_user.id}-quiz{quiz_id}-question{i + 1}"))
-
-        return res
-
-    async def export_employee_results(self, quiz_id: int, employee_id: int, company_id: int, current_user: User) -> list:
+    async def export_employee_results(self, quiz_id: int, employee_id: int, company_id: int, current_user: User) -> List[AnswerRecord]:
         from src.company.crud import CompanyCrud
-        from src.user.crud import UserCrud
 
-        company_crud = CompanyCrud(db_session=self.db_session)
-        user_crud = UserCrud(db_session=self.db_session)
-
-        await company_crud.get_company_by_id(company_id=company_id)
-
-        user_admin_in = await user_crud.user_admin_in(user_id=current_user.id)
-        user_owner_of = await user_crud.user_owner_of(user_id=current_user.id)
-
-        admin_in = [company.id for company in user_admin_in.companies_admins]
-        owner_of = [company.id for company in user_owner_of.companies]
+        await self.check_company_rights(company_id=company_id, current_user=current_user)
 
-        await user_crud.check_for_rights(company_id=company_id, admin_in=admin_in, owner_of=owner_of)
-
-        quiz = await self.get_quiz_with_questions(quiz_id=quiz_id)
-
-        res = []
+        # managing a company does not open the answers of users outside it
+        if await CompanyCrud(db_session=self.db_session).get_role(user_id=employee_id, company_id=company_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"there is no employee with id {employee_id} in company with id {company_id}")
 
-        for i in range(len(quiz.questions)):
-            res.append(redis_client.get(name=f"quiz-u{employee_id}-quiz{quiz_id}-question{i + 1}"))
+        await self.get_quiz_with_questions(quiz_id=quiz_id)
 
-        return res
+        return await read_attempt(redis=get_redis(), user_id=employee_id, quiz_id=quiz_id)
 
-    async def get_employee_id_with_time(self, company_id: int, quiz_id: int, current_user: User) -> list:
+    async def check_company_rights(self, company_id: int, current_user: User) -> None:
         from src.company.crud import CompanyCrud
         from src.user.crud import UserCrud
 
-        company_crud = CompanyCrud(db_session=self.db_session)
-        user_crud = UserCrud(db_session=self.db_session)
+        context = await get_auth_context(session=self.db_session, user_id=current_user.id)
 
-        await company_crud.get_company_by_id(company_id=company_id)
+        if not context.can_manage(company_id):
+            # an unknown company is still reported as 404, but only off the happy path
+            await CompanyCrud(db_session=self.db_session).company_exists(company_id=company_id)
 
-        user_admin_in = await user_crud.user_admin_in(user_id=current_user.id)
-        user_owner_of = await user_crud.user_owner_of(user_id=current_user.id)
+        await UserCrud(db_session=self.db_session).check_for_rights(company_id=company_id,
+                                                                    admin_in=context.admin_in,
+                                                                    owner_of=context.owner_of)
 
-        admin_in = [company.id for company in user_admin_in.companies_admins]
-        owner_of = [company.id for company in user_owner_of.companies]
+    async def check_can_manage(self, company_id: int, current_user: User) -> None:
+        context = await get_auth_context(session=self.db_session, user_id=current_user.id)
 
-        await user_crud.check_for_rights(company_id=company_id, admin_in=admin_in, owner_of=owner_of)
+        if not context.can_manage(company_id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                                detail="you have no access")
 
-        company_with_employees = await company_crud.get_company_with_employees(company_id=company_id)
+    async def check_is_member(self, company_id: int, current_user: User) -> None:
+        context = await get_auth_context(session=self.db_session, user_id=current_user.id)
 
-        res = []
+        if not context.is_member(company_id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                                detail="you have no access")
 
-        for employee in company_with_employees.employees:
-            result = (await self.db_session.execute(select(Result)
-                                                    .filter(Result.user_id == employee.id,
-                                                            Result.quiz_id == quiz_id)))\
-                                                    .scalars().first()
+    async def get_company_attempts(self, company_id: int, after: int, limit: int,
+                                   date_from: Optional[datetime.date] = None,
+                                   date_to: Optional[datetime.date] = None) -> List[Tuple[int, int, int]]:
+        # answers of users who have left the company are not exported, their results still count in the ratings
+        is_member = or_(exists().where(company_employees.c.company_id == company_id,
+                                       company_employees.c.user_id == Result.user_id),
+                        exists().where(company_admins.c.company_id == company_id,
+                                       company_admins.c.user_id == Result.user_id),
+                        exists().where(Company.id == company_id, Company.owner_id == Result.user_id))
 
-            res.append({"user_id": employee.id,
-                        "time": result.datetime})
+        query = select(Result.id, Result.user_id, Result.quiz_id) \
+            .join(Quiz, Quiz.id == Result.quiz_id) \
+            .filter(Quiz.company_id == company_id, Result.id > after, is_member) \
+            .order_by(Result.id) \
+            .limit(limit)
 
-        return res
+        if date_from is not None:
+            query = query.filter(Result.datetime >= date_from)
+        if date_to is not None:
+            query = query.filter(Result.datetime <= date_to)
 
-    async def get_gpa_of_all_users_with_time(self) -> dict:
-        results = await self.get_all_results()
+        return (await self.db_session.execute(query)).all()
 
-        res = {}
+    async def check_quiz_in_company(self, quiz_id: int, company_id: int) -> None:
+        quiz_company_id = (await self.db_session.execute(select(Quiz.company_id)
+                                                         .filter(Quiz.id == quiz_id))).scalar()
 
-        for item in results:
+        if quiz_company_id != company_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"there is no quiz with id {quiz_id} in company with id {company_id}")
+
+    def completion_query(self, company_id: int, quiz_id: int):
+        # every employee appears once, the unique (user_id, quiz_id) result is joined when it exists
+        return select(company_employees.c.user_id,
+                      (Result.id != None).label("taken"),
+                      Result.datetime.label("date"),
+                      Result.correct_answers,
+                      Result.all_answers,
+                      Result.gpa)\
+            .select_from(company_employees)\
+            .outerjoin(Result, and_(Result.user_id == company_employees.c.user_id,
+                                    Result.quiz_id == quiz_id))\
+            .filter(company_employees.c.company_id == company_id)
+
+    async def get_completion_summary(self, company_id: int, quiz_id: int) -> dict:
+        report = self.completion_query(company_id=company_id, quiz_id=quiz_id).subquery()
+
+        employees, completed = (await self.db_session.execute(select(func.count(),
+                                                                     func.count().filter(report.c.taken)))).one()
+
+        return {"employees": employees,
+                "completed": completed,
+                "completion_rate": completed / employees if employees else 0.0}
+
+    async def get_completion_report(self, company_id: int, quiz_id: int, page: PageParams,
+                                    current_user: User) -> dict:
+        await self.check_company_rights(company_id=company_id, current_user=current_user)
+        await self.check_quiz_in_company(quiz_id=quiz_id, company_id=company_id)
+
+        items, next_cursor = await paginate(session=self.db_session,
+                                            query=self.completion_query(company_id=company_id, quiz_id=quiz_id),
+                                            key=company_employees.c.user_id,
+                                            page=page)
+
+        # the summary scans the whole company, so it is only computed for the first page
+        summary = None
+        if page.after is None:
+            summary = await self.get_completion_summary(company_id=company_id, quiz_id=quiz_id)
+
+        return {"items": items,
+                "next_cursor": next_cursor,
+                "summary": summary}
 
-            if f"{item.user_id}" in res.keys():
-                res[f"{item.user_id}"] = {"gpa": (res[f"{item.user_id}"]["gpa"] + (item.correct_answers/item.all_answers))/2,
-                                          "date": item.datetime}
+    async def get_employee_id_with_time(self, company_id: int, quiz_id: int, current_user: User) -> list:
+        await self.check_company_rights(company_id=company_id, current_user=current_user)
 
-            res[f"{item.user_id}"] = {"gpa": item.correct_answers/item.all_answers,
-                                      "date": item.datetime}
+        rows = (await self.db_session.execute(self.completion_query(company_id=company_id, quiz_id=quiz_id)
+                                              .order_by(company_employees.c.user_id))).all()
 
-        return res
+        return [{"user_id": row.user_id,
+                 "time": row.date} for row in rows]
+
+    async def get_gpa_of_all_users_with_time(self) -> dict:
+        results = (await self.db_session.execute(select(Result.user_id,
+                                                        func.avg(Result.gpa),
+                                                        func.max(Result.datetime))
+                                                 .group_by(Result.user_id))).all()
+
+        return {f"{user_id}": {"gpa": gpa, "date": date} for user_id, gpa, date in results}
 
     async def get_user_results(self, user_id: int) -> list:
         from src.user.crud import UserCrud
@@ -413,32 +704,42 @@ class QuizCrud:
         return results
 
     async def get_gpa_for_each_quiz(self) -> dict:
-        results = await self.get_all_results()
+        results = (await self.db_session.execute(select(Result.quiz_id,
+                                                        func.sum(Result.gpa),
+                                                        func.count(Result.id),
+                                                        func.max(Result.datetime))
+                                                 .group_by(Result.quiz_id))).all()
 
-        res = {}
+        return {f"{quiz_id}": {"gpa": gpa, "times": times, "time": time}
+                for quiz_id, gpa, times, time in results}
 
-        for item in results:
+    async def get_all_quizzes_with_time(self) -> dict:
+        results = (await self.db_session.execute(select(Result.quiz_id, func.max(Result.datetime))
+                                                 .group_by(Result.quiz_id))).all()
 
-            if res[f"{item.quiz_id}"] in res.keys():
-                res[f"{item.quiz_id}"] = {"gpa": res[f"{item.quiz_id}"]["gpa"] + item.gpa,
-                                          "times": res[f"{item.quiz_id}"]["times"] + 1,
-                                          "time": item.datetime}
+        return {f"{quiz_id}": time for quiz_id, time in results}
 
-            res[f"{item.quiz_id}"] = {"gpa": item.gpa,
-                                      "times": 1,
-                                      "time": item.datetime}
 
-        return res
+async def iter_company_attempts(company_id: int, date_from: Optional[datetime.date] = None,
+                                date_to: Optional[datetime.date] = None,
+                                page_size: Optional[int] = None) -> AsyncIterator[List[Tuple[int, int]]]:
+    page_size = page_size or settings.EXPORT_PAGE_SIZE
+    last_id = 0
 
-    async def get_all_quizzes_with_time(self) -> dict:
-        results = await self.get_all_results()
-
-        res = {}
+    while True:
+        # every page is read in a short transaction of its own, so while the client downloads a page
+        # the export holds neither a pooled connection nor an old snapshot
+        async with async_session() as session:
+            page = await QuizCrud(db_session=session).get_company_attempts(company_id=company_id,
+                                                                          after=last_id,
+                                                                          limit=page_size,
+                                                                          date_from=date_from,
+                                                                          date_to=date_to)
 
-        for item in results:
-            if res[f"{item.quiz_id}"] in res.keys():
-                res[f"{item.quiz_id}"] = item.datetime
+        if page:
+            yield [(user_id, quiz_id) for _, user_id, quiz_id in page]
 
-            res[f"{item.quiz_id}"] = item.datetime
+        if len(page) < page_size:
+            return
 
-        return res
+        last_id = page[-1].id
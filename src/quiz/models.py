@@ -2,7 +2,7 @@ import datetime as datetime
 from sqlalchemy.orm import relationship, backref
 
 from src.database import Base
-from sqlalchemy import Column, String, Integer, ForeignKey, Boolean, Float, Date
+from sqlalchemy import Column, String, Integer, ForeignKey, Boolean, Float, Date, DateTime, Index, UniqueConstraint, func
 
 import datetime
 
@@ -11,10 +11,12 @@ class Quiz(Base):
     __tablename__ = 'quizzes'
 
     id = Column(Integer, primary_key=True, index=True, nullable=False)
-    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"))
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), index=True)
     title = Column(String, nullable=False)
     description = Column(String, nullable=False)
     frequency = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now,
+                        server_default=func.now(), nullable=False)
     questions = relationship("Question", backref=backref("quiz", lazy="joined"))
 
 
@@ -22,13 +24,14 @@ class Question(Base):
     __tablename__ = "questions"
 
     id = Column(Integer, primary_key=True, index=True, nullable=False)
-    quiz_id = Column(Integer, ForeignKey('quizzes.id', ondelete='CASCADE'))
+    quiz_id = Column(Integer, ForeignKey('quizzes.id', ondelete='CASCADE'), index=True)
     question = Column(String, nullable=False)
     variants = relationship("AnswerVariant", backref=backref("question", lazy="joined"))
 
     
 class AnswerVariant(Base):
     __tablename__ = "variants"
+    __table_args__ = (Index("ix_variants_question_id_is_correct", "question_id", "is_correct"),)
 
     id = Column(Integer, primary_key=True, index=True, nullable=False)
     question_id = Column(Integer, ForeignKey('questions.id', ondelete='CASCADE'))
@@ -38,6 +41,7 @@ class AnswerVariant(Base):
 
 class Result(Base):
     __tablename__ = "results"
+    __table_args__ = (UniqueConstraint("user_id", "quiz_id", name="uq_results_user_id_quiz_id"),)
 
     id = Column(Integer, primary_key=True, index=True, nullable=False)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
@@ -46,3 +50,46 @@ class Result(Base):
     all_answers = Column(Integer)
     gpa = Column(Float)
     datetime = Column(Date, default=datetime.datetime.now, nullable=False)
+
+
+class UserRating(Base):
+    __tablename__ = "user_ratings"
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    correct_answers = Column(Integer, nullable=False, default=0)
+    all_answers = Column(Integer, nullable=False, default=0)
+
+
+class QuizRating(Base):
+    __tablename__ = "quiz_ratings"
+
+    quiz_id = Column(Integer, ForeignKey('quizzes.id', ondelete='CASCADE'), primary_key=True)
+    correct_answers = Column(Integer, nullable=False, default=0)
+    all_answers = Column(Integer, nullable=False, default=0)
+    gpa_sum = Column(Float, nullable=False, default=0, server_default="0")
+    results = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class GpaTotal(Base):
+    __tablename__ = "gpa_totals"
+
+    shard = Column(Integer, primary_key=True)
+    gpa_sum = Column(Float, nullable=False, default=0)
+    results = Column(Integer, nullable=False, default=0)
+
+
+class CompanyRating(Base):
+    __tablename__ = "company_ratings"
+
+    company_id = Column(Integer, ForeignKey('companies.id', ondelete='CASCADE'), primary_key=True)
+    correct_answers = Column(Integer, nullable=False, default=0)
+    all_answers = Column(Integer, nullable=False, default=0)
+
+
+class UserCompanyRating(Base):
+    __tablename__ = "user_company_ratings"
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    company_id = Column(Integer, ForeignKey('companies.id', ondelete='CASCADE'), primary_key=True)
+    correct_answers = Column(Integer, nullable=False, default=0)
+    all_answers = Column(Integer, nullable=False, default=0)
@@ -1,19 +1,24 @@
-from typing import List
+import datetime
 
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, Response, status
 
 from src.auth.services import get_current_user
-from src.quiz.crud import QuizCrud
+from src.quiz.crud import QuizCrud, iter_company_attempts
 
 from src.quiz.schemes import QuizSchema, VariantSchema, QuestionSchema, TakeQuiz, GpaScheme, \
                              QuizResScheme, QuizResults, ResultsWithDate, QuizResForUser, EmployeeWithDate, \
-                             QuizGpa, QuizWithDate
+                             QuizGpa, QuizWithDate, AnswerRecord, ExportFormat, QuizDocument, QuizDocumentResult, \
+                             CompletionReport
 
-from src.company.router import get_session
-from src.redis_init import redis_client
-from src.quiz.services import write_to_csv
+from src.database import get_session
+from src.pagination import Page, PageParams, page_params, page_response
+from src.redis_init import get_redis
+from src.quiz.services import answer_key_cache, read_answer, attempt_rows, stream_export, stream_gzip, \
+                             company_attempt_rows, EXPORT_MEDIA_TYPES, quiz_payload_cache, etag_matches, accepts_gzip
 
-from fastapi.responses import FileResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 quiz_router = APIRouter()
 
@@ -29,6 +34,7 @@ async def create_quiz(company_id: int, title: str, description: str, frequency:
                                        description=description,
                                        current_user=current_user,
                                        frequency=frequency)
+    await session.commit()
 
     return QuizSchema(title=title,
                       description=description,
@@ -43,6 +49,7 @@ async def create_question(quiz_id: int, question: str,
 
     await quiz_crud.create_question(quiz_id=quiz_id,
                                     question=question)
+    await session.commit()
 
     return QuestionSchema(question=question,
                           quiz_id=quiz_id)
@@ -57,11 +64,43 @@ async def create_variant(question_id: int, answer: str, is_correct: bool,
     variant = await quiz_crud.create_variant(question_id=question_id,
                                              answer=answer,
                                              is_correct=is_correct)
+    await session.commit()
 
     return VariantSchema(answer=answer,
                          is_correct=is_correct)
 
 
+@quiz_router.post("/create_quiz_document", response_model=QuizDocumentResult)
+async def create_quiz_document(company_id: int, document: QuizDocument,
+                               current_user=Depends(get_current_user),
+                               session=Depends(get_session)) -> QuizDocumentResult:
+    quiz_crud = QuizCrud(db_session=session)
+
+    result = await quiz_crud.create_quiz_document(company_id=company_id,
+                                                  document=document,
+                                                  current_user=current_user)
+    await session.commit()
+
+    return result
+
+
+@quiz_router.put("/replace_quiz_document/{quiz_id}", response_model=QuizDocumentResult,
+                 description="results of the quiz are kept; reset_results=true deletes them and takes them out of "
+                             "every rating, for replacements that make the old scores meaningless")
+async def replace_quiz_document(quiz_id: int, document: QuizDocument, reset_results: bool = False,
+                                current_user=Depends(get_current_user),
+                                session=Depends(get_session)) -> QuizDocumentResult:
+    quiz_crud = QuizCrud(db_session=session)
+
+    result = await quiz_crud.replace_quiz_document(quiz_id=quiz_id,
+                                                   document=document,
+                                                   current_user=current_user,
+                                                   reset_results=reset_results)
+    await session.commit()
+
+    return result
+
+
 @quiz_router.delete('/delete_quiz/{quiz_id}')
 async def delete_quiz(quiz_id: int, current_user=Depends(get_current_user),
                       session=Depends(get_session)) -> set:
@@ -69,6 +108,7 @@ async def delete_quiz(quiz_id: int, current_user=Depends(get_current_user),
 
     await quiz_crud.delete_quiz(quiz_id=quiz_id,
                                 current_user=current_user)
+    await session.commit()
 
     return {"quiz has been successfully deleted"}
 
@@ -83,6 +123,7 @@ async def update_quiz(quiz_id: int, title: str, description: str, frequency: int
                                 description=description,
                                 frequency=frequency,
                                 current_user=current_user)
+    await session.commit()
 
     return QuizSchema(title=title,
                       description=description,
@@ -97,6 +138,7 @@ async def update_question(question_id: int, question: str,
     await quiz_crud.update_question(question_id=question_id,
                                     question=question,
                                     current_user=current_user)
+    await session.commit()
 
     return QuestionSchema(question=question)
 
@@ -110,6 +152,7 @@ async def update_variant(variant_id: int, answer: str, is_correct: bool,
                                    answer=answer,
                                    is_correct=is_correct,
                                    current_user=current_user)
+    await session.commit()
 
     return VariantSchema(answer=answer,
                          is_correct=is_correct)
@@ -122,30 +165,27 @@ async def pass_quiz(quiz: TakeQuiz, current_user = Depends(get_current_user),
     quiz_crud = QuizCrud(db_session=session)
 
     res = await quiz_crud.pass_quiz(quiz=quiz, current_user=current_user)
+    await session.commit()
 
     return QuizResScheme(all_answers=res['all_answers'],
                          correct_answers=res['correct_answers'])
 
 
-@quiz_router.get("get_all_results", response_model=List[QuizResults])
-async def get_all_results(current_user = Depends(get_current_user),
-                          session = Depends(get_session)) -> List[QuizResults]:
+@quiz_router.get("get_all_results", response_model=Page[QuizResults])
+async def get_all_results(user_id: Optional[int] = None, quiz_id: Optional[int] = None,
+                          page: PageParams = Depends(page_params),
+                          current_user = Depends(get_current_user),
+                          session = Depends(get_session)) -> ORJSONResponse:
 
     quiz_crud = QuizCrud(db_session=session)
 
-    res_from_db = await quiz_crud.get_all_results()
-
-    res = [QuizResults(id=r.id,
-                       user_id=r.user_id,
-                       quiz_id=r.quiz_id,
-                       correct_answers=r.correct_answers,
-                       all_answers=r.all_answers,
-                       gpa=r.gpa) for r in res_from_db]
+    res, next_cursor = await quiz_crud.get_all_results(page=page, user_id=user_id, quiz_id=quiz_id)
 
-    return res
+    return page_response(items=res, next_cursor=next_cursor)
 
 
-@quiz_router.get("get_gpa_for_one_quiz/{quiz_id}", response_model=GpaScheme)
+@quiz_router.get("get_gpa_for_one_quiz/{quiz_id}", response_model=GpaScheme,
+                 description="mean of the gpa of every result of the quiz")
 async def get_gpa_for_one_quiz(quiz_id: int, current_user = Depends(get_current_user),
                                session = Depends(get_session)) -> GpaScheme:
 
@@ -156,7 +196,8 @@ async def get_gpa_for_one_quiz(quiz_id: int, current_user = Depends(get_current_
     return GpaScheme(gpa=gpa['gpa'])
 
 
-@quiz_router.get("get_gpa_for_all_quizzes", response_model=GpaScheme)
+@quiz_router.get("get_gpa_for_all_quizzes", response_model=GpaScheme,
+                 description="mean of the gpa of every result")
 async def get_gpa_for_all_quizzes(current_user = Depends(get_current_user),
                                   session = Depends(get_session)) -> GpaScheme:
 
@@ -167,36 +208,142 @@ async def get_gpa_for_all_quizzes(current_user = Depends(get_current_user),
     return GpaScheme(gpa=gpa['gpa'])
 
 
-@quiz_router.get("get_redis")
-async def get_redis(user_id: int, quiz_id: int, question_id: int) -> dict:
-    res = redis_client.get(name=f"quiz-u{user_id}-quiz{quiz_id}-question{question_id}")
+@quiz_router.get("/get_user_rating/{user_id}", response_model=GpaScheme,
+                 description="correct answers / all answers over every quiz the user has passed")
+async def get_user_rating(user_id: int, current_user = Depends(get_current_user),
+                          session = Depends(get_session)) -> GpaScheme:
+
+    quiz_crud = QuizCrud(db_session=session)
+
+    gpa = await quiz_crud.get_user_rating(user_id=user_id)
+
+    return GpaScheme(gpa=gpa['gpa'])
+
+
+@quiz_router.get("/get_company_rating/{company_id}", response_model=GpaScheme,
+                 description="correct answers / all answers over every result in the company")
+async def get_company_rating(company_id: int, current_user = Depends(get_current_user),
+                             session = Depends(get_session)) -> GpaScheme:
+
+    quiz_crud = QuizCrud(db_session=session)
+
+    gpa = await quiz_crud.get_company_rating(company_id=company_id)
+
+    return GpaScheme(gpa=gpa['gpa'])
+
+
+@quiz_router.get("/get_user_rating_in_company/{user_id}", response_model=GpaScheme,
+                 description="correct answers / all answers over the user's results in the company")
+async def get_user_rating_in_company(user_id: int, company_id: int, current_user = Depends(get_current_user),
+                                     session = Depends(get_session)) -> GpaScheme:
+
+    quiz_crud = QuizCrud(db_session=session)
+
+    gpa = await quiz_crud.get_user_rating_in_company(user_id=user_id, company_id=company_id)
+
+    return GpaScheme(gpa=gpa['gpa'])
+
+
+@quiz_router.get("/answer_key_cache_stats")
+async def get_answer_key_cache_stats(current_user = Depends(get_current_user)) -> dict:
+    return answer_key_cache.stats()
+
+
+@quiz_router.get("/take_quiz/{quiz_id}")
+async def take_quiz(quiz_id: int, if_none_match: Optional[str] = Header(None),
+                    accept_encoding: Optional[str] = Header(None),
+                    current_user = Depends(get_current_user),
+                    session = Depends(get_session)) -> Response:
+    quiz_crud = QuizCrud(db_session=session)
+
+    payload = await quiz_crud.get_quiz_for_taker(quiz_id=quiz_id, current_user=current_user)
+
+    if accepts_gzip(accept_encoding=accept_encoding):
+        etag, body, encoding = payload.gzip_etag, payload.gzip_body, {"Content-Encoding": "gzip"}
+    else:
+        etag, body, encoding = payload.etag, payload.body, {}
+
+    headers = {"ETag": etag,
+               "Cache-Control": "private, no-cache",
+               "Vary": "Accept-Encoding"}
+
+    if etag_matches(if_none_match=if_none_match, etag=etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers={**headers, **encoding})
+
+
+@quiz_router.get("/quiz_payload_cache_stats")
+async def get_quiz_payload_cache_stats(current_user = Depends(get_current_user)) -> dict:
+    return quiz_payload_cache.stats()
+
+
+@quiz_router.get("get_redis", response_model=Optional[AnswerRecord])
+async def get_redis_answer(user_id: int, quiz_id: int, question_id: int) -> Optional[AnswerRecord]:
+    return await read_answer(redis=get_redis(), user_id=user_id, quiz_id=quiz_id, question_number=question_id)
 
-    return res
+
+def export_response(rows, export_format: ExportFormat, filename: str, compress: bool = False) -> StreamingResponse:
+    content = stream_export(rows=rows, export_format=export_format)
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+    filename = f"{filename}.{export_format.value}"
+
+    if compress:
+        content = stream_gzip(chunks=content)
+        media_type = "application/gzip"
+        filename = f"{filename}.gz"
+
+    return StreamingResponse(content,
+                             media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 
 @quiz_router.get("get_redis_results/{quiz_id}")
-async def get_redis_results(quiz_id: int, filename: str,
-                            current_user = Depends(get_current_user), session = Depends(get_session)) -> FileResponse:
+async def get_redis_results(quiz_id: int, export_format: ExportFormat = ExportFormat.csv,
+                            current_user = Depends(get_current_user), session = Depends(get_session)) -> StreamingResponse:
     quiz_crud = QuizCrud(db_session=session)
 
     res = await quiz_crud.get_redis_results(quiz_id=quiz_id, current_user=current_user)
 
-    write_to_csv(filename=filename, data=res)
-
-    return FileResponse(f"{filename}.csv")
+    return export_response(rows=attempt_rows(user_id=current_user.id, quiz_id=quiz_id, records=res),
+                           export_format=export_format,
+                           filename=f"quiz{quiz_id}-user{current_user.id}")
 
 
 @quiz_router.get("export_employee_result/{employee_id}")
-async def export_employee_result(employee_id: int, company_id: int, quiz_id: int, filename: str,
-                                 current_user = Depends(get_current_user), session = Depends(get_session)) -> FileResponse:
+async def export_employee_result(employee_id: int, company_id: int, quiz_id: int,
+                                 export_format: ExportFormat = ExportFormat.csv,
+                                 current_user = Depends(get_current_user), session = Depends(get_session)) -> StreamingResponse:
     quiz_crud = QuizCrud(db_session=session)
 
     res = await quiz_crud.export_employee_results(quiz_id=quiz_id, employee_id=employee_id,
                                                   company_id=company_id, current_user=current_user)
 
-    write_to_csv(filename=filename, data=res)
+    return export_response(rows=attempt_rows(user_id=employee_id, quiz_id=quiz_id, records=res),
+                           export_format=export_format,
+                           filename=f"quiz{quiz_id}-user{employee_id}")
+
+
+@quiz_router.get("/export_company_results/{company_id}",
+                 description="answers of current members' results in the date range whose last attempt is still kept in redis; "
+                             "attempts expire ATTEMPT_TTL (2 days) after the last submission and export no rows")
+async def export_company_results(company_id: int, date_from: Optional[datetime.date] = None,
+                                 date_to: Optional[datetime.date] = None,
+                                 export_format: ExportFormat = ExportFormat.csv, compress: bool = False,
+                                 current_user = Depends(get_current_user), session = Depends(get_session)) -> StreamingResponse:
+    quiz_crud = QuizCrud(db_session=session)
+
+    await quiz_crud.check_company_rights(company_id=company_id, current_user=current_user)
+    # the request session is only closed after the response has been streamed, so its connection goes back to the
+    # pool here and each page of the export checks one out for as long as it is read
+    await session.close()
 
-    return FileResponse(f"{filename}.csv")
+    pages = iter_company_attempts(company_id=company_id, date_from=date_from, date_to=date_to)
+
+    return export_response(rows=company_attempt_rows(redis=get_redis(), pages=pages),
+                           export_format=export_format,
+                           filename=f"company{company_id}-results",
+                           compress=compress)
 
 
 @quiz_router.get("get_employee_id_with_time/{quiz_id}", response_model=List[EmployeeWithDate])
@@ -208,12 +355,26 @@ async def get_employee_id_with_time(quiz_id: int, company_id: int,
     results = await quiz_crud.get_employee_id_with_time(company_id=company_id, quiz_id=quiz_id, current_user=current_user)
 
     res = [EmployeeWithDate(user_id=item["user_id"],
-                            date=str(item["time"])) for item in results]
+                            date=None if item["time"] is None else str(item["time"])) for item in results]
 
     return res
 
 
-@quiz_router.get("get_all_users_results_with_time", response_model=List[ResultsWithDate])
+@quiz_router.get("/completion_report/{quiz_id}", response_model=CompletionReport)
+async def get_completion_report(quiz_id: int, company_id: int, page: PageParams = Depends(page_params),
+                                current_user = Depends(get_current_user),
+                                session = Depends(get_session)) -> ORJSONResponse:
+
+    quiz_crud = QuizCrud(db_session=session)
+
+    report = await quiz_crud.get_completion_report(company_id=company_id, quiz_id=quiz_id, page=page,
+                                                   current_user=current_user)
+
+    return ORJSONResponse(report)
+
+
+@quiz_router.get("get_all_users_results_with_time", response_model=List[ResultsWithDate],
+                 description="mean of the gpa of every result of each user and the date of the latest one")
 async def get_all_user_results_with_time(current_user = Depends(get_current_user),
                                          session = Depends(get_session)) -> List[ResultsWithDate]:
 
@@ -249,7 +410,7 @@ async def get_gpa_for_each_quiz(session = Depends(get_session)) -> List[QuizGpa]
 
     res = [QuizGpa(quiz_id=item,
                    gpa=results[item]["gpa"]/results[item]["times"],
-                   time=results[item]["time"]) for item in results.keys()]
+                   time=str(results[item]["time"])) for item in results.keys()]
 
     return res
 
@@ -261,6 +422,6 @@ async def get_all_quizzes_with_time(session = Depends(get_session)) -> List[Quiz
     results = await quiz_crud.get_all_quizzes_with_time()
 
     res = [QuizWithDate(quiz_id=item,
-                        time=results[item]["time"]) for item in results.keys()]
+                        time=str(results[item])) for item in results.keys()]
 
     return res
@@ -1,5 +1,7 @@
+import datetime
+from enum import Enum
 from typing import Optional, List
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 
 
 class QuizSchema(BaseModel):
@@ -11,6 +13,17 @@ class QuizSchema(BaseModel):
         orm_mode = True
 
 
+class QuizSummary(BaseModel):
+    id: int
+    title: str
+    frequency: int
+    questions: int
+    updated_at: datetime.datetime
+
+    class Config:
+        orm_mode = True
+
+
 class QuestionSchema(BaseModel):
     question: str
     quiz_id: int
@@ -38,6 +51,59 @@ class QuizWithQuestion(BaseModel):
         orm_mode = True
 
 
+class VariantDocument(BaseModel):
+    answer: str
+    is_correct: bool = False
+
+
+class QuestionDocument(BaseModel):
+    question: str
+    variants: List[VariantDocument]
+
+    @validator("question")
+    def question_is_not_empty(cls, question: str) -> str:
+        if not question.strip():
+            raise ValueError("question can not be empty")
+
+        return question
+
+    @validator("variants")
+    def variants_are_valid(cls, variants: List[VariantDocument]) -> List[VariantDocument]:
+        if len(variants) < 2:
+            raise ValueError("question has to have at least 2 variants")
+
+        if sum(variant.is_correct for variant in variants) != 1:
+            raise ValueError("question has to have exactly one correct variant")
+
+        if len({variant.answer for variant in variants}) != len(variants):
+            raise ValueError("variants of a question have to be unique")
+
+        return variants
+
+
+class QuizDocument(BaseModel):
+    title: str
+    description: str
+    frequency: int
+    questions: List[QuestionDocument]
+
+    @validator("questions")
+    def quiz_has_questions(cls, questions: List[QuestionDocument]) -> List[QuestionDocument]:
+        if not questions:
+            raise ValueError("quiz has to have at least one question")
+
+        return questions
+
+
+class QuizDocumentResult(BaseModel):
+    quiz_id: int
+    questions: int
+    variants: int
+
+    class Config:
+        orm_mode = True
+
+
 class TakeQuiz(BaseModel):
     quiz_id: int
     company_id: int
@@ -94,7 +160,37 @@ class QuizResForUser(BaseModel):
 
 class EmployeeWithDate(BaseModel):
     user_id: int
-    date: str
+    date: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+
+class CompletionRow(BaseModel):
+    user_id: int
+    taken: bool
+    date: Optional[datetime.date]
+    correct_answers: Optional[int]
+    all_answers: Optional[int]
+    gpa: Optional[float]
+
+    class Config:
+        orm_mode = True
+
+
+class CompletionSummary(BaseModel):
+    employees: int
+    completed: int
+    completion_rate: float
+
+    class Config:
+        orm_mode = True
+
+
+class CompletionReport(BaseModel):
+    items: List[CompletionRow]
+    next_cursor: Optional[str]
+    summary: Optional[CompletionSummary]
 
     class Config:
         orm_mode = True
@@ -114,4 +210,19 @@ class QuizWithDate(BaseModel):
     time: str
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class AnswerRecord(BaseModel):
+    question_number: int
+    question: str
+    answer: str
+    is_correct: bool
+
+    class Config:
+        orm_mode = True
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
@@ -1,7 +1,318 @@
+import ast
 import csv
+import gzip
+import hashlib
+import json
+import re
+import zlib
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
+import orjson
+from redis.asyncio import Redis
 
-def write_to_csv(data: list, filename: str) -> None:
-    with open(f"{filename}.csv", "w+") as file:
-        write = csv.writer(file, delimiter="\n")
-        write.writerow(data)
\ No newline at end of file
+from src.cache import GenerationalCache
+from src.config import settings
+from src.quiz.schemes import AnswerRecord, ExportFormat
+
+
+# answers are only kept in redis, so exports cover attempts submitted within this window
+ATTEMPT_TTL = 60 * 60 * 24 * 2
+LEGACY_ANSWER_KEY = re.compile(r"^quiz-u(\d+)-quiz(\d+)-question(\d+)$")
+
+EXPORT_COLUMNS = ("user_id", "quiz_id", "question_number", "question", "answer", "is_correct")
+EXPORT_MEDIA_TYPES = {ExportFormat.csv: "text/csv",
+                      ExportFormat.ndjson: "application/x-ndjson"}
+
+
+class QuestionKey(NamedTuple):
+    question: str
+    correct_answer: Optional[str]
+    variants_count: int
+
+
+class AnswerKey(NamedTuple):
+    quiz_id: int
+    company_id: int
+    questions: Tuple[QuestionKey, ...]
+
+
+class QuizPayload(NamedTuple):
+    company_id: int
+    etag: str
+    body: bytes
+    gzip_etag: str
+    gzip_body: bytes
+
+
+# edits invalidate only the worker that committed them, the ttl bounds how long other workers grade with an old key
+answer_key_cache = GenerationalCache(maxsize=settings.ANSWER_KEY_CACHE_SIZE, ttl=settings.ANSWER_KEY_TTL)
+quiz_payload_cache = GenerationalCache(maxsize=settings.QUIZ_PAYLOAD_CACHE_SIZE, ttl=settings.QUIZ_PAYLOAD_TTL)
+# company_id -> (after, limit, frequency) -> page
+quiz_catalog_cache = GenerationalCache(maxsize=settings.QUIZ_CATALOG_CACHE_SIZE, ttl=settings.QUIZ_CATALOG_TTL)
+
+
+def invalidate_quiz_caches(quiz_id: int) -> None:
+    answer_key_cache.invalidate(quiz_id)
+    quiz_payload_cache.invalidate(quiz_id)
+
+
+def invalidate_quiz_catalog(company_id: int) -> None:
+    quiz_catalog_cache.invalidate(company_id)
+
+
+def build_answer_key(quiz_id: int, rows: list) -> Optional[AnswerKey]:
+    if not rows:
+        return None
+
+    questions = {}
+
+    for company_id, question_id, question, answer, is_correct in rows:
+        if question_id is None:
+            continue
+
+        text, correct_answer, variants_count = questions.get(question_id, (question, None, 0))
+
+        if answer is not None:
+            variants_count += 1
+            if is_correct and correct_answer is None:
+                correct_answer = answer
+
+        questions[question_id] = (text, correct_answer, variants_count)
+
+    return AnswerKey(quiz_id=quiz_id,
+                     company_id=rows[0][0],
+                     questions=tuple(QuestionKey(*question) for question in questions.values()))
+
+
+def build_quiz_payload(rows: list) -> Optional[QuizPayload]:
+    if not rows:
+        return None
+
+    quiz_id, company_id, title, description, frequency = rows[0][:5]
+    questions = {}
+
+    for *_, question_id, question, answer in rows:
+        if question_id is None:
+            continue
+
+        variants = questions.setdefault(question_id, {"question_number": len(questions) + 1,
+                                                      "question": question,
+                                                      "variants": []})["variants"]
+        if answer is not None:
+            variants.append(answer)
+
+    body = orjson.dumps({"quiz_id": quiz_id,
+                         "company_id": company_id,
+                         "title": title,
+                         "description": description,
+                         "frequency": frequency,
+                         "questions": list(questions.values())})
+
+    digest = hashlib.sha256(body).hexdigest()[:32]
+
+    # the gzip body is a different representation, so it gets its own strong validator
+    return QuizPayload(company_id=company_id,
+                       etag=f'"{digest}"',
+                       body=body,
+                       gzip_etag=f'"{digest}-gzip"',
+                       gzip_body=gzip.compress(body, mtime=0))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+
+    return any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(","))
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    if accept_encoding is None:
+        return False
+
+    for coding in accept_encoding.lower().split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+
+    return False
+
+
+def grade_answers(answer_key: AnswerKey, answers: List[str]) -> Tuple[dict, list]:
+    res = {'all_answers': 0,
+           'correct_answers': 0}
+
+    records = []
+
+    for index, (question, answer) in enumerate(zip(answer_key.questions, answers)):
+        is_correct = question.correct_answer == answer
+
+        records.append(AnswerRecord(question_number=index + 1,
+                                    question=question.question,
+                                    answer=answer,
+                                    is_correct=is_correct))
+
+        res['all_answers'] += 1
+        if is_correct:
+            res['correct_answers'] += 1
+
+    return res, records
+
+
+def attempt_key(user_id: int, quiz_id: int) -> str:
+    return f"quiz-attempt-u{user_id}-quiz{quiz_id}"
+
+
+def encode_attempt(records: Iterable[AnswerRecord]) -> Dict[str, str]:
+    return {f"question{record.question_number}": record.json() for record in records}
+
+
+def decode_attempt(mapping: Dict[str, str]) -> List[AnswerRecord]:
+    records = [AnswerRecord.parse_raw(value) for value in mapping.values()]
+
+    return sorted(records, key=lambda record: record.question_number)
+
+
+def decode_legacy_answer(question_number: int, value: str) -> AnswerRecord:
+    legacy = ast.literal_eval(value)
+    is_correct = legacy.pop("is_correct")
+    (question, answer), = legacy.items()
+
+    return AnswerRecord(question_number=question_number,
+                        question=question,
+                        answer=answer,
+                        is_correct=is_correct)
+
+
+async def write_attempt(redis: Redis, user_id: int, quiz_id: int, records: List[AnswerRecord],
+                        ttl: int = ATTEMPT_TTL) -> None:
+    key = attempt_key(user_id=user_id, quiz_id=quiz_id)
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping=encode_attempt(records))
+        pipe.expire(key, ttl)
+        await pipe.execute()
+
+
+async def read_attempt(redis: Redis, user_id: int, quiz_id: int) -> List[AnswerRecord]:
+    return decode_attempt(await redis.hgetall(attempt_key(user_id=user_id, quiz_id=quiz_id)))
+
+
+async def read_answer(redis: Redis, user_id: int, quiz_id: int, question_number: int) -> Optional[AnswerRecord]:
+    value = await redis.hget(attempt_key(user_id=user_id, quiz_id=quiz_id), f"question{question_number}")
+
+    if value is None:
+        return None
+
+    return AnswerRecord.parse_raw(value)
+
+
+async def read_attempts(redis: Redis, attempts: List[Tuple[int, int]]) -> Dict[Tuple[int, int], List[AnswerRecord]]:
+    if not attempts:
+        return {}
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for user_id, quiz_id in attempts:
+            pipe.hgetall(attempt_key(user_id=user_id, quiz_id=quiz_id))
+        mappings = await pipe.execute()
+
+    return {attempt: decode_attempt(mapping) for attempt, mapping in zip(attempts, mappings)}
+
+
+async def migrate_legacy_attempts(redis: Redis, batch_size: int = 500) -> int:
+    legacy_keys = {}
+
+    async for key in redis.scan_iter(match="quiz-u*-quiz*-question*", count=batch_size):
+        match = LEGACY_ANSWER_KEY.match(key)
+        if match is None:
+            continue
+
+        user_id, quiz_id, question_number = map(int, match.groups())
+        legacy_keys.setdefault((user_id, quiz_id), []).append((question_number, key))
+
+    attempts = list(legacy_keys.items())
+
+    for start in range(0, len(attempts), batch_size):
+        batch = attempts[start:start + batch_size]
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for (user_id, quiz_id), keys in batch:
+                pipe.mget([key for _, key in keys])
+                for _, key in keys:
+                    pipe.ttl(key)
+                pipe.exists(attempt_key(user_id=user_id, quiz_id=quiz_id))
+            replies = iter(await pipe.execute())
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for (user_id, quiz_id), keys in batch:
+                values = next(replies)
+                ttl = max(next(replies) for _ in keys)
+                migrated = next(replies)
+                records = [decode_legacy_answer(question_number=question_number, value=value)
+                           for (question_number, _), value in zip(keys, values) if value is not None]
+
+                # an attempt written in the new format is newer than its legacy keys
+                if records and not migrated:
+                    # the attempt lives as long as its last question would have
+                    key = attempt_key(user_id=user_id, quiz_id=quiz_id)
+                    pipe.hset(key, mapping=encode_attempt(records))
+                    pipe.expire(key, ttl if ttl > 0 else ATTEMPT_TTL)
+                pipe.delete(*[key for _, key in keys])
+            await pipe.execute()
+
+    return len(attempts)
+
+
+class EchoBuffer:
+
+    def write(self, value: str) -> str:
+        return value
+
+
+async def attempt_rows(user_id: int, quiz_id: int, records: Iterable[AnswerRecord]) -> AsyncIterator[dict]:
+    for record in records:
+        yield {"user_id": user_id,
+               "quiz_id": quiz_id,
+               "question_number": record.question_number,
+               "question": record.question,
+               "answer": record.answer,
+               "is_correct": record.is_correct}
+
+
+async def stream_csv(rows: AsyncIterable[dict]) -> AsyncIterator[bytes]:
+    writer = csv.writer(EchoBuffer())
+
+    yield writer.writerow(EXPORT_COLUMNS).encode()
+
+    async for row in rows:
+        yield writer.writerow([row[column] for column in EXPORT_COLUMNS]).encode()
+
+
+async def stream_ndjson(rows: AsyncIterable[dict]) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield (json.dumps(row) + "\n").encode()
+
+
+async def company_attempt_rows(redis: Redis, pages: AsyncIterable[List[Tuple[int, int]]]) -> AsyncIterator[dict]:
+    async for attempts in pages:
+        for (user_id, quiz_id), records in (await read_attempts(redis=redis, attempts=attempts)).items():
+            async for row in attempt_rows(user_id=user_id, quiz_id=quiz_id, records=records):
+                yield row
+
+
+async def stream_gzip(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+def stream_export(rows: AsyncIterable[dict], export_format: ExportFormat) -> AsyncIterator[bytes]:
+    if export_format == ExportFormat.ndjson:
+        return stream_ndjson(rows)
+
+    return stream_csv(rows)
@@ -1,14 +1,50 @@
-from redis import Redis
+from typing import Optional
+
+from redis.asyncio import ConnectionPool, Redis
 from redis.exceptions import ConnectionError
 from src.config import settings
 
-try:
-    redis_client = Redis(
-        host=settings.REDIS_HOST,
-        port=settings.REDIS_PORT
-    )
-    print("Connected to redis!")
-except ConnectionError as e:
-    print(e)
 
+class RedisManager:
+
+    def __init__(self):
+        self.pool: Optional[ConnectionPool] = None
+        self.client: Optional[Redis] = None
+
+    async def connect(self) -> None:
+        self.pool = ConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            decode_responses=True
+        )
+        self.client = Redis(connection_pool=self.pool)
+
+        try:
+            await self.client.ping()
+            print("Connected to redis!")
+        except ConnectionError as e:
+            print(e)
+
+    async def disconnect(self) -> None:
+        if self.client is not None:
+            await self.client.close()
+        if self.pool is not None:
+            await self.pool.disconnect()
+
+        self.client = None
+        self.pool = None
+
+
+redis_manager = RedisManager()
+
+
+def get_redis() -> Redis:
+    if redis_manager.client is None:
+        raise RuntimeError("redis is not connected, RedisManager.connect() has to be awaited on startup")
 
+    return redis_manager.client
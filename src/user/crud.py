@@ -2,18 +2,19 @@ import datetime
 
 from fastapi import HTTPException, status
 from sqlalchemy import select, update, delete
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm import Session
 from src.company.crud import CompanyCrud
-from src.company.models import Invite, Request
-from src.database import async_session
+from src.company.models import Company, Invite, Request
+from src.database import on_commit
+from src.pagination import PageParams, paginate
 from src.user.models import User
 from src.user.schemas import UserCreateSchema, UserUpdateSchema
 
 from src.auth.auth import auth_handler
+from src.auth.permissions import invalidate_auth_context
+from src.user.services import invalidate_user
 
-from typing import List, Optional
-
-db = async_session()
+from typing import List, Optional, Set, Tuple
 
 
 class UserCrud:
@@ -21,17 +22,7 @@ class UserCrud:
     def __init__(self, db_session: Session):
         self.db_session = db_session
 
-    async def user_admin_in(self, user_id) -> User:
-        user = (await self.db_session.execute(select(User).filter(User.id == user_id).options(selectinload(User.companies_admins)))).scalars().first()
-
-        return user
-
-    async def user_owner_of(self, user_id) -> User:
-        user = (await self.db_session.execute(select(User).filter(User.id == user_id).options(selectinload(User.companies)))).scalars().first()
-
-        return user
-
-    async def check_for_rights(self, company_id: int, admin_in: list, owner_of: list) -> None:
+    async def check_for_rights(self, company_id: int, admin_in: Set[int], owner_of: Set[int]) -> None:
         if company_id not in admin_in:
             if company_id not in owner_of:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
@@ -42,10 +33,16 @@ class UserCrud:
             raise HTTPException(status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
                                 detail='you have no access')
 
-    async def get_all_users(self) -> List[User]:
-        users = (await self.db_session.execute(select(User))).scalars().all()
+    async def get_all_users(self, page: PageParams, name: Optional[str] = None,
+                            surname: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        query = select(User.id, User.name, User.surname, User.email, User.age)
 
-        return users
+        if name is not None:
+            query = query.filter(User.name == name)
+        if surname is not None:
+            query = query.filter(User.surname == surname)
+
+        return await paginate(session=self.db_session, query=query, key=User.id, page=page)
 
     async def get_user_by_id(self, user_id: int) -> Optional[User]:
         user = (await self.db_session.execute(select(User)
@@ -79,7 +76,7 @@ class UserCrud:
             surname=user.surname,
             age=user.age,
             email=user.email,
-            password=auth_handler.get_password_hash(user.password)
+            password=await auth_handler.get_password_hash(user.password)
         )
         self.db_session.add(new_user)
         await self.db_session.flush()
@@ -92,8 +89,21 @@ class UserCrud:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                                 detail="user with this id doesn't exist")
 
+        from src.quiz.crud import QuizCrud
+        from src.quiz.models import Result
+
+        # the companies of an owner cascade away with them, taking other users' results along
+        owned = (await self.db_session.execute(select(Company.id)
+                                               .filter(Company.owner_id == user_id))).scalars().all()
+        if owned:
+            await CompanyCrud(db_session=self.db_session).remove_company_contents(company_ids=owned)
+
+        await QuizCrud(db_session=self.db_session).remove_results(Result.user_id == user_id)
         await self.db_session.execute(delete(User).filter(User.id == user_id))
-        await self.db_session.commit()
+        await self.db_session.flush()
+
+        invalidate_auth_context(self.db_session, user_id)
+        on_commit(self.db_session, invalidate_user, email=db_user.email)
 
     async def update_user(self, user_id: int, user: UserUpdateSchema) -> None:
         db_user = (await self.db_session.execute(select(User).filter(User.id == user_id))).scalars().first()
@@ -106,6 +116,8 @@ class UserCrud:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                                 detail="you are not able to change your email")
 
+        password = db_user.password if user.password is None else await auth_handler.get_password_hash(user.password)
+
         query = (
             update(User)
             .where(User.id == user_id)
@@ -113,7 +125,7 @@ class UserCrud:
                 name=db_user.name if user.name is None else user.name,
                 surname=db_user.surname if user.surname is None else user.surname,
                 age=db_user.age if user.age is None else user.age,
-                password=db_user.password if user.password is None else auth_handler.get_password_hash(user.password),
+                password=password,
                 updated_at=datetime.datetime.now()
             )
             .execution_options(synchronize_session="fetch")
@@ -121,6 +133,17 @@ class UserCrud:
         await self.db_session.execute(query)
         await self.db_session.flush()
 
+        on_commit(self.db_session, invalidate_user, email=db_user.email)
+
+    async def update_password(self, user: User, hashed_password: str) -> None:
+        await self.db_session.execute(update(User)
+                                      .where(User.id == user.id)
+                                      .values(password=hashed_password)
+                                      .execution_options(synchronize_session="fetch"))
+        await self.db_session.flush()
+
+        on_commit(self.db_session, invalidate_user, email=user.email)
+
     async def create_user_auth(self, email: str) -> User:
         new_user = User(
             name="",
@@ -168,7 +191,7 @@ class UserCrud:
     async def make_request(self, company_id: int, current_user: User) -> Request:
         company_crud_method = CompanyCrud(db_session=self.db_session)
 
-        await company_crud_method.get_company_by_id(company_id=company_id)
+        await company_crud_method.company_exists(company_id=company_id)
 
         new_request = Request(user_id=current_user.id,
                               company_id=company_id,
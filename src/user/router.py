@@ -4,31 +4,31 @@ from fastapi.security import HTTPBearer
 from src.company.crud import CompanyCrud
 
 from src.user.schemas import *
-from src.database import async_session
-from typing import List
+from typing import Optional
 from src.auth.router import get_current_user
 from src.user.crud import UserCrud
 from src.user.models import User
 
-from src.company.router import get_session
+from src.auth.tokens import revoke_user
+from src.database import get_session
+from src.redis_init import get_redis
+from src.pagination import Page, PageParams, page_params, page_response
+from fastapi.responses import ORJSONResponse
 
 router = APIRouter()
 token_auth_scheme = HTTPBearer()
-db = async_session()
 
 
-@router.get('/', response_model=List[UserGetSchema], status_code=status.HTTP_200_OK)
-async def get_all_users(current_user: User = Depends(get_current_user),
-                        session=Depends(get_session)) -> List[UserGetSchema]:
+@router.get('/', response_model=Page[UserGetSchema], status_code=status.HTTP_200_OK)
+async def get_all_users(name: Optional[str] = None, surname: Optional[str] = None,
+                        page: PageParams = Depends(page_params),
+                        current_user: User = Depends(get_current_user),
+                        session=Depends(get_session)) -> ORJSONResponse:
     user_crud = UserCrud(db_session=session)
 
-    users = await user_crud.get_all_users()
+    users, next_cursor = await user_crud.get_all_users(page=page, name=name, surname=surname)
 
-    return [UserGetSchema(id=user.id,
-                          name=user.name,
-                          surname=user.surname,
-                          email=user.email,
-                          age=user.age) for user in users]
+    return page_response(items=users, next_cursor=next_cursor)
 
 
 @router.get('/{user_id}', response_model=UserGetSchema, status_code=status.HTTP_200_OK)
@@ -55,6 +55,7 @@ async def update_user(user_id: int, user: UserUpdateSchema, current_user: User =
     await user_crud.check_for_permission(id_1=current_user.id, id_2=user_id)
 
     await user_crud.update_user(user_id=user_id, user=user)
+    await session.commit()
 
     return {f"user with id {user_id} has been successfully updated"}
 
@@ -64,6 +65,7 @@ async def create_user(user: UserCreateSchema, session=Depends(get_session)) -> U
     user_crud = UserCrud(db_session=session)
 
     user = await user_crud.create_user(user=user)
+    await session.commit()
 
     return UserGetSchema(id=user.id,
                          name=user.name,
@@ -74,7 +76,7 @@ async def create_user(user: UserCreateSchema, session=Depends(get_session)) -> U
 
 @router.delete("/{user_id}", response_model=UserInfo)
 async def delete_user(user_id: int, current_user: User = Depends(get_current_user),
-                      session=Depends(get_session)) -> set[str]:
+                      session=Depends(get_session), redis=Depends(get_redis)) -> UserInfo:
     user_crud = UserCrud(db_session=session)
 
     current_user = await user_crud.get_user_by_email(email=current_user.email)
@@ -82,8 +84,12 @@ async def delete_user(user_id: int, current_user: User = Depends(get_current_use
     await user_crud.check_for_permission(id_1=current_user.id, id_2=user_id)
 
     await user_crud.delete_user(user_id=user_id)
+    await session.commit()
+
+    # refresh tokens live in redis and would otherwise keep minting access tokens for the deleted user
+    await revoke_user(redis=redis, email=current_user.email)
 
-    return {f"user with id {user_id} has been successfully deleted"}
+    return UserInfo(info=f"user with id {user_id} has been successfully deleted")
 
 
 @router.put("/accept_invite/{company_id}")
@@ -94,6 +100,7 @@ async def accept_invite(company_id: int, current_user=Depends(get_current_user),
     company_crud_method = CompanyCrud(db_session=session)
     await user_crud.accept_invite(company_id=company_id, current_user=current_user)
     await company_crud_method.add_user_to_employees(user_id=current_user.id, company_id=company_id)
+    await session.commit()
 
     return {f"invite from company {company_id} was accepted"}
 
@@ -103,4 +110,7 @@ async def make_request(company_id: int, current_user=Depends(get_current_user),
                        session=Depends(get_session)) -> set[str]:
     user_crud = UserCrud(db_session=session)
 
-    return await user_crud.make_request(company_id=company_id, current_user=current_user)
+    message = await user_crud.make_request(company_id=company_id, current_user=current_user)
+    await session.commit()
+
+    return message
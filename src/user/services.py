@@ -0,0 +1,32 @@
+from typing import Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from src.cache import TTLCache
+from src.config import settings
+from src.user.models import User
+
+
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+
+
+def cache_user(user: User) -> None:
+    user_cache.set(user.email, {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+
+
+def get_cached_user(email: str) -> Optional[User]:
+    values = user_cache.get(email)
+
+    if values is None:
+        return None
+
+    # every caller gets its own detached instance, so sessions never share one object
+    user = User(**values)
+    make_transient_to_detached(user)
+
+    return user
+
+
+def invalidate_user(email: str) -> None:
+    user_cache.pop(email)
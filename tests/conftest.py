@@ -0,0 +1,176 @@
+import os
+import time
+
+import pytest
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+
+load_dotenv()
+
+# the app reads its database from POSTGRES_*, so it is pointed at the test_database service before src is imported
+TEST_DATABASE = os.getenv("TEST_POSTGRES_SERVER") is not None
+
+if TEST_DATABASE:
+    for name in ("USER", "PASSWORD", "SERVER", "PORT", "DB"):
+        os.environ[f"POSTGRES_{name}"] = os.getenv(f"TEST_POSTGRES_{name}", "")
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+
+def clear_caches() -> None:
+    from src.auth.permissions import auth_context_cache
+    from src.auth.services import token_cache
+    from src.company.services import roster_count_cache
+    from src.quiz.services import answer_key_cache, quiz_catalog_cache, quiz_payload_cache
+    from src.user.services import user_cache
+
+    for cache in (auth_context_cache, token_cache, roster_count_cache, answer_key_cache, quiz_catalog_cache,
+                  quiz_payload_cache, user_cache):
+        cache.clear()
+
+
+class EngineEvents:
+    # what the app engine did while a test ran: pool checkouts and checkins, how long each connection
+    # was held, the connections it opened and the statements it sent
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.statements = 0
+        self.peak = 0
+        self.checked_out = {}
+        self.holds = []
+        self.connections = []
+
+    @property
+    def open(self) -> int:
+        return len(self.checked_out)
+
+    def reset(self) -> None:
+        self.checkouts = self.checkins = self.statements = 0
+        self.peak = self.open
+        self.holds.clear()
+
+    def checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        self.checkouts += 1
+        self.checked_out[id(dbapi_connection)] = time.perf_counter()
+        self.peak = max(self.peak, self.open)
+
+    def checkin(self, dbapi_connection, connection_record) -> None:
+        self.checkins += 1
+        started = self.checked_out.pop(id(dbapi_connection), None)
+        if started is not None:
+            self.holds.append(time.perf_counter() - started)
+
+    def connect(self, dbapi_connection, connection_record) -> None:
+        self.connections.append(dbapi_connection)
+
+    def statement(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements += 1
+
+
+def require_test_database() -> None:
+    if not TEST_DATABASE:
+        pytest.skip("TEST_POSTGRES_* is not configured, see the test_database service in docker-compose.yml")
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def database():
+    require_test_database()
+
+    import src.main  # noqa: F401, registers every model on Base
+    from src.database import Base, engine
+
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+    except OSError as e:
+        pytest.skip(f"test database is not reachable: {e}")
+
+    clear_caches()
+
+    yield engine
+
+    # pooled connections belong to the event loop of this test
+    await engine.dispose()
+
+
+@pytest.fixture
+def engine_events():
+    from src.database import engine
+
+    events = EngineEvents()
+    # bound methods are made anew on every access, so remove needs the very objects listen was given
+    listeners = [("checkout", events.checkout), ("checkin", events.checkin), ("connect", events.connect),
+                 ("before_cursor_execute", events.statement)]
+
+    for name, listener in listeners:
+        event.listen(engine.sync_engine, name, listener)
+
+    yield events
+
+    for name, listener in listeners:
+        event.remove(engine.sync_engine, name, listener)
+
+
+@pytest.fixture
+async def session(database):
+    from src.database import async_session
+
+    async with async_session() as session:
+        yield session
+
+
+@pytest.fixture
+async def redis():
+    from redis.exceptions import ConnectionError
+    from src.redis_init import get_redis, redis_manager
+
+    await redis_manager.connect()
+
+    try:
+        await get_redis().ping()
+    except (ConnectionError, OSError):
+        await redis_manager.disconnect()
+        pytest.skip("redis is not reachable")
+
+    yield get_redis()
+
+    await redis_manager.disconnect()
+
+
+@pytest.fixture
+def asgi_app():
+    from src.main import app
+
+    return app
+
+
+@pytest.fixture
+def client(asgi_app):
+    require_test_database()
+
+    from fastapi.testclient import TestClient
+
+    clear_caches()
+
+    client = TestClient(asgi_app)
+
+    # startup recreates the schema, shutdown disposes the engine
+    try:
+        client.__enter__()
+    except OSError as e:
+        pytest.skip(f"test database is not reachable: {e}")
+
+    yield client
+
+    client.__exit__(None, None, None)
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+from sqlalchemy import func, select, text
+
+from src.quiz.crud import QuizCrud, RATING_MODELS
+from src.quiz.models import Result
+
+
+USERS = 2000
+QUIZZES = 100
+
+SEED = [
+    "INSERT INTO users (id, name, surname, age, email, password, created_at, updated_at) "
+    f"SELECT n, 'name', 'surname', 30, 'user' || n || '@example.com', '', now(), now() "
+    f"FROM generate_series(1, {USERS}) AS n",
+    "INSERT INTO companies (id, title, description, is_visible, owner_id) "
+    "SELECT n, 'company ' || n, '', true, n FROM generate_series(1, 10) AS n",
+    "INSERT INTO quizzes (id, company_id, title, description, frequency) "
+    f"SELECT n, n % 10 + 1, 'quiz', '', 1 FROM generate_series(1, {QUIZZES}) AS n",
+    # one result per user and quiz, as pass_quiz keeps them
+    "INSERT INTO results (user_id, quiz_id, correct_answers, all_answers, gpa, datetime) "
+    "SELECT u, q, (u + q) % 11, 10, ((u + q) % 11) / 10.0, current_date - (u % 30) "
+    f"FROM generate_series(1, {USERS}) AS u, generate_series(1, {QUIZZES}) AS q",
+]
+
+
+@pytest.mark.anyio
+async def test_gpa_analytics_on_seeded_results(session):
+    for statement in SEED:
+        await session.execute(text(statement))
+    await session.commit()
+
+    for model in RATING_MODELS:
+        async with session.begin():
+            await QuizCrud(db_session=session).rebuild_rating(model=model)
+
+    quiz_crud = QuizCrud(db_session=session)
+    timings = {}
+    analytics = {}
+
+    for name in ("get_gpa_for_all_quizzes", "get_gpa_for_each_quiz", "get_gpa_of_all_users_with_time",
+                 "get_all_quizzes_with_time"):
+        started = time.perf_counter()
+        analytics[name] = await getattr(quiz_crud, name)()
+        timings[name] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    analytics["get_gpa_for_one_quiz"] = await quiz_crud.get_gpa_for_one_quiz(quiz_id=7)
+    timings["get_gpa_for_one_quiz"] = time.perf_counter() - started
+
+    for name, seconds in timings.items():
+        print(f"{USERS * QUIZZES} results, {name}: {seconds * 1000:.2f} ms")
+
+    mean, quiz_mean = (await session.execute(select(func.avg(Result.gpa),
+                                                    func.avg(Result.gpa).filter(Result.quiz_id == 7)))).one()
+
+    assert analytics["get_gpa_for_all_quizzes"]["gpa"] == pytest.approx(mean)
+    assert analytics["get_gpa_for_one_quiz"]["gpa"] == pytest.approx(quiz_mean)
+    assert len(analytics["get_gpa_for_each_quiz"]) == QUIZZES
+    assert analytics["get_gpa_for_each_quiz"]["7"]["times"] == USERS
+    assert analytics["get_gpa_for_each_quiz"]["7"]["gpa"] / USERS == pytest.approx(quiz_mean)
+    assert len(analytics["get_gpa_of_all_users_with_time"]) == USERS
+    assert len(analytics["get_all_quizzes_with_time"]) == QUIZZES
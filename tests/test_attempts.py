@@ -0,0 +1,79 @@
+import pytest
+
+from src.quiz.schemes import AnswerRecord
+from src.quiz.services import (attempt_key, decode_attempt, encode_attempt, migrate_legacy_attempts, read_attempts,
+                               write_attempt)
+
+
+def record(question_number: int, answer: str = "right") -> AnswerRecord:
+    return AnswerRecord(question_number=question_number, question=f"question {question_number}", answer=answer,
+                        is_correct=answer == "right")
+
+
+async def set_legacy_answer(redis, user_id: int, quiz_id: int, question_number: int, answer: str, ttl: int) -> None:
+    # the format pass_quiz used to write: one string per question holding the repr of a dict
+    await redis.set(f"quiz-u{user_id}-quiz{quiz_id}-question{question_number}",
+                    str({f"question {question_number}": answer, "is_correct": answer == "right"}), ex=ttl)
+
+
+def test_attempt_round_trips_in_question_order():
+    records = [record(10, "wrong"), record(2), record(1, "other")]
+
+    encoded = encode_attempt(records)
+
+    assert sorted(encoded) == ["question1", "question10", "question2"]
+    assert decode_attempt(encoded) == [record(1, "other"), record(2), record(10, "wrong")]
+    assert decode_attempt({}) == []
+
+
+@pytest.mark.anyio
+async def test_read_attempts_returns_every_requested_attempt(redis):
+    await redis.delete(attempt_key(user_id=803, quiz_id=1))
+    await write_attempt(redis, user_id=801, quiz_id=1, records=[record(2, "wrong"), record(1)])
+    await write_attempt(redis, user_id=802, quiz_id=1, records=[record(1, "other")])
+
+    attempts = await read_attempts(redis, attempts=[(801, 1), (802, 1), (803, 1)])
+
+    assert attempts == {(801, 1): [record(1), record(2, "wrong")],
+                        (802, 1): [record(1, "other")],
+                        (803, 1): []}
+    assert await read_attempts(redis, attempts=[]) == {}
+
+
+@pytest.mark.anyio
+async def test_legacy_attempts_are_migrated_into_hashes(redis):
+    # redis outlives a test run, and an attempt left from the last one would count as already migrated
+    await redis.delete(*(attempt_key(user_id=user_id, quiz_id=1) for user_id in (901, 902, 903)))
+
+    # a complete attempt whose questions were answered at different times
+    for question_number, answer, ttl in ((1, "right", 100), (2, "wrong", 300), (3, "right", 200)):
+        await set_legacy_answer(redis, user_id=901, quiz_id=1, question_number=question_number, answer=answer, ttl=ttl)
+
+    # question 2 of this attempt has already expired
+    await set_legacy_answer(redis, user_id=902, quiz_id=1, question_number=1, answer="wrong", ttl=400)
+    await set_legacy_answer(redis, user_id=902, quiz_id=1, question_number=3, answer="right", ttl=500)
+
+    # resubmitted after the deploy, so its hash is newer than the legacy keys left next to it
+    await write_attempt(redis, user_id=903, quiz_id=1, records=[record(1)], ttl=50)
+    await set_legacy_answer(redis, user_id=903, quiz_id=1, question_number=1, answer="wrong", ttl=600)
+
+    # matches the scan pattern but not a legacy answer key
+    await redis.set("quiz-u904-quiz1-question-notes", "kept", ex=700)
+
+    assert await migrate_legacy_attempts(redis, batch_size=2) == 3
+
+    assert await read_attempts(redis, attempts=[(901, 1), (902, 1), (903, 1)]) == {
+        (901, 1): [record(1), record(2, "wrong"), record(3)],
+        (902, 1): [record(1, "wrong"), record(3)],
+        (903, 1): [record(1)],
+    }
+
+    assert 290 < await redis.ttl(attempt_key(user_id=901, quiz_id=1)) <= 300
+    assert 490 < await redis.ttl(attempt_key(user_id=902, quiz_id=1)) <= 500
+    assert 0 < await redis.ttl(attempt_key(user_id=903, quiz_id=1)) <= 50
+
+    assert [key async for key in redis.scan_iter(match="quiz-u90*-quiz1-question*")] == \
+        ["quiz-u904-quiz1-question-notes"]
+
+    # a second run finds nothing left to migrate
+    assert await migrate_legacy_attempts(redis) == 0
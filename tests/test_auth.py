@@ -0,0 +1,138 @@
+import hashlib
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from src.auth import services
+from src.auth.utils import JWKSCache
+from src.config import settings
+from tests.utils import auth_headers, register_user
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = time.monotonic()
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def jwk_set(*kids: str) -> dict:
+    return {"keys": [{"kty": "oct", "kid": kid, "k": "c2VjcmV0", "alg": "HS256"} for kid in kids]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("src.auth.utils.time", clock)
+    monkeypatch.setattr("src.cache.time", clock)
+
+    return clock
+
+
+@pytest.fixture
+def jwks(monkeypatch):
+    jwks = JWKSCache(url="https://example.com/.well-known/jwks.json", min_refresh_interval=60)
+    jwks.published = jwk_set("first")
+    jwks.fetches = 0
+
+    def fetch() -> dict:
+        jwks.fetches += 1
+        return jwks.published
+
+    monkeypatch.setattr(jwks, "fetch", fetch)
+
+    return jwks
+
+
+def login(client, email: str) -> dict:
+    response = client.post("/auth/login", params={"email": email, "password": "password"})
+    assert response.status_code == 200, response.text
+
+    return response.json()
+
+
+def test_refresh_token_is_read_from_the_body(client):
+    user = register_user(client, email="refresh@example.com")
+    tokens = login(client, email=user["email"])
+
+    assert client.post("/auth/refresh", params={"refresh_token": tokens["refresh_token"]}).status_code == 422
+
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["refresh_token"] != tokens["refresh_token"]
+
+
+def test_deleting_a_user_revokes_their_refresh_tokens(client):
+    user = register_user(client, email="deleted@example.com")
+    first = login(client, email=user["email"])
+    second = client.post("/auth/login", params={"email": user["email"], "password": "password",
+                                                "device": "phone"}).json()
+
+    response = client.delete(f"/user/{user['id']}", headers=auth_headers(email=user["email"]))
+    assert response.status_code == 200, response.text
+
+    for tokens in (first, second):
+        assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+
+def test_unknown_kid_refetches_the_key_set(jwks, clock):
+    assert jwks.get_signing_key("first") is not None
+    assert jwks.fetches == 1
+
+    # the key set was rotated after the cooldown, so the new kid is fetched instead of rejected
+    jwks.published = jwk_set("first", "second")
+    clock.now += 60
+
+    assert jwks.get_signing_key("second") is not None
+    assert jwks.get_signing_key("first") is not None
+    assert jwks.fetches == 2
+
+
+def test_unknown_kids_refetch_at_most_once_per_interval(jwks, clock):
+    jwks.get_signing_key("first")
+
+    # a bogus kid every 5 seconds for 70 seconds
+    for _ in range(15):
+        with pytest.raises(jwt.exceptions.PyJWKClientError):
+            jwks.get_signing_key("bogus")
+        clock.now += 5
+
+    # one refresh for the first key, one once the 60 seconds were up
+    assert jwks.fetches == 2
+
+
+@pytest.mark.anyio
+async def test_cached_token_expires_with_its_exp(clock):
+    services.token_cache.clear()
+    token = jwt.encode({"sub": "cached@example.com", "exp": datetime.utcnow() + timedelta(seconds=30)},
+                       settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+
+    assert await services.get_token_email(token=token) == "cached@example.com"
+
+    clock.now += 25
+    assert services.token_cache.get(token_hash) == "cached@example.com"
+
+    clock.now += 10
+    assert services.token_cache.get(token_hash) is None
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("algorithm", [settings.ALGORITHM, "HS384"], ids=["local", "external"])
+async def test_token_without_an_email_is_unauthorized(monkeypatch, algorithm):
+    payload = {"exp": datetime.utcnow() + timedelta(minutes=5)}
+    token = jwt.encode(payload, settings.SECRET_KEY, algorithm=algorithm)
+    # tokens signed with another algorithm are checked against the JWKS
+    monkeypatch.setattr(services, "decode_auth_token", lambda token: payload)
+
+    with pytest.raises(HTTPException) as error:
+        await services.get_token_email(token=token)
+
+    assert error.value.status_code == 401
@@ -0,0 +1,111 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+
+from src.company.crud import CompanyCrud
+from src.company.models import Invite, Request, company_employees
+from src.company.schemes import BulkUsersScheme
+from tests.utils import create_company, create_user
+
+
+UNKNOWN_ID = 999999
+
+
+@pytest.fixture
+async def company(session):
+    owner = await create_user(session, email="owner@example.com")
+    users = {name: await create_user(session, email=f"{name}@example.com", name=name)
+             for name in ("employee", "invited", "requested", "approved", "first", "second")}
+    company = await create_company(session, owner=owner)
+
+    await session.execute(insert(company_employees),
+                          [{"company_id": company.id, "user_id": users[name].id} for name in ("employee", "approved")])
+    await session.execute(insert(Invite), [{"company_id": company.id, "user_id": users["invited"].id,
+                                            "is_accepted": False}])
+    await session.execute(insert(Request), [{"company_id": company.id, "user_id": users["requested"].id,
+                                             "is_accepted": False},
+                                            {"company_id": company.id, "user_id": users["approved"].id,
+                                             "is_accepted": True}])
+    await session.commit()
+
+    return owner, users, company
+
+
+def outcomes(result) -> list:
+    return [(item.user_id, item.email, item.status) for item in result.items]
+
+
+@pytest.mark.anyio
+async def test_bulk_invite_reports_an_outcome_per_given_user(session, company):
+    owner, users, company = company
+    crud = CompanyCrud(db_session=session)
+    first, second = users["first"], users["second"]
+
+    result = await crud.bulk_invite_users(
+        users=BulkUsersScheme(user_ids=[first.id, users["employee"].id, users["invited"].id, owner.id, UNKNOWN_ID,
+                                        first.id],
+                              emails=["second@example.com", "first@example.com", "ghost@example.com"]),
+        company_id=company.id, current_user=owner)
+    await session.commit()
+
+    assert outcomes(result) == [(first.id, "first@example.com", "invited"),
+                                (users["employee"].id, "employee@example.com", "already_member"),
+                                (users["invited"].id, "invited@example.com", "already_invited"),
+                                (owner.id, "owner@example.com", "already_member"),
+                                (UNKNOWN_ID, None, "not_found"),
+                                (first.id, "first@example.com", "duplicate"),
+                                (second.id, "second@example.com", "invited"),
+                                (first.id, "first@example.com", "duplicate"),
+                                (None, "ghost@example.com", "not_found")]
+    assert result.summary == {"invited": 2, "already_member": 2, "already_invited": 1, "not_found": 2,
+                              "duplicate": 2}
+
+    pending = (await session.execute(select(Invite.user_id)
+                                     .filter(Invite.company_id == company.id, Invite.is_accepted.is_(False))
+                                     .order_by(Invite.user_id))).scalars().all()
+    assert pending == sorted([users["invited"].id, first.id, second.id])
+
+    # inviting again creates no second invite
+    again = await crud.bulk_invite_users(users=BulkUsersScheme(user_ids=[first.id, second.id]),
+                                         company_id=company.id, current_user=owner)
+    assert again.summary == {"already_invited": 2}
+
+
+@pytest.mark.anyio
+async def test_bulk_accept_reports_an_outcome_per_given_user(session, company):
+    owner, users, company = company
+    crud = CompanyCrud(db_session=session)
+    requested = users["requested"]
+
+    result = await crud.bulk_accept_requests(
+        users=BulkUsersScheme(user_ids=[requested.id, users["approved"].id, users["first"].id, UNKNOWN_ID],
+                              emails=["requested@example.com"]),
+        company_id=company.id, current_user=owner)
+    await session.commit()
+
+    assert outcomes(result) == [(requested.id, "requested@example.com", "accepted"),
+                                (users["approved"].id, "approved@example.com", "already_accepted"),
+                                (users["first"].id, "first@example.com", "no_request"),
+                                (UNKNOWN_ID, None, "not_found"),
+                                (requested.id, "requested@example.com", "duplicate")]
+    assert result.summary == {"accepted": 1, "already_accepted": 1, "no_request": 1, "not_found": 1,
+                              "duplicate": 1}
+
+    employees = (await session.execute(select(company_employees.c.user_id)
+                                       .filter(company_employees.c.company_id == company.id)
+                                       .order_by(company_employees.c.user_id))).scalars().all()
+    assert employees == sorted([users["employee"].id, users["approved"].id, requested.id])
+    assert (await session.execute(select(Request.is_accepted)
+                                  .filter(Request.user_id == requested.id))).scalar() is True
+
+
+@pytest.mark.anyio
+async def test_only_the_owner_can_act_in_bulk(session, company):
+    owner, users, company = company
+    crud = CompanyCrud(db_session=session)
+    users_scheme = BulkUsersScheme(user_ids=[users["first"].id])
+
+    for action in (crud.bulk_invite_users, crud.bulk_accept_requests):
+        with pytest.raises(HTTPException) as error:
+            await action(users=users_scheme, company_id=company.id, current_user=users["employee"])
+        assert error.value.status_code == 403
@@ -0,0 +1,101 @@
+import pytest
+from sqlalchemy import update
+
+from src.cache import GenerationalCache, Generations
+from src.company.crud import CompanyCrud
+from src.database import async_session
+from src.quiz.crud import QuizCrud
+from src.quiz.models import AnswerVariant
+from src.quiz.services import answer_key_cache, invalidate_quiz_caches, quiz_payload_cache
+from tests.utils import create_company, create_quiz, create_user
+
+
+def test_generations_never_reuse_a_number():
+    generations = Generations(maxsize=2)
+    first = generations.get("a")
+
+    generations.bump("a")
+    assert generations.get("a") != first
+
+    # evicting "a" must not bring back a number pages were cached under
+    seen = {generations.get("a")}
+    generations.get("b")
+    generations.get("c")
+    assert generations.get("a") not in seen | {first}
+
+
+def test_generational_cache_stays_bounded():
+    cache = GenerationalCache(maxsize=8, ttl=60)
+
+    # one scope read under many keys must not grow past the cache size
+    for number in range(cache.maxsize * 2):
+        cache.set(cache.key(1, number), number)
+
+    assert len(cache) == cache.maxsize
+
+
+def test_generational_cache_invalidation_is_scoped():
+    cache = GenerationalCache(maxsize=8, ttl=60)
+
+    cache.set(cache.key(1, "page"), "first")
+    cache.set(cache.key(2, "page"), "second")
+    # read before the invalidation and stored after it, so it must not be served afterwards
+    stale = cache.key(1, "other page")
+
+    cache.invalidate(1)
+    cache.set(stale, "stale")
+
+    assert cache.get(cache.key(1, "page")) is None
+    assert cache.get(cache.key(1, "other page")) is None
+    assert cache.get(cache.key(2, "page")) == "second"
+
+
+@pytest.mark.anyio
+async def test_deleting_a_company_drops_its_quiz_caches(session):
+    owner = await create_user(session, email="owner@example.com")
+    company = await create_company(session, owner=owner)
+    quiz_id = await create_quiz(session, company=company, owner=owner, questions=2)
+    await session.commit()
+
+    await QuizCrud(db_session=session).get_answer_key(quiz_id=quiz_id)
+    quiz_payload_cache.set(quiz_payload_cache.key(quiz_id), "payload")
+    assert answer_key_cache.get(answer_key_cache.key(quiz_id)) is not None
+
+    await CompanyCrud(db_session=session).delete_company(company_id=company.id, current_user=owner)
+    await session.commit()
+
+    assert answer_key_cache.get(answer_key_cache.key(quiz_id)) is None
+    assert quiz_payload_cache.get(quiz_payload_cache.key(quiz_id)) is None
+
+
+@pytest.mark.parametrize("read, edited", [
+    ("get_answer_key", lambda answer_key: [question.correct_answer for question in answer_key.questions] == ["correct"] * 2),
+    ("get_quiz_payload", lambda payload: b'"correct"' in payload.body),
+])
+@pytest.mark.anyio
+async def test_quiz_read_across_an_edit_is_not_served(session, monkeypatch, read, edited):
+    owner = await create_user(session, email="owner@example.com")
+    company = await create_company(session, owner=owner)
+    quiz_id = await create_quiz(session, company=company, owner=owner, questions=2)
+    await session.commit()
+
+    execute = session.execute
+
+    async def execute_across_an_edit(*args, **kwargs):
+        result = await execute(*args, **kwargs)
+
+        # an edit commits and invalidates after the select has read the old variants
+        async with async_session() as edit_session:
+            await edit_session.execute(update(AnswerVariant).filter(AnswerVariant.answer == "right")
+                                       .values(answer="correct"))
+            await edit_session.commit()
+        invalidate_quiz_caches(quiz_id=quiz_id)
+
+        return result
+
+    monkeypatch.setattr(session, "execute", execute_across_an_edit)
+    stale = await getattr(QuizCrud(db_session=session), read)(quiz_id=quiz_id)
+    monkeypatch.undo()
+
+    assert not edited(stale)
+    assert edited(await getattr(QuizCrud(db_session=session), read)(quiz_id=quiz_id))
@@ -0,0 +1,99 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, insert
+
+from src.company.models import company_employees
+from src.pagination import PageParams, decode_cursor
+from src.quiz.crud import QuizCrud
+from src.quiz.schemes import TakeQuiz
+from tests.utils import create_company, create_quiz, create_user
+
+
+async def take(session, user, quiz_id: int, company_id: int, answers: list) -> None:
+    await QuizCrud(db_session=session).pass_quiz(quiz=TakeQuiz(quiz_id=quiz_id, company_id=company_id,
+                                                               answers=answers),
+                                                 current_user=user)
+
+
+@pytest.fixture
+async def company(session, redis):
+    owner = await create_user(session, email="owner@example.com")
+    employees = [await create_user(session, email=f"employee{number}@example.com") for number in range(5)]
+    former = await create_user(session, email="former@example.com")
+    company = await create_company(session, owner=owner)
+    other_company = await create_company(session, owner=owner, title="other")
+    quiz_id = await create_quiz(session, company=company, owner=owner, questions=3)
+    other_quiz = await create_quiz(session, company=other_company, owner=owner, questions=1, title="other")
+
+    await session.execute(insert(company_employees), [{"company_id": company.id, "user_id": user.id}
+                                                      for user in employees + [former]])
+    await session.commit()
+
+    await take(session, employees[0], quiz_id, company.id, ["right", "right", "wrong"])
+    await take(session, employees[0], quiz_id, company.id, ["right", "wrong", "wrong"])
+    await take(session, employees[2], quiz_id, company.id, ["right", "right", "right"])
+    # a result of someone who has left the company since
+    await take(session, former, quiz_id, company.id, ["right", "right", "right"])
+    await session.execute(delete(company_employees).where(company_employees.c.user_id == former.id))
+    await session.commit()
+
+    return owner, employees, company, quiz_id, other_quiz
+
+
+@pytest.mark.anyio
+async def test_completion_report_pages_over_every_employee(session, company):
+    owner, employees, company, quiz_id, other_quiz = company
+    crud = QuizCrud(db_session=session)
+
+    pages = []
+    page = PageParams(after=None, limit=2)
+
+    while True:
+        report = await crud.get_completion_report(company_id=company.id, quiz_id=quiz_id, page=page,
+                                                  current_user=owner)
+        pages.append(report)
+
+        if report["next_cursor"] is None:
+            break
+        page = PageParams(after=decode_cursor(report["next_cursor"])["id"], limit=2)
+
+    # the summary scans the whole company and only comes with the first page
+    assert [len(report["items"]) for report in pages] == [2, 2, 1]
+    assert pages[0]["summary"] == {"employees": 5, "completed": 2, "completion_rate": 0.4}
+    assert [report["summary"] for report in pages[1:]] == [None, None]
+
+    items = {item["user_id"]: item for report in pages for item in report["items"]}
+    assert list(items) == [user.id for user in employees]
+
+    first, third = items[employees[0].id], items[employees[2].id]
+    assert (first["taken"], first["correct_answers"], first["all_answers"]) == (True, 3, 6)
+    assert first["gpa"] == pytest.approx(0.5) and first["date"] is not None
+    assert (third["taken"], third["correct_answers"], third["all_answers"]) == (True, 3, 3)
+
+    for user in (employees[1], employees[3], employees[4]):
+        assert items[user.id] == {"user_id": user.id, "taken": False, "date": None, "correct_answers": None,
+                                  "all_answers": None, "gpa": None}
+
+
+@pytest.mark.anyio
+async def test_employees_who_have_not_taken_the_quiz_have_no_time(session, company):
+    owner, employees, company, quiz_id, other_quiz = company
+
+    rows = await QuizCrud(db_session=session).get_employee_id_with_time(company_id=company.id, quiz_id=quiz_id,
+                                                                         current_user=owner)
+
+    assert [row["user_id"] for row in rows] == [user.id for user in employees]
+    assert [row["time"] is not None for row in rows] == [True, False, True, False, False]
+
+
+@pytest.mark.anyio
+async def test_completion_report_is_for_managers_of_the_quiz_company(session, company):
+    owner, employees, company, quiz_id, other_quiz = company
+    crud = QuizCrud(db_session=session)
+
+
+    for current_user, quiz, status in ((employees[0], quiz_id, 403), (owner, other_quiz, 404)):
+        with pytest.raises(HTTPException) as error:
+            await crud.get_completion_report(company_id=company.id, quiz_id=quiz, page=PageParams(after=None, limit=2),
+                                             current_user=current_user)
+        assert error.value.status_code == status
@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import delete, insert
+
+from src.company.models import company_admins, company_employees
+from src.quiz.crud import QuizCrud, iter_company_attempts
+from src.quiz.schemes import TakeQuiz
+from tests.conftest import clear_caches
+from tests.utils import auth_headers, create_company, create_quiz, create_user, quiz_document, register_user
+
+
+def test_company_export_holds_one_connection(client, engine_events):
+    user = register_user(client, email="export@example.com")
+    headers = auth_headers(email=user["email"])
+
+    company = client.post("/company/create", params={"title": "export", "description": "", "is_visible": True},
+                          headers=headers).json()
+    quiz = client.post("/quiz/create_quiz_document", params={"company_id": company["id"]},
+                       json=quiz_document(questions=3).dict(), headers=headers).json()
+    client.put(f"/quiz/pass_quiz/{quiz['quiz_id']}", headers=headers,
+               json={"quiz_id": quiz["quiz_id"], "company_id": company["id"], "answers": ["right", "wrong", "right"]})
+
+    # with cold caches the auth and rights checks read through the request session
+    clear_caches()
+    engine_events.reset()
+    response = client.get(f"/quiz/export_company_results/{company['id']}", params={"export_format": "ndjson"},
+                          headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert len(response.text.splitlines()) == 3
+    # the request session gives its connection back before the export session takes one
+    assert engine_events.peak == 1
+
+
+@pytest.mark.anyio
+async def test_export_pages_read_current_members_in_short_transactions(session, redis, engine_events):
+    owner = await create_user(session, email="owner@example.com")
+    admin, employee, former = [await create_user(session, email=f"{name}@example.com")
+                               for name in ("admin", "employee", "former")]
+    company = await create_company(session, owner=owner)
+    quiz_ids = [await create_quiz(session, company=company, owner=owner, questions=2, title=f"quiz {number}")
+                for number in range(2)]
+
+    await session.execute(insert(company_employees), [{"company_id": company.id, "user_id": user.id}
+                                                      for user in (admin, employee, former)])
+    await session.execute(insert(company_admins), [{"company_id": company.id, "user_id": admin.id}])
+    await session.commit()
+
+    for user in (owner, admin, employee, former):
+        for quiz_id in quiz_ids:
+            await QuizCrud(db_session=session).pass_quiz(quiz=TakeQuiz(quiz_id=quiz_id, company_id=company.id,
+                                                                       answers=["right", "wrong"]),
+                                                         current_user=user)
+    # former has left since, their results stay but their answers are no longer exported
+    await session.execute(delete(company_employees).where(company_employees.c.user_id == former.id))
+    await session.commit()
+
+    engine_events.reset()
+    pages = []
+
+    async for page in iter_company_attempts(company_id=company.id, page_size=2):
+        # the consumer of a page holds no connection, and with it no transaction
+        assert engine_events.open == 0
+        pages.append(page)
+
+    assert pages == [[(owner.id, quiz_ids[0]), (owner.id, quiz_ids[1])],
+                     [(admin.id, quiz_ids[0]), (admin.id, quiz_ids[1])],
+                     [(employee.id, quiz_ids[0]), (employee.id, quiz_ids[1])]]
+    # a full last page takes one more read to find the end
+    assert engine_events.checkouts == 4
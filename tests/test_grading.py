@@ -0,0 +1,75 @@
+import time
+
+import pytest
+from redis.asyncio.client import Pipeline, Redis
+
+from src.quiz.crud import QuizCrud
+from src.quiz.schemes import TakeQuiz
+from src.quiz.services import answer_key_cache
+from tests.utils import create_company, create_quiz, create_user
+
+
+class RoundTrips:
+
+    def __init__(self, engine_events):
+        self.engine_events = engine_events
+        self.redis = 0
+
+    @property
+    def statements(self) -> int:
+        return self.engine_events.statements
+
+    def reset(self) -> None:
+        self.engine_events.reset()
+        self.redis = 0
+
+
+@pytest.fixture
+def round_trips(monkeypatch, engine_events):
+    round_trips = RoundTrips(engine_events)
+
+    # a pipeline buffers its commands and sends them in one go, so only execute is a round-trip
+    execute_command, execute = Redis.execute_command, Pipeline.execute
+
+    async def counted_command(self, *args, **options):
+        round_trips.redis += 1
+        return await execute_command(self, *args, **options)
+
+    async def counted_execute(self, *args, **kwargs):
+        round_trips.redis += 1
+        return await execute(self, *args, **kwargs)
+
+    monkeypatch.setattr(Redis, "execute_command", counted_command)
+    monkeypatch.setattr(Pipeline, "execute", counted_execute)
+
+    return round_trips
+
+
+@pytest.mark.anyio
+async def test_round_trips_per_submission_do_not_grow_with_questions(session, redis, round_trips):
+    owner = await create_user(session, email="owner@example.com")
+    company = await create_company(session, owner=owner)
+    await session.commit()
+
+    per_submission = {}
+
+    for questions in (2, 10, 40, 200):
+        quiz_id = await create_quiz(session, company=company, owner=owner, questions=questions,
+                                    title=f"{questions} questions")
+        await session.commit()
+
+        # a cold answer key adds its single load to the count
+        answer_key_cache.clear()
+        round_trips.reset()
+        started = time.perf_counter()
+
+        await QuizCrud(db_session=session).pass_quiz(quiz=TakeQuiz(quiz_id=quiz_id, company_id=company.id,
+                                                                   answers=["right"] * questions),
+                                                     current_user=owner)
+        await session.commit()
+
+        per_submission[questions] = (round_trips.statements, round_trips.redis)
+        print(f"{questions} questions: {round_trips.statements} statements, {round_trips.redis} redis round-trips, "
+              f"{(time.perf_counter() - started) * 1000:.2f} ms")
+
+    assert len(set(per_submission.values())) == 1, per_submission
@@ -0,0 +1,60 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.auth import auth
+from src.auth.hashing import PasswordHasher
+from tests.utils import auth_headers, register_user
+
+
+LOGINS = 16
+BENCHMARK_ROUNDS = 11
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    # a production-like cost, the suite otherwise hashes with BCRYPT_ROUNDS=4
+    hasher = PasswordHasher(rounds=BENCHMARK_ROUNDS, workers=2, max_queue=LOGINS)
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+
+    yield hasher
+
+    hasher.shutdown()
+
+
+def timed(call) -> float:
+    started = time.perf_counter()
+    response = call()
+    assert response.status_code == 200, response.text
+
+    return time.perf_counter() - started
+
+
+def test_logins_do_not_stall_other_requests(client, hasher):
+    user = register_user(client, email="hashing@example.com")
+    headers = auth_headers(email=user["email"])
+
+    def login():
+        return timed(lambda: client.post("/auth/login", params={"email": user["email"], "password": "password"}))
+
+    def get_user():
+        return timed(lambda: client.get(f"/user/{user['id']}", headers=headers))
+
+    idle = [get_user() for _ in range(20)]
+
+    with ThreadPoolExecutor(max_workers=LOGINS + 1) as pool:
+        logins = [pool.submit(login) for _ in range(LOGINS)]
+        # the requests share the event loop of the app with the logins in flight
+        loaded = [get_user() for _ in range(20)]
+        logins = [future.result() for future in logins]
+
+    print(f"{LOGINS} concurrent logins at {BENCHMARK_ROUNDS} rounds: login median "
+          f"{statistics.median(logins) * 1000:.1f} ms; GET /user/{{id}} median "
+          f"{statistics.median(idle) * 1000:.1f} ms idle, {statistics.median(loaded) * 1000:.1f} ms during logins; "
+          f"peak hashing queue {hasher.max_queue_depth}")
+
+    assert hasher.completed >= LOGINS
+    # bcrypt runs in the pool, so an unrelated request waits for far less than a hash
+    assert statistics.median(loaded) < statistics.median(logins)
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from sqlalchemy import text
+
+
+SEED = [
+    "INSERT INTO users (id, name, surname, age, email, password, created_at, updated_at) "
+    "SELECT n, 'name', 'surname', 30, 'user' || n || '@example.com', '', now(), now() "
+    "FROM generate_series(1, 2000) AS n",
+    "INSERT INTO companies (id, title, description, is_visible, owner_id) "
+    "SELECT n, 'company ' || n, '', true, n FROM generate_series(1, 2000) AS n",
+    "INSERT INTO quizzes (id, company_id, title, description, frequency) "
+    "SELECT n, n % 100 + 1, 'quiz', '', 1 FROM generate_series(1, 1000) AS n",
+    "INSERT INTO questions (id, quiz_id, question) "
+    "SELECT n, n % 1000 + 1, 'question' FROM generate_series(1, 10000) AS n",
+    "INSERT INTO variants (question_id, answer, is_correct) "
+    "SELECT n % 10000 + 1, 'answer', n % 4 = 0 FROM generate_series(1, 40000) AS n",
+    "INSERT INTO results (user_id, quiz_id, correct_answers, all_answers, gpa, datetime) "
+    "SELECT n % 2000 + 1, n / 2000 + 1, 1, 2, 0.5, now() FROM generate_series(0, 29999) AS n",
+    "INSERT INTO invites (user_id, company_id, is_accepted) "
+    "SELECT n % 2000 + 1, n % 100 + 1, false FROM generate_series(1, 10000) AS n",
+    "INSERT INTO requests (user_id, company_id, is_accepted) "
+    "SELECT n % 2000 + 1, n % 100 + 1, false FROM generate_series(1, 10000) AS n",
+    "INSERT INTO company_employees (company_id, user_id) "
+    "SELECT n / 2000 + 1, n % 2000 + 1 FROM generate_series(0, 19999) AS n",
+    "INSERT INTO company_admins (company_id, user_id) "
+    "SELECT n / 2000 + 1, n % 2000 + 1 FROM generate_series(0, 19999, 3) AS n",
+]
+
+# the lookups behind pass_quiz, get_invite, get_request, membership checks and the quiz catalog
+HOT_LOOKUPS = [
+    ("SELECT * FROM results WHERE user_id = 17 AND quiz_id = 5", "uq_results_user_id_quiz_id"),
+    ("SELECT * FROM invites WHERE user_id = 17 AND company_id = 18", "ix_invites_user_id_company_id"),
+    ("SELECT * FROM requests WHERE user_id = 17 AND company_id = 18", "ix_requests_user_id_company_id"),
+    ("SELECT * FROM questions WHERE quiz_id = 5", "ix_questions_quiz_id"),
+    ("SELECT * FROM variants WHERE question_id = 5 AND is_correct", "ix_variants_question_id_is_correct"),
+    ("SELECT * FROM quizzes WHERE company_id = 5", "ix_quizzes_company_id"),
+    ("SELECT * FROM companies WHERE owner_id = 5", "ix_companies_owner_id"),
+    ("SELECT EXISTS (SELECT 1 FROM company_employees WHERE company_id = 18 AND user_id = 17)",
+     "company_employees_pkey"),
+    ("SELECT company_id FROM company_employees WHERE user_id = 17", "ix_company_employees_user_id"),
+    ("SELECT EXISTS (SELECT 1 FROM company_admins WHERE company_id = 18 AND user_id = 17)",
+     "company_admins_pkey"),
+    ("SELECT company_id FROM company_admins WHERE user_id = 15", "ix_company_admins_user_id"),
+]
+
+
+def plan_indexes(plan: dict) -> set:
+    indexes = {plan["Index Name"]} if "Index Name" in plan else set()
+
+    for child in plan.get("Plans", []):
+        indexes |= plan_indexes(child)
+
+    return indexes
+
+
+@pytest.mark.anyio
+async def test_hot_lookups_use_indexes(session):
+    for statement in SEED:
+        await session.execute(text(statement))
+
+    await session.commit()
+
+    for table in ("users", "companies", "quizzes", "questions", "variants", "results", "invites", "requests",
+                  "company_employees", "company_admins"):
+        await session.execute(text(f"ANALYZE {table}"))
+
+    sequential = {}
+
+    for query, index in HOT_LOOKUPS:
+        plan = (await session.execute(text(f"EXPLAIN (FORMAT JSON) {query}"))).scalar()
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        if index not in plan_indexes(plan[0]["Plan"]):
+            sequential[query] = plan
+
+    assert not sequential, json.dumps(sequential, indent=2)
@@ -0,0 +1,89 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from src.company.crud import CompanyCrud
+from src.company.models import company_admins, company_employees
+from src.quiz.crud import QuizCrud
+from src.quiz.schemes import AnswerRecord
+from src.quiz.services import write_attempt
+from tests.utils import create_company, create_quiz, create_user
+
+
+UNKNOWN_ID = 999999
+
+
+@pytest.fixture
+async def company(session):
+    owner = await create_user(session, email="owner@example.com")
+    users = {name: await create_user(session, email=f"{name}@example.com", name=name)
+             for name in ("admin", "employee", "outsider")}
+    filler = [await create_user(session, email=f"filler{number}@example.com") for number in range(200)]
+    company = await create_company(session, owner=owner)
+
+    await session.execute(insert(company_employees),
+                          [{"company_id": company.id, "user_id": user.id}
+                           for user in [users["admin"], users["employee"]] + filler])
+    await session.execute(insert(company_admins), [{"company_id": company.id, "user_id": users["admin"].id}])
+    await session.commit()
+
+    return owner, users, company
+
+
+@pytest.mark.anyio
+async def test_role_is_read_with_one_statement(session, company, engine_events):
+    owner, users, company = company
+    crud = CompanyCrud(db_session=session)
+
+    for user, role in ((owner, "owner"), (users["admin"], "admin"), (users["employee"], "employee"),
+                       (users["outsider"], None)):
+        engine_events.reset()
+
+        assert await crud.get_role(user_id=user.id, company_id=company.id) == role
+        # the probes stop at one row, whatever the size of the roster
+        assert engine_events.statements == 1
+
+    with pytest.raises(HTTPException) as error:
+        await crud.get_role(user_id=owner.id, company_id=UNKNOWN_ID)
+    assert error.value.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_membership_probes(session, company):
+    owner, users, company = company
+    crud = CompanyCrud(db_session=session)
+
+    assert [await crud.is_employee(user_id=user.id, company_id=company.id)
+            for user in (owner, users["admin"], users["employee"], users["outsider"])] == [False, True, True, False]
+    assert [await crud.is_admin(user_id=user.id, company_id=company.id)
+            for user in (owner, users["admin"], users["employee"], users["outsider"])] == [False, True, False, False]
+    assert await crud.get_company_owner_id(company_id=company.id) == owner.id
+
+    for check in (crud.company_exists(company_id=UNKNOWN_ID),
+                  crud.get_company_owner_id(company_id=UNKNOWN_ID),
+                  crud.check_if_employee_in_company(employee_id=users["outsider"].id, company_id=company.id),
+                  crud.check_if_employee_in_admins(employee_id=users["employee"].id, company_id=company.id)):
+        with pytest.raises(HTTPException) as error:
+            await check
+        assert error.value.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_employee_export_is_limited_to_members(session, redis, company):
+    owner, users, company = company
+    quiz_id = await create_quiz(session, company=company, owner=owner, questions=1)
+    await session.commit()
+
+    records = [AnswerRecord(question_number=1, question="question 0", answer="right", is_correct=True)]
+    for user in (users["employee"], users["outsider"]):
+        await write_attempt(redis, user_id=user.id, quiz_id=quiz_id, records=records)
+
+    crud = QuizCrud(db_session=session)
+
+    assert await crud.export_employee_results(quiz_id=quiz_id, employee_id=users["employee"].id,
+                                              company_id=company.id, current_user=owner) == records
+
+    with pytest.raises(HTTPException) as error:
+        await crud.export_employee_results(quiz_id=quiz_id, employee_id=users["outsider"].id,
+                                           company_id=company.id, current_user=owner)
+    assert error.value.status_code == 404
@@ -0,0 +1,81 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.config import settings
+from src.database import async_session, engine
+from tests.utils import auth_headers, quiz_document, register_user
+
+
+@pytest.fixture
+def baseline_engine(client):
+    # the engine as it was before the production profile: echo on, default pool, no server settings
+    baseline = create_async_engine(settings.DATABASE_URL, future=True, echo=True)
+
+    yield baseline
+
+    # its connections live on the event loop of the client, so they are closed there before shutdown
+    client.portal.call(baseline.dispose)
+
+
+@contextmanager
+def bound_to(bind):
+    # every handler gets its session from async_session, so rebinding it moves the requests to another engine
+    previous = async_session.kw["bind"]
+    async_session.configure(bind=bind)
+
+    try:
+        yield
+    finally:
+        async_session.configure(bind=previous)
+
+
+def throughput(client, method: str, path: str, headers: dict, json=None, runs: int = 100) -> float:
+    timings = []
+
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.request(method, path, json=json, headers=headers)
+        timings.append(time.perf_counter() - started)
+
+        assert response.status_code == 200, response.text
+
+    return 1 / statistics.median(timings)
+
+
+def test_hot_paths_against_the_baseline_engine(engine_events, client, baseline_engine):
+    user = register_user(client, email="prepared@example.com")
+    headers = auth_headers(email=user["email"])
+
+    company = client.post("/company/create", params={"title": "prepared", "description": "", "is_visible": True},
+                          headers=headers).json()
+    quiz = client.post("/quiz/create_quiz_document", params={"company_id": company["id"]},
+                       json=quiz_document(questions=5).dict(), headers=headers).json()
+    answers = {"quiz_id": quiz["quiz_id"], "company_id": company["id"], "answers": ["right"] * 5}
+
+    requests = {"GET /user/": ("GET", "/user/", None),
+                "PUT /quiz/pass_quiz": ("PUT", f"/quiz/pass_quiz/{quiz['quiz_id']}", answers)}
+    results = {}
+
+    for profile, bind in (("baseline", baseline_engine), ("production", engine)):
+        with bound_to(bind):
+            for name, (method, path, body) in requests.items():
+                # the first runs open connections and fill the statement caches of this engine
+                throughput(client, method, path, headers=headers, json=body, runs=10)
+                results[profile, name] = throughput(client, method, path, headers=headers, json=body)
+
+    for name in requests:
+        baseline, production = results["baseline", name], results["production", name]
+        print(f"{name}: baseline engine {baseline:.0f} req/s, production engine {production:.0f} req/s "
+              f"({production / baseline:.2f}x)")
+
+    # the dialect reads its cache size from the url, not from asyncpg's statement_cache_size
+    assert engine.dialect.create_connect_args(engine.url)[1]["prepared_statement_cache_size"] == \
+        settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+
+    assert engine_events.connections
+    for connection in engine_events.connections:
+        assert connection._prepared_statement_cache.capacity == settings.DB_PREPARED_STATEMENT_CACHE_SIZE
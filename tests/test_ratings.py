@@ -0,0 +1,180 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select, text
+
+from src.database import async_session
+from src.quiz.crud import QuizCrud, RATING_MODELS
+from src.quiz.models import Result
+from src.quiz.schemes import TakeQuiz
+from src.quiz.services import answer_key_cache
+from src.user.crud import UserCrud
+from tests.utils import create_company, create_quiz, create_user, quiz_document
+
+
+async def rollups(session) -> dict:
+    snapshot = {}
+
+    for model in RATING_MODELS:
+        keys = [column.key for column in model.__table__.primary_key]
+        rows = (await session.execute(select(model.__table__))).mappings().all()
+
+        # rows a deletion brought down to zero are the same as rows that were never there
+        snapshot[model.__tablename__] = {tuple(row[key] for key in keys): {column: round(value, 9)
+                                                                           for column, value in row.items()}
+                                         for row in rows if any(row[column] for column in row.keys()
+                                                                if column not in keys)}
+
+    return snapshot
+
+
+async def assert_rollups_match_rebuild(session) -> None:
+    await session.commit()
+
+    maintained = await rollups(session)
+
+    async with async_session() as rebuild_session:
+        for model in RATING_MODELS:
+            async with rebuild_session.begin():
+                await QuizCrud(db_session=rebuild_session).rebuild_rating(model=model)
+
+    assert maintained == await rollups(session)
+
+
+async def take(session, user, quiz_id: int, company_id: int, answers: list) -> None:
+    await QuizCrud(db_session=session).pass_quiz(quiz=TakeQuiz(quiz_id=quiz_id, company_id=company_id,
+                                                               answers=answers),
+                                                 current_user=user)
+
+
+@pytest.fixture
+async def quizzes(session, redis):
+    owner = await create_user(session, email="owner@example.com")
+    taker = await create_user(session, email="taker@example.com")
+    company = await create_company(session, owner=owner)
+
+    first = await create_quiz(session, company=company, owner=owner, questions=3, title="first")
+    second = await create_quiz(session, company=company, owner=owner, questions=4, title="second")
+
+    await take(session, owner, first, company.id, ["right", "wrong", "right"])
+    await take(session, owner, first, company.id, ["right", "right", "right"])
+    await take(session, taker, first, company.id, ["wrong", "wrong", "right"])
+    await take(session, taker, second, company.id, ["right", "wrong", "wrong", "wrong"])
+    await session.commit()
+
+    return owner, taker, company, first, second
+
+
+@pytest.mark.anyio
+async def test_submissions_keep_rollups_exact(session, quizzes):
+    owner, taker, company, first, second = quizzes
+
+    await assert_rollups_match_rebuild(session)
+
+    gpas = (await session.execute(select(Result.quiz_id, Result.gpa))).all()
+    quiz_crud = QuizCrud(db_session=session)
+
+    # the GPA endpoints are the mean of per-result GPA
+    assert (await quiz_crud.get_gpa_for_all_quizzes())["gpa"] == pytest.approx(sum(gpa for _, gpa in gpas) / 3)
+    assert (await quiz_crud.get_gpa_for_one_quiz(quiz_id=first))["gpa"] == pytest.approx((5 / 6 + 1 / 3) / 2)
+    # ratings are correct answers over all answers
+    assert (await quiz_crud.get_company_rating(company_id=company.id))["gpa"] == pytest.approx(7 / 13)
+
+
+@pytest.mark.anyio
+async def test_deleting_results_keeps_rollups_exact(session, quizzes):
+    owner, taker, company, first, second = quizzes
+    quiz_crud = QuizCrud(db_session=session)
+
+    await UserCrud(db_session=session).delete_user(user_id=taker.id)
+    await assert_rollups_match_rebuild(session)
+
+    await quiz_crud.replace_quiz_document(quiz_id=second, document=quiz_document(2, title="second"),
+                                          current_user=owner, reset_results=True)
+    await assert_rollups_match_rebuild(session)
+
+    await quiz_crud.delete_quiz(quiz_id=first, current_user=owner)
+    await assert_rollups_match_rebuild(session)
+
+    assert (await quiz_crud.get_gpa_for_all_quizzes())["gpa"] == 0.0
+    assert (await session.execute(select(func.count(Result.id)))).scalar() == 0
+
+
+@pytest.mark.anyio
+async def test_simultaneous_submissions_add_up(session, redis):
+    owner = await create_user(session, email="owner@example.com")
+    company = await create_company(session, owner=owner)
+    quiz_id = await create_quiz(session, company=company, owner=owner, questions=4)
+    await session.commit()
+
+    answers = [["right", "right", "wrong", "wrong"], ["right", "wrong", "wrong", "wrong"],
+               ["right", "right", "right", "wrong"], ["wrong", "wrong", "wrong", "wrong"]] * 4
+    started = asyncio.Barrier(len(answers))
+
+    async def submit(submission: list) -> None:
+        async with async_session() as submission_session:
+            await started.wait()
+            await take(submission_session, owner, quiz_id, company.id, submission)
+            await submission_session.commit()
+
+    await asyncio.gather(*(submit(submission) for submission in answers))
+
+    correct_answers = sum(submission.count("right") for submission in answers)
+    results = (await session.execute(select(Result.correct_answers, Result.all_answers, Result.gpa)
+                                     .filter(Result.user_id == owner.id, Result.quiz_id == quiz_id))).all()
+
+    assert results == [(correct_answers, 4 * len(answers), pytest.approx(correct_answers / (4 * len(answers))))]
+
+    quiz_crud = QuizCrud(db_session=session)
+    assert (await quiz_crud.get_user_rating(user_id=owner.id))["gpa"] == pytest.approx(correct_answers / 64)
+    assert (await quiz_crud.get_gpa_for_all_quizzes())["gpa"] == pytest.approx(correct_answers / 64)
+
+    await assert_rollups_match_rebuild(session)
+
+
+@pytest.mark.anyio
+async def test_replacing_a_document_keeps_results_by_default(session, quizzes):
+    owner, taker, company, first, second = quizzes
+
+    before = (await session.execute(select(Result.user_id, Result.correct_answers, Result.all_answers)
+                                    .filter(Result.quiz_id == first).order_by(Result.user_id))).all()
+
+    await QuizCrud(db_session=session).replace_quiz_document(quiz_id=first, document=quiz_document(3, title="first"),
+                                                             current_user=owner)
+    await assert_rollups_match_rebuild(session)
+
+    assert (await session.execute(select(Result.user_id, Result.correct_answers, Result.all_answers)
+                                  .filter(Result.quiz_id == first).order_by(Result.user_id))).all() == before
+
+
+@pytest.mark.anyio
+async def test_deleting_an_owner_takes_their_companies_out_of_the_rollups(session, quizzes):
+    owner, taker, company, first, second = quizzes
+
+    # the taker also has a result in a company of their own, which has to survive the owner's deletion
+    own_company = await create_company(session, owner=taker, title="own company")
+    own_quiz = await create_quiz(session, company=own_company, owner=taker, questions=2, title="own")
+    await take(session, taker, own_quiz, own_company.id, ["right", "wrong"])
+    await session.commit()
+
+    await QuizCrud(db_session=session).get_answer_key(quiz_id=first)
+
+    await UserCrud(db_session=session).delete_user(user_id=owner.id)
+    await assert_rollups_match_rebuild(session)
+
+    assert answer_key_cache.get(answer_key_cache.key(first)) is None
+    assert (await session.execute(select(Result.user_id, Result.quiz_id))).all() == [(taker.id, own_quiz)]
+    assert (await QuizCrud(db_session=session).get_gpa_for_all_quizzes())["gpa"] == pytest.approx(0.5)
+
+
+@pytest.mark.anyio
+async def test_rebuild_is_not_cut_off_by_the_statement_timeout(session):
+    async with session.begin():
+        await QuizCrud(db_session=session).rebuild_rating(model=RATING_MODELS[0])
+
+        settings = (await session.execute(text("SELECT current_setting('statement_timeout'), "
+                                               "current_setting('lock_timeout')"))).one()
+
+    assert settings == ("0", "5s")
+    # SET LOCAL ends with the rebuild transaction, the pooled connection keeps the app timeout
+    assert (await session.execute(text("SHOW statement_timeout"))).scalar() == "30s"
@@ -0,0 +1,100 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from src.company.crud import CompanyCrud
+from src.company.models import company_admins, company_employees
+from src.pagination import PageParams, decode_cursor
+from tests.utils import create_company, create_user
+
+
+@pytest.fixture
+async def roster(session):
+    owner = await create_user(session, email="olga@example.com", name="olga")
+    members = {name: await create_user(session, email=f"{name}@example.com", name=name)
+               for name in ("anna", "andrew", "boris", "alice", "zed", "a%b")}
+    outsider = await create_user(session, email="nobody@example.com", name="nobody")
+    company = await create_company(session, owner=owner)
+
+    await session.execute(insert(company_employees),
+                          [{"company_id": company.id, "user_id": members[name].id}
+                           for name in ("anna", "andrew", "boris", "alice", "a%b")])
+    # zed is an admin without being an employee, alice is both
+    await session.execute(insert(company_admins),
+                          [{"company_id": company.id, "user_id": members[name].id} for name in ("alice", "zed")])
+    await session.commit()
+
+    return owner, members, outsider, company
+
+
+async def read_roster(session, company, current_user, search=None, limit=50) -> dict:
+    return await CompanyCrud(db_session=session).get_roster(company_id=company.id,
+                                                            page=PageParams(after=None, limit=limit),
+                                                            current_user=current_user, search=search)
+
+
+@pytest.mark.anyio
+async def test_roster_lists_every_member_once_with_their_role(session, roster):
+    owner, members, outsider, company = roster
+
+    page = await read_roster(session, company, current_user=members["boris"])
+
+    assert {item["email"]: item["role"] for item in page["items"]} == {
+        "olga@example.com": "owner", "alice@example.com": "admin", "zed@example.com": "admin",
+        "anna@example.com": "employee", "andrew@example.com": "employee", "boris@example.com": "employee",
+        "a%b@example.com": "employee"}
+    assert page["total"] == 7
+    assert page["next_cursor"] is None
+
+    with pytest.raises(HTTPException) as error:
+        await read_roster(session, company, current_user=outsider)
+    assert error.value.status_code == 403
+
+
+@pytest.mark.anyio
+async def test_roster_pages_follow_the_cursor(session, roster):
+    owner, members, outsider, company = roster
+    crud = CompanyCrud(db_session=session)
+
+    seen = []
+    page = PageParams(after=None, limit=3)
+
+    while True:
+        roster_page = await crud.get_roster(company_id=company.id, page=page, current_user=owner)
+        assert roster_page["total"] == 7
+        seen.extend(item["user_id"] for item in roster_page["items"])
+
+        if roster_page["next_cursor"] is None:
+            break
+        page = PageParams(after=decode_cursor(roster_page["next_cursor"])["id"], limit=3)
+
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen)) == 7
+
+
+@pytest.mark.anyio
+async def test_roster_search_is_a_case_insensitive_escaped_prefix(session, roster):
+    owner, members, outsider, company = roster
+
+    page = await read_roster(session, company, current_user=owner, search="A")
+    assert sorted(item["name"] for item in page["items"]) == ["a%b", "alice", "andrew", "anna"]
+    assert page["total"] == 4
+
+    # % is matched literally, not as a wildcard
+    page = await read_roster(session, company, current_user=owner, search="a%")
+    assert [item["name"] for item in page["items"]] == ["a%b"]
+    assert page["total"] == 1
+
+    assert (await read_roster(session, company, current_user=owner, search="nobody"))["total"] == 0
+
+
+@pytest.mark.anyio
+async def test_roster_total_follows_new_members(session, roster):
+    owner, members, outsider, company = roster
+
+    assert (await read_roster(session, company, current_user=owner))["total"] == 7
+
+    await CompanyCrud(db_session=session).add_user_to_employees(user_id=outsider.id, company_id=company.id)
+    await session.commit()
+
+    assert (await read_roster(session, company, current_user=owner))["total"] == 8
@@ -0,0 +1,43 @@
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.pagination import Page, page_response
+from src.user.schemas import UserGetSchema
+
+
+ROWS = 500
+ROUNDS = 50
+
+
+def rows_per_second(render) -> float:
+    started = time.perf_counter()
+
+    for _ in range(ROUNDS):
+        render()
+
+    return ROWS * ROUNDS / (time.perf_counter() - started)
+
+
+def test_page_serialization_rows_per_second():
+    rows = [{"id": number, "name": f"name {number}", "surname": "surname", "email": f"user{number}@example.com",
+             "age": 30} for number in range(ROWS)]
+
+    def validated():
+        # what a response_model route does: a model per row, validated again and encoded by the json module
+        page = Page[UserGetSchema](items=[UserGetSchema(**row) for row in rows], next_cursor=None)
+        return JSONResponse(jsonable_encoder(page)).body
+
+    def lean():
+        return page_response(items=rows, next_cursor=None).body
+
+    assert json.loads(lean()) == json.loads(validated())
+
+    validated_rate, lean_rate = rows_per_second(validated), rows_per_second(lean)
+
+    print(f"{ROWS} rows per page: {validated_rate:,.0f} rows/s through response_model, "
+          f"{lean_rate:,.0f} rows/s through page_response")
+
+    assert lean_rate > validated_rate
@@ -0,0 +1,70 @@
+import statistics
+
+import pytest
+
+from tests.utils import auth_headers, register_user
+
+
+@pytest.fixture
+def responses():
+    # one entry per response: whether every connection was back in the pool when its status line went out
+    return []
+
+
+@pytest.fixture
+def asgi_app(engine_events, responses):
+    from src.main import app
+
+    async def tracked(scope, receive, send):
+        async def tracked_send(message):
+            if message["type"] == "http.response.start":
+                responses.append(not engine_events.checked_out)
+            await send(message)
+
+        await app(scope, receive, tracked_send)
+
+    return tracked
+
+
+def test_authenticated_request_checks_out_one_connection(client, engine_events):
+    user = register_user(client, email="one-connection@example.com")
+    headers = auth_headers(email=user["email"])
+
+    for _ in range(5):
+        engine_events.reset()
+
+        response = client.get(f"/user/{user['id']}", headers=headers)
+
+        assert response.status_code == 200, response.text
+        # auth and handler share the request session, so one checkout serves both
+        assert engine_events.checkouts == 1
+
+
+def test_write_is_committed_before_the_response(client, engine_events, responses):
+    user = register_user(client, email="committed-write@example.com")
+    headers = auth_headers(email=user["email"])
+
+    responses.clear()
+    response = client.put(f"/user/{user['id']}", json={"name": "renamed"}, headers=headers)
+
+    assert response.status_code == 200, response.text
+    # the commit returned the connection to the pool before the status line went out
+    assert responses == [True]
+    assert client.get(f"/user/{user['id']}", headers=headers).json()["name"] == "renamed"
+
+
+def test_connection_hold_per_request(client, engine_events):
+    user = register_user(client, email="hold-time@example.com")
+    headers = auth_headers(email=user["email"])
+
+    for method, path, body in (("GET", f"/user/{user['id']}", None),
+                               ("PUT", f"/user/{user['id']}", {"age": 31})):
+        engine_events.reset()
+
+        for _ in range(20):
+            assert client.request(method, path, json=body, headers=headers).status_code == 200
+
+        print(f"{method} {path}: {engine_events.checkouts / 20:.1f} checkouts per request, "
+              f"median connection hold {statistics.median(engine_events.holds) * 1000:.2f} ms")
+
+        assert engine_events.checkouts == 20
@@ -0,0 +1,34 @@
+from tests.utils import auth_headers, quiz_document, register_user
+
+
+def test_gzip_and_identity_bodies_have_their_own_etags(client):
+    user = register_user(client, email="taker@example.com")
+    headers = auth_headers(email=user["email"])
+
+    company = client.post("/company/create", params={"title": "etags", "description": "", "is_visible": True},
+                          headers=headers).json()
+    quiz = client.post("/quiz/create_quiz_document", params={"company_id": company["id"]},
+                       json=quiz_document(questions=3).dict(), headers=headers).json()
+    path = f"/quiz/take_quiz/{quiz['quiz_id']}"
+
+    identity = client.get(path, headers={**headers, "Accept-Encoding": "identity"})
+    gzipped = client.get(path, headers={**headers, "Accept-Encoding": "gzip"})
+
+    assert identity.status_code == gzipped.status_code == 200
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert "Content-Encoding" not in identity.headers
+    assert identity.json() == gzipped.json()
+    assert identity.headers["ETag"] != gzipped.headers["ETag"]
+
+    for accept_encoding, response in (("identity", identity), ("gzip", gzipped)):
+        etag = response.headers["ETag"]
+        other = gzipped.headers["ETag"] if response is identity else identity.headers["ETag"]
+
+        revalidated = client.get(path, headers={**headers, "Accept-Encoding": accept_encoding, "If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["ETag"] == etag
+
+        # the validator of the other representation must not revalidate this one
+        mismatched = client.get(path, headers={**headers, "Accept-Encoding": accept_encoding, "If-None-Match": other})
+        assert mismatched.status_code == 200
+        assert mismatched.headers["ETag"] == etag
@@ -0,0 +1,55 @@
+from src.auth.auth import auth_handler
+from src.company.models import Company
+from src.quiz.crud import QuizCrud
+from src.quiz.schemes import QuestionDocument, QuizDocument, VariantDocument
+from src.user.models import User
+
+
+async def create_user(session, email: str, name: str = "test") -> User:
+    user = User(name=name, surname="user", age=30, email=email, password="")
+
+    session.add(user)
+    await session.flush()
+
+    return user
+
+
+async def create_company(session, owner: User, title: str = "company") -> Company:
+    company = Company(title=title, description="", is_visible=True, owner_id=owner.id)
+
+    session.add(company)
+    await session.flush()
+
+    return company
+
+
+def quiz_document(questions: int, title: str = "quiz") -> QuizDocument:
+    # "right" is the correct variant of every question
+    return QuizDocument(title=title,
+                        description="",
+                        frequency=1,
+                        questions=[QuestionDocument(question=f"question {number}",
+                                                    variants=[VariantDocument(answer="right", is_correct=True),
+                                                              VariantDocument(answer="wrong"),
+                                                              VariantDocument(answer="other")])
+                                   for number in range(questions)])
+
+
+async def create_quiz(session, company: Company, owner: User, questions: int, title: str = "quiz") -> int:
+    result = await QuizCrud(db_session=session).create_quiz_document(company_id=company.id,
+                                                                     document=quiz_document(questions, title),
+                                                                     current_user=owner)
+
+    return result.quiz_id
+
+
+def register_user(client, email: str) -> dict:
+    response = client.post("/user/", json={"name": "test", "surname": "user", "age": 30,
+                                           "email": email, "password": "password"})
+    assert response.status_code == 201, response.text
+
+    return response.json()
+
+
+def auth_headers(email: str) -> dict:
+    return {"Authorization": f"Bearer {auth_handler.encode_token(email=email)}"}